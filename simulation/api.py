@@ -1,343 +1,932 @@
-import rclpy
-from nav2_simple_commander.robot_navigator import BasicNavigator, TaskResult
-from rclpy.node import Node
-from rclpy.executors import MultiThreadedExecutor
-from geometry_msgs.msg import TwistStamped, PoseStamped, PoseWithCovarianceStamped
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query, Request
-from fastapi.responses import FileResponse, StreamingResponse
-from typing import Optional
-from threading import Thread, Lock
-from subprocess import Popen
-import numpy as np
-import cv2
-from cv_bridge import CvBridge
-from nav_msgs.msg import OccupancyGrid
-from sensor_msgs.msg import Image
+import time
+IMPORT_STARTED = time.perf_counter()
+
+# rclpy, Nav2, cv_bridge and cv2 are imported by _bring_up_ros, after the
+# server is already answering requests.
+from fastapi import APIRouter, Depends, FastAPI, WebSocket, WebSocketDisconnect, WebSocketException, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import Literal, Optional
+from threading import Event, Thread, Lock
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import json
+import math
 import os
-import httpx
 
-from helper import pgm_to_png
-from models import goalInput, status, positionOutput, MappingStatus, SaveMapRequest, ChangeMapRequest
+from starlette.requests import HTTPConnection
+from bridge import BridgeClient, BridgeFollower, BridgeProxy, CommandQueue, CommandServer, SharedCamera, relay_polled
+from fleet import MapFeed, Robot, parse_robots
+from helper import cached_file_response
+from map_cache import ensure_images, thumbnail_size, map_names
+from map_catalog import MapCatalog
+from metrics import REGISTRY, MetricsMiddleware
+from mapping_session import MappingSession
+from map_saver import snapshot_grid, valid_map_name, write_map
+from map_tiles import ensure_pyramid, pyramid_meta, tile_path
+from stream_hub import StreamHub, PushedStream, MJPEG_MEDIA_TYPE
+from camera_tiers import TieredStreams, PROFILES
+from models import goalInput, status, positionOutput, MappingStatus, MapSaveStatus, SaveMapRequest, ChangeMapRequest, TaskSubmitted, TaskStatus, GoalCheck, GoalBatch, GoalBatchResult, RouteRequest, RouteSubmitted, PathPreview, RecordingRequest, RecordingStatus
+from nav_tasks import goal_feedback, backup_feedback, waypoint_feedback, FEEDBACK_PERIOD
+from readiness import Readiness
+from routes import RoutePlanner
+from path_cache import PathCache, path_length
+from teleop import MAX_TIMEOUT, TeleopSession
+from trajectory import simplify
+
+# "standalone" does everything in this process. "bridge" also shares its state with
+# "worker" processes, which own no ROS nodes and forward commands; see bridge.py.
+ROLE = os.environ.get("NAVIMATE_ROLE", "standalone")
+BRIDGE_NAME = os.environ.get("NAVIMATE_BRIDGE_NAME", "navimate")
+# The bridge's HTTP socket; commands use a datagram socket next to it.
+BRIDGE_SOCKET = os.environ.get("NAVIMATE_BRIDGE_SOCKET", "/tmp/navimate-bridge.sock")
+BRIDGE_COMMANDS = f"{BRIDGE_SOCKET}.commands"
+BRIDGE_MAP_BYTES = int(float(os.environ.get("NAVIMATE_BRIDGE_MAP_MB", "32")) * 1024 * 1024)
+BRIDGE_FRAME_BYTES = int(float(os.environ.get("NAVIMATE_BRIDGE_FRAME_MB", "4")) * 1024 * 1024)
+# Base URL of web_video_server, which the stream endpoints proxy.
+VIDEO_SERVER = os.environ.get("NAVIMATE_VIDEO_SERVER", "http://127.0.0.1:8080")
+# A recording to feed the ROS nodes from instead of live topics; see recording.py.
+REPLAY_FILE = os.environ.get("NAVIMATE_REPLAY")
+# "1" is real time, "4x" four times faster, "max" as fast as the nodes keep up.
+REPLAY_SPEED = os.environ.get("NAVIMATE_REPLAY_SPEED", "1")
+REPLAY_LOOP = os.environ.get("NAVIMATE_REPLAY_LOOP") == "1"
+# "web_video_server" proxies VIDEO_SERVER, "ros" subscribes to the camera in-process.
+CAMERA_SOURCE = os.environ.get("NAVIMATE_CAMERA_SOURCE", "ros" if REPLAY_FILE else "web_video_server")
+CAMERA_TOPIC = os.environ.get("NAVIMATE_CAMERA_TOPIC", "/camera/image_raw")
+# "compressed" reuses the JPEGs on <topic>/compressed, "raw" encodes <topic> itself.
+CAMERA_TRANSPORT = os.environ.get("NAVIMATE_CAMERA_TRANSPORT", "compressed")
+# Robot IDs, each also its ROS namespace; see fleet.py. The first robot also
+# answers the routes without the /robots/{robot_id} prefix.
+ROBOT_IDS = parse_robots(os.environ.get("NAVIMATE_ROBOTS", ""))
+# "1": the robots share one floor and its /map; "0": each has its own /<id>/map.
+SHARED_MAP = os.environ.get("NAVIMATE_SHARED_MAP", "1") == "1"
+# Threads of the one executor that spins every robot's nodes.
+ROS_THREADS = int(os.environ.get("NAVIMATE_ROS_THREADS", "4"))
+
+# One maps directory for saving, listing and switching; /root/maps in the container.
+MAPS_DIR = os.environ.get("NAVIMATE_MAPS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "maps"))
+MAP_CACHE_DIR = os.path.join(MAPS_DIR, ".cache")
+# The map entrypoint.sh starts Nav2 with.
+DEFAULT_MAP = "turtlebot3_house"
+MAX_ROUTE_STOPS = 50
+RECORDINGS_DIR = os.environ.get(
+    "NAVIMATE_RECORDINGS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
+)
+RECORDING_MAX_BYTES = int(float(os.environ.get("NAVIMATE_RECORDING_MAX_MB", "2048")) * 1024 * 1024)
 
 app = FastAPI()
-ros_node = None
-amcl_node = None
-map_image_node = None
+# Routes that act on one robot; mounted at the end of this file, with and without /robots/{robot_id}.
+robot_router = APIRouter()
+bridge_client = None
+if ROLE == "worker":
+    bridge_client = BridgeClient(BRIDGE_SOCKET)
+    app.add_middleware(BridgeProxy, client=bridge_client)
+app.add_middleware(MetricsMiddleware)
+map_feeds = {}
+robots = {}
+for robot_id in ROBOT_IDS:
+    feed_namespace = "" if SHARED_MAP or not robot_id else f"/{robot_id}"
+    if feed_namespace not in map_feeds:
+        map_feeds[feed_namespace] = MapFeed(feed_namespace)
+    robots[robot_id] = Robot(robot_id, map_feeds[feed_namespace], DEFAULT_MAP)
+# Mapping, recording and the bridge's shared state follow the first robot.
+default_robot = robots[ROBOT_IDS[0]]
+readiness = Readiness("ros", *(robot.navigation for robot in robots.values()), "map_index", started=IMPORT_STARTED)
 spin_thread = None
-navigator = None
-cartographer_process = None
-
-amcl_data = {"x": 0.0, "y": 0.0}
-amcl_lock = Lock()
-
-class CmdVelPublisher(Node):
-    
-    def __init__(self):
-        super().__init__('websocket_cmd_vel_publisher')
-        self.publisher = self.create_publisher(TwistStamped, '/cmd_vel', 10)
-
-    def publish_cmd(self, linear: float, angular: float):
-        msg = TwistStamped()
-        msg.header.stamp = self.get_clock().now().to_msg()
-        msg.header.frame_id = 'base_link'
-        msg.twist.linear.x = linear
-        msg.twist.angular.z = angular
-        self.publisher.publish(msg)
-        self.get_logger().info(f"Published: linear={linear}, angular={angular}")
-
-class AMCLListener(Node):
-
-    def __init__(self):
-        super().__init__('amcl_listener_node')
-        self.amcl_pose = None
-
-        self.create_subscription(
-            PoseWithCovarianceStamped,
-            '/amcl_pose',
-            self.amcl_callback,
-            10
-        )
-
-    def amcl_callback(self, msg):
-        self.get_logger().info("Received AMCL pose")
-        self.amcl_pose = msg
-        with amcl_lock:
-            amcl_data['x'] = msg.pose.pose.position.x
-            amcl_data['y'] = msg.pose.pose.position.y
-
-class MapImagePublisher(Node):
-    def __init__(self):
-        super().__init__('map_image_publisher')
-        self.bridge = CvBridge()
-        self.publisher = self.create_publisher(Image, '/map_image', 10)
-        self.subscription = self.create_subscription(
-            OccupancyGrid,
-            '/map',
-            self.map_callback,
-            10
-        )
-
-    def map_callback(self, msg):
-        # Convert OccupancyGrid to grayscale image
-        width = msg.info.width
-        height = msg.info.height
-        data = np.array(msg.data, dtype=np.int8).reshape((height, width))
-
-        # Map data values: -1 = unknown, 0 = free, 100 = occupied
-        image = np.zeros((height, width), dtype=np.uint8)
-        image[data == -1] = 127
-        image[data == 0] = 255
-        image[data == 100] = 0
-
-        image = cv2.flip(image, 0)
-        msg_img = self.bridge.cv2_to_imgmsg(image, encoding="mono8")
-        msg_img.header = msg.header
-        self.publisher.publish(msg_img)
+mapping_session = MappingSession(standby=os.environ.get("NAVIMATE_MAPPING_STANDBY") == "1")
+map_catalog = MapCatalog(MAPS_DIR)
+map_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="map-artifacts")
+# Indexes by map name, shared by the robots on the same map.
+map_indexes = {}
+route_planner = RoutePlanner()
+path_cache = PathCache()
+map_saves = {}
+recorder = None
+replayer = None
+recording_lock = Lock()
+shared_state = None
+command_server = None
+bridge_follower = None
+bridge_map = None
+bridge_stop = Event()
+camera_lease_until = 0.0
+# Only these topics get their own stream metrics; any other topic a client asks for is "other".
+stream_hub = StreamHub(
+    topics={robot.topic(CAMERA_TOPIC) for robot in robots.values()}
+    | {robot.map_feed.image_topic for robot in robots.values()}
+)
+camera_tiers = TieredStreams(stream_hub)
+
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
+
+def _on_amcl_pose(msg):
+    if recorder is not None:
+        recorder.pose(msg)
+    if shared_state is not None:
+        shared_state.write_pose(msg)
+
+def _on_map(msg):
+    if recorder is not None:
+        recorder.grid(msg)
+    if shared_state is not None:
+        shared_state.write_map(msg)
+    mapping_session.map_received()
+
+def _on_camera_frame(jpeg, stamp):
+    if recorder is not None:
+        recorder.frame(jpeg, stamp)
+    if shared_state is not None and time.monotonic() < camera_lease_until:
+        shared_state.write_frame(jpeg, stamp)
+
+default_robot.on_pose = _on_amcl_pose
+default_robot.map_feed.on_map = _on_map
+
+def _update_camera_consumers():
+    # The camera stays subscribed while a recording or a worker's viewers need its frames.
+    if default_robot.camera is None or ROLE == "worker":
+        return
+    wanted = (recorder is not None and not recorder.closed) or time.monotonic() < camera_lease_until
+    default_robot.camera.record(_on_camera_frame if wanted else None)
 
 @app.on_event("startup")
 def on_startup():
-    global ros_node, navigator, amcl_node, map_image_node, spin_thread
-    if not rclpy.ok():
-        rclpy.init()
-
-    navigator = BasicNavigator()  # Has its own internal node
-
-    ros_node = CmdVelPublisher()
-    amcl_node = AMCLListener()
-    map_image_node = MapImagePublisher()
+    if ROLE == "worker":
+        # The bridge owns ROS and warms the map artifacts; a worker only follows it.
+        Thread(target=_follow_bridge, daemon=True, name="bridge-follow").start()
+        return
+
+    # Only quick, ROS-free work here; everything slow runs on the startup thread.
+    if os.path.isdir(MAPS_DIR):
+        for map_name in map_names(MAPS_DIR):
+            _warm_map_artifacts(map_name)
+        map_pool.submit(_load_map_index, MAPS_DIR, DEFAULT_MAP, list(robots.values()))
+    else:
+        readiness.mark_failed("map_index", f"{MAPS_DIR} does not exist")
+    if ROLE == "bridge":
+        _start_bridge()
+    Thread(target=_bring_up_ros, daemon=True, name="ros-startup").start()
+
+def _start_bridge():
+    global shared_state, command_server
+    from shared_state import SharedState
+
+    shared_state = SharedState(BRIDGE_NAME, BRIDGE_MAP_BYTES, BRIDGE_FRAME_BYTES, create=True)
+    command_server = CommandServer(BRIDGE_COMMANDS, _on_bridge_velocity, _on_camera_lease)
+    command_server.start()
+    Thread(target=_publish_bridge_status, daemon=True, name="bridge-status").start()
+
+def _on_bridge_velocity(linear, angular):
+    if default_robot.cmd_vel is not None:
+        default_robot.cmd_vel.publish_cmd(linear, angular)
+
+def _on_camera_lease(until):
+    global camera_lease_until
+    was_leased = time.monotonic() < camera_lease_until
+    camera_lease_until = until
+    if not was_leased:
+        _update_camera_consumers()
+
+def _publish_bridge_status():
+    # Also the workers' liveness signal, so it is written even when nothing changed.
+    while not bridge_stop.wait(0.5):
+        index = map_indexes.get(default_robot.map_name)
+        shared_state.write_status({
+            "pid": os.getpid(),
+            "readiness": readiness.snapshot()["subsystems"],
+            "map": {"name": index.name, "digest": index.digest} if index else None,
+        })
+        _update_camera_consumers()
+
+def _follow_bridge():
+    global bridge_follower
+    from shared_state import SharedState
+
+    while True:
+        try:
+            state = SharedState(BRIDGE_NAME)
+            break
+        except FileNotFoundError:
+            time.sleep(0.5)
+    default_robot.cmd_vel = CommandQueue(BRIDGE_COMMANDS)
+    default_robot.camera = SharedCamera(default_robot.topic(CAMERA_TOPIC), default_robot.cmd_vel)
+    # Also stands in for the AMCL listener: it keeps the latest amcl_pose.
+    bridge_follower = BridgeFollower(
+        state, default_robot.receive_pose, default_robot.map_feed.receive, default_robot.camera, _on_bridge_status
+    )
+    default_robot.amcl = bridge_follower
+    bridge_follower.start()
+
+def _on_bridge_status(status):
+    global bridge_map
+    names = ("ros", *(robot.navigation for robot in robots.values()))
+    if status is None:
+        for name in names:
+            readiness.mark_failed(name, "the bridge stopped publishing its status")
+        return
+    for name in names:
+        readiness.mirror(name, status["readiness"][name])
+    # Follow map changes so goals are validated against the bridge's map.
+    if status["map"] and status["map"] != bridge_map:
+        bridge_map = status["map"]
+        map_pool.submit(_load_map_index, MAPS_DIR, bridge_map["name"], [default_robot])
+
+def _bring_up_ros():
+    global spin_thread, replayer
+    try:
+        import rclpy
+        from rclpy.executors import MultiThreadedExecutor
+        from ros_nodes import replay_handlers
+
+        if not rclpy.ok():
+            rclpy.init()
+
+        # Every robot's nodes share one executor, so ROS threads do not grow with the fleet.
+        executor = MultiThreadedExecutor(num_threads=ROS_THREADS)
+        for feed in map_feeds.values():
+            executor.add_node(feed.start())
+        for robot in robots.values():
+            for node in robot.start_nodes(CAMERA_TOPIC, CAMERA_TRANSPORT):
+                executor.add_node(node)
+
+        spin_thread = Thread(target=executor.spin, daemon=True)
+        spin_thread.start()
+        if REPLAY_FILE:
+            from recording import Replayer, parse_speed
+
+            replayer = Replayer(
+                REPLAY_FILE, replay_handlers(default_robot.amcl, default_robot.map_feed.node, default_robot.camera),
+                parse_speed(REPLAY_SPEED), REPLAY_LOOP,
+            )
+            replayer.start()
+        readiness.mark_ready("ros")
+    except Exception as e:
+        print(f"ROS failed to start: {e}")
+        readiness.mark_failed("ros", e)
+        return
 
-    executor = MultiThreadedExecutor()
-    executor.add_node(ros_node)
-    executor.add_node(amcl_node)
-    executor.add_node(map_image_node)
+    mapping_session.warm()
 
-    spin_thread = Thread(target=executor.spin, daemon=True)
-    spin_thread.start()
+    # Each robot's Nav2 comes up on its own, so one slow stack does not hold up the rest.
+    for robot in robots.values():
+        Thread(target=_start_navigator, args=(robot,), daemon=True, name=f"navigator{robot.namespace}").start()
 
+def _start_navigator(robot):
     try:
-        navigator.waitUntilNav2Active()
+        robot.start_navigator()
+        readiness.mark_ready(robot.navigation)
     except Exception as e:
-        print(f"Navigator failed to activate: {e}")
+        print(f"Navigator of {robot.namespace or '/'} failed to activate: {e}")
+        readiness.mark_failed(robot.navigation, e)
 
 @app.on_event("shutdown")
 def on_shutdown():
-    global ros_node
-    ros_node.destroy_node()
-    navigator.destroyNode()
-    rclpy.shutdown()
+    bridge_stop.set()
+    if bridge_follower is not None:
+        bridge_follower.stop()
+    if command_server is not None:
+        command_server.close()
+    stream_hub.close()
+    camera_tiers.close()
+    mapping_session.close()
+    if replayer is not None:
+        replayer.stop(timeout=1.0)
+    if recorder is not None:
+        recorder.close()
+    map_pool.shutdown(wait=False, cancel_futures=True)
+    for robot in robots.values():
+        robot.close()
+    if shared_state is not None:
+        shared_state.close()
+    if ROLE != "worker" and readiness.ready("ros"):
+        import rclpy
+        rclpy.shutdown()
+
+@app.get("/health", summary="Liveness: the API process is serving requests")
+def health():
+    return {"status": "ok", "uptime": time.perf_counter() - IMPORT_STARTED}
+
+@app.get("/ready", summary="Which subsystems are up; 503 until all of them are")
+def ready():
+    body = {**readiness.snapshot(), "import_seconds": IMPORT_SECONDS}
+    if not body["ready"]:
+        return JSONResponse(body, status_code=503)
+    return body
+
+@app.get("/metrics", summary="Prometheus metrics")
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/robots", summary="The robots this API serves; the first also answers routes without /robots/{robot_id}")
+def list_robots():
+    subsystems = readiness.snapshot()["subsystems"]
+    return {
+        "robots": [
+            {**robot.status(), "default": robot is default_robot, "navigation": subsystems[robot.navigation]["state"]}
+            for robot in robots.values()
+        ],
+    }
+
+def robot_from_path(connection: HTTPConnection):
+    """The robot of /robots/{robot_id}/..., or the first robot for the routes without the prefix."""
+    robot_id = connection.path_params.get("robot_id")
+    if robot_id is None:
+        return default_robot
+    robot = robots.get(robot_id)
+    if robot is None:
+        if connection.scope["type"] == "websocket":
+            raise WebSocketException(code=4404, reason=f"Unknown robot '{robot_id}'")
+        raise HTTPException(status_code=404, detail=f"Unknown robot '{robot_id}'")
+    return robot
+
+async def _refuse_unfollowed(websocket, robot, feed=False):
+    """Refuse a robot WebSocket a worker cannot serve; returns whether it did.
+
+    A worker only follows the first robot's pose, map and commands through the
+    bridge, so the other robots' live streams would stay silent. With ``feed``
+    robots sharing the first robot's map feed are served too.
+    """
+    if ROLE != "worker" or robot is default_robot or (feed and robot.map_feed is default_robot.map_feed):
+        return False
+    detail = f"Robot '{robot.id}' is only streamed by the bridge; workers serve the first robot's streams"
+    try:
+        await websocket.send_denial_response(JSONResponse({"detail": detail}, status_code=501))
+    except RuntimeError:
+        # The server has no denial responses: accept and close straight away instead.
+        await websocket.accept()
+        await websocket.close(code=1003, reason=detail[:120])
+    return True
+
+async def _until_disconnect(websocket, sending):
+    """Run the ``sending`` coroutine until it returns or the client disconnects.
+
+    Push-only streams can go quiet for hours; reading the socket alongside
+    notices a closed client without waiting for the next message to fail.
+    """
+    async def watch():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = [asyncio.ensure_future(sending), asyncio.ensure_future(watch())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    if not tasks[0].cancelled() and tasks[0].exception() is not None:
+        raise tasks[0].exception()
 
 @app.post("/mapping/start", response_model=MappingStatus, summary="Start Cartographer mapping")
 def start_mapping():
-    global cartographer_process
-    if cartographer_process and cartographer_process.poll() is None:
-        return MappingStatus(status="already running")
-
     try:
-        cartographer_process = Popen([
-            "ros2", "launch", "turtlebot3_cartographer", "cartographer.launch.py", "use_sim_time:=true"
-        ])
+        if not mapping_session.start():
+            return MappingStatus(status="already running")
         return MappingStatus(status="started")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"error: {e}")
 
 @app.post("/mapping/stop", response_model=MappingStatus, summary="Stop Cartographer mapping")
 def stop_mapping():
-    global cartographer_process
-    if cartographer_process and cartographer_process.poll() is None:
-        cartographer_process.terminate()
-        cartographer_process.wait()
-        return MappingStatus(status="stopped")
+    if mapping_session.stop():
+        return MappingStatus(status="stopping")
     return MappingStatus(status="not running")
 
+@app.get("/mapping/status", summary="State and health of the mapping session")
+def get_mapping_status():
+    return mapping_session.status()
+
+@app.websocket("/mapping/status/stream")
+async def websocket_mapping_status(websocket: WebSocket):
+    """Send the mapping status now and after every state change."""
+    await websocket.accept()
+    if ROLE == "worker":
+        try:
+            await relay_polled(
+                websocket, lambda: bridge_client.get("/mapping/status"), 0.5,
+                changed=lambda last, body: last["changed"] != body["changed"],
+            )
+        except WebSocketDisconnect:
+            pass
+        return
+    updates = mapping_session.listen()
+
+    async def send():
+        await websocket.send_json(mapping_session.status())
+        while True:
+            await websocket.send_json(await updates.get())
+
+    try:
+        await _until_disconnect(websocket, send())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        mapping_session.unlisten(updates)
+
 @app.post("/mapping/save", response_model=MappingStatus, summary="Save the current map")
 def save_map(request: SaveMapRequest):
+    map_name = request.map_name
+    _check_map_name(map_name)
+    map_image_node = default_robot.map_feed.node
+    msg = map_image_node.last_map if map_image_node else None
+    if msg is None:
+        raise HTTPException(status_code=503, detail="No map received yet")
+
+    # Copy the grid now; encoding and writing happen in the background.
+    snapshot = snapshot_grid(msg)
+    save = {"map_name": map_name, "state": "saving", "error": None, "started": time.time(), "finished": None}
+    map_saves[map_name] = save
+    map_pool.submit(_write_saved_map, map_name, snapshot, save)
+    return MappingStatus(status=f"saving as {map_name}")
+
+@app.get("/mapping/save/{map_name}", response_model=MapSaveStatus, summary="Get the outcome of a map save")
+def get_save_status(map_name: str):
+    save = map_saves.get(map_name)
+    if save is None:
+        raise HTTPException(status_code=404, detail=f"No save of '{map_name}' since startup")
+    return MapSaveStatus(**save)
+
+def _write_saved_map(map_name, snapshot, save):
     try:
-        map_name = request.map_name
-        save_proc = Popen([
-            "ros2", "run", "nav2_map_server", "map_saver_cli",
-            "-f", f"./maps/{map_name}"
-        ])
-        save_proc.wait()
-        return MappingStatus(status=f"saved as {map_name}")
+        write_map(MAPS_DIR, map_name, snapshot)
+        path_cache.invalidate(map_name)
+        map_catalog.update(map_name)
+        ensure_images(MAPS_DIR, map_name, MAP_CACHE_DIR)
+        map_pool.submit(ensure_pyramid, MAPS_DIR, map_name, MAP_CACHE_DIR)
+        save["state"] = "saved"
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"error: {e}")
-    
-@app.get("/mapping/stream")
-async def stream_map(request: Request):
-    url = "http://localhost:8080/stream?topic=/map_image"
-    boundary = "frame"
-
-    JPEG_START = b'\xff\xd8'
-    JPEG_END = b'\xff\xd9'
-
-    async def generate():
-        async with httpx.AsyncClient() as client:
-            async with client.stream("GET", url) as response:
-                buffer = b""
-                async for chunk in response.aiter_bytes():
-                    buffer += chunk
-                    while JPEG_START in buffer and JPEG_END in buffer:
-                        start = buffer.find(JPEG_START)
-                        end = buffer.find(JPEG_END, start) + 2
-                        if end > start:
-                            frame = buffer[start:end]
-                            buffer = buffer[end:]
-                            yield (
-                                f"--{boundary}\r\n"
-                                f"Content-Type: image/jpeg\r\n"
-                                f"Content-Length: {len(frame)}\r\n\r\n"
-                            ).encode("utf-8") + frame + b"\r\n"
-
-    return StreamingResponse(generate(), media_type=f"multipart/x-mixed-replace; boundary={boundary}")
-
-@app.post("/map/change", response_model=status, summary="Change the active map")
-def change_map(request: ChangeMapRequest):
+        print(f"Failed to save map {map_name}: {e}")
+        save["state"] = "failed"
+        save["error"] = str(e)
+    save["finished"] = time.time()
+
+@app.post("/recording/start", response_model=RecordingStatus, summary="Record the pose, map and camera topics")
+def start_recording(request: RecordingRequest):
+    global recorder
+    from recording import TopicRecorder
+
+    readiness.require("ros")
+    name = request.name or time.strftime("%Y%m%d-%H%M%S")
+    if not valid_map_name(name):
+        raise HTTPException(status_code=400, detail=f"Invalid recording name '{name}'")
+    with recording_lock:
+        if recorder is not None and not recorder.closed:
+            return RecordingStatus(status="already recording", recording=recorder.status())
+        os.makedirs(RECORDINGS_DIR, exist_ok=True)
+        try:
+            recorder = TopicRecorder(os.path.join(RECORDINGS_DIR, f"{name}.navrec"), RECORDING_MAX_BYTES)
+        except OSError as e:
+            raise HTTPException(status_code=500, detail=f"error: {e}")
+        _update_camera_consumers()
+    return RecordingStatus(status="recording", recording=recorder.status())
+
+@app.post("/recording/stop", response_model=RecordingStatus, summary="Stop recording and close the file")
+def stop_recording():
+    with recording_lock:
+        if recorder is None or recorder.closed:
+            return RecordingStatus(status="not recording")
+        recorder.close()
+        _update_camera_consumers()
+    return RecordingStatus(status="stopped", recording=recorder.status())
+
+@app.get("/recording/status", response_model=RecordingStatus, summary="The current recording and replay")
+def get_recording_status():
+    active = recorder is not None and not recorder.closed
+    return RecordingStatus(
+        status="recording" if active else "replaying" if replayer is not None else "idle",
+        recording=recorder.status() if recorder is not None else None,
+        replay=replayer.status() if replayer is not None else None,
+    )
+
+@robot_router.get("/mapping/stream")
+async def stream_map(request: Request, robot: Robot = Depends(robot_from_path)):
+    url = f"{VIDEO_SERVER}/stream?topic={robot.map_feed.image_topic}"
+    return StreamingResponse(stream_hub.frames(url), media_type=MJPEG_MEDIA_TYPE)
+
+@robot_router.websocket("/mapping/grid")
+async def websocket_map_grid(websocket: WebSocket, robot: Robot = Depends(robot_from_path)):
+    """Stream the live occupancy grid losslessly; see grid_stream for the format."""
+    if await _refuse_unfollowed(websocket, robot, feed=True):
+        return
+    await websocket.accept()
+    try:
+        async for frame in robot.map_feed.grid_stream.frames():
+            await websocket.send_bytes(frame)
+    except WebSocketDisconnect:
+        pass
+
+@robot_router.post("/map/change", response_model=status, summary="Change the active map")
+def change_map(request: ChangeMapRequest, robot: Robot = Depends(robot_from_path)):
     if not request.map_name:
         raise HTTPException(status_code=400, detail="Missing map_name")
+    _check_map_name(request.map_name)
 
-    map_dir = "/root/maps"
     map_filename = f"{request.map_name}.yaml"
-    map_path = os.path.join(map_dir, map_filename)
+    map_path = os.path.join(MAPS_DIR, map_filename)
 
     if not os.path.isfile(map_path):
         raise HTTPException(status_code=404, detail=f"Map file '{map_filename}' not found")
 
+    readiness.require(robot.navigation)
     try:
-        navigator.changeMap(map_path)
+        from map_index import MapIndex
+
+        index = MapIndex.load(MAPS_DIR, request.map_name)
+        with robot.tasks.lock:
+            robot.navigator.changeMap(map_path)
+        path_cache.invalidate()
+        _set_map_index(index, [robot])
         return status(status="map changed successfully")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to change map: {e}")
 
 @app.get("/map/list", summary="List available maps")
-def list_maps():
-    maps_dir = "./maps"
-    if not os.path.exists(maps_dir):
+def list_maps(
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    name: Optional[str] = Query(None, description="Case-insensitive substring of the map name"),
+    sort: Literal["name", "modified", "created", "bytes", "width", "height"] = Query("name"),
+    descending: bool = Query(False),
+):
+    if not os.path.exists(MAPS_DIR):
         raise HTTPException(status_code=404, detail="Maps directory does not exist.")
 
-    map_files = [f for f in os.listdir(maps_dir) if f.endswith(".yaml")]
-    return {"maps": map_files}
+    total, entries = map_catalog.query(offset, limit, name, sort, descending)
+    return {
+        "maps": [f"{entry['name']}.yaml" for entry in entries],
+        "items": entries,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+    }
 
 @app.get("/map/download", summary="Get map image by name")
-def get_map(map_name: Optional[str] = Query(default='turtlebot3_house')):
+async def get_map(request: Request, map_name: Optional[str] = Query(default='turtlebot3_house')):
     if not map_name:
         raise HTTPException(status_code=400, detail="Missing map_name query parameter.")
 
-    maps_dir = "./maps"
-
-    png_path = os.path.join(maps_dir, f"{map_name}.png")
-    pgm_path = os.path.join(maps_dir, f"{map_name}.pgm")
-
-    if os.path.exists(png_path):
-        return FileResponse(png_path, media_type="image/png", filename=f"{map_name}.png")
-    else:
-        if os.path.exists(pgm_path):
-            os.makedirs(maps_dir, exist_ok=True)
-            try:
-                png_path = pgm_to_png(pgm_path, png_path)
-                return FileResponse(png_path, media_type="image/png", filename=f"{map_name}.png")
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Conversion failed: {e}")
+    digest, images_dir = await _map_images(map_name)
+    return cached_file_response(
+        request, os.path.join(images_dir, "map.png"), "image/png", f'"{digest}"',
+        max_age=0, filename=f"{map_name}.png"
+    )
+
+@app.get("/map/thumbnail", summary="Get a map thumbnail by name")
+async def get_map_thumbnail(
+    request: Request,
+    map_name: str = Query(...),
+    size: int = Query(128, ge=1, description="Requested width; the nearest larger cached size is served"),
+):
+    size = thumbnail_size(size)
+    digest, images_dir = await _map_images(map_name)
+    return cached_file_response(
+        request, os.path.join(images_dir, f"thumb_{size}.png"), "image/png", f'"{digest}-{size}"', max_age=0
+    )
+
+def _check_map_name(map_name):
+    # Map names end up in paths under MAPS_DIR and MAP_CACHE_DIR.
+    if not valid_map_name(map_name):
+        raise HTTPException(status_code=400, detail=f"Invalid map name '{map_name}'")
+
+async def _map_images(map_name):
+    _check_map_name(map_name)
+    # Conversion runs in map_pool so a cold cache does not hold a request thread.
+    try:
+        return await asyncio.wrap_future(map_pool.submit(ensure_images, MAPS_DIR, map_name, MAP_CACHE_DIR))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Map '{map_name}' not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Conversion failed: {e}")
 
+def _warm_map_artifacts(map_name):
+    map_pool.submit(map_catalog.update, map_name)
+    map_pool.submit(ensure_images, MAPS_DIR, map_name, MAP_CACHE_DIR)
+    map_pool.submit(ensure_pyramid, MAPS_DIR, map_name, MAP_CACHE_DIR)
 
-@app.get("/voice/backup", response_model = status)
-def backup(backup_dist: Optional[float] = 0.30, backup_speed: Optional[float] = 0.2, time_allowance: Optional[int] = 10):  
-    if not navigator.isTaskComplete():
-        return status(status = "stop the running task.")
-    
-    navigator.backup(backup_dist, backup_speed, time_allowance)
+def _load_map_index(maps_dir, map_name, on_map):
+    try:
+        from map_index import MapIndex
 
-    i = 0
-    while not navigator.isTaskComplete():
-        i = i + 1
-        feedback = navigator.getFeedback() 
-        if feedback and i % 5 == 0:
-            try:
-                print(
-                    'Distance traveled: '
-                    + f'{feedback.distance_traveled:.3f}'
-                )
-            except Exception as e:
-                print(f"Error at backup feedback: {e}")
-
-    result = navigator.getResult()
-    if result == TaskResult.SUCCEEDED:
-        return status(status = "succeded")
-    elif result == TaskResult.CANCELED:
-        return status(status = "canceled")
-    elif result == TaskResult.FAILED:
-        try:
-            error_code, error_msg = navigator.getTaskError()
-            return status(status = "failed")
-        except AttributeError:
-           return status(status = "failed")
-    else:
-        return status(status = "unknown")
+        _set_map_index(MapIndex.load(maps_dir, map_name), on_map)
+    except Exception as e:
+        print(f"Failed to index map {map_name}: {e}")
+        readiness.mark_failed("map_index", e)
+
+def _set_map_index(index, on_map):
+    """Make ``index`` the map of the robots ``on_map``, dropping indexes no robot uses any more."""
+    map_indexes[index.name] = index
+    for robot in on_map:
+        robot.map_name = index.name
+    in_use = {robot.map_name for robot in robots.values()}
+    for name in [name for name in map_indexes if name not in in_use]:
+        map_indexes.pop(name, None)
+    readiness.mark_ready("map_index")
+
+def _require_map_index(robot):
+    readiness.require("map_index")
+    index = map_indexes.get(robot.map_name)
+    if index is None:
+        raise HTTPException(
+            status_code=503, detail=f"Map '{robot.map_name}' is not indexed yet", headers={"Retry-After": "5"}
+        )
+    return index
 
-@app.post("/robot/goal", response_model=status, summary="Set a navigation goal")
-def set_goal(goal: goalInput):
-    if not amcl_node.amcl_pose:
+def _map_pyramid(map_name):
+    _check_map_name(map_name)
+    try:
+        return ensure_pyramid(MAPS_DIR, map_name, MAP_CACHE_DIR)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Map '{map_name}' not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Tiling failed: {e}")
+
+@app.get("/map/tiles/{map_name}", summary="Get the tile pyramid layout of a map")
+def get_map_tiles_meta(map_name: str):
+    digest, tiles_dir = _map_pyramid(map_name)
+    return {
+        **pyramid_meta(tiles_dir),
+        "version": digest,
+        "url": f"/map/tiles/{map_name}/{{z}}/{{x}}/{{y}}.png?v={digest}",
+    }
+
+@app.get("/map/tiles/{map_name}/{z}/{x}/{y}.png", summary="Get one map tile")
+def get_map_tile(
+    request: Request, map_name: str, z: int, x: int, y: int,
+    v: Optional[str] = Query(None, description="The pyramid's version; tiles of the current version are cached for a day"),
+):
+    digest, tiles_dir = _map_pyramid(map_name)
+    path = tile_path(tiles_dir, z, x, y)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    # A map saved again under the same name gets a new version, so only versioned URLs may be cached.
+    max_age = 86400 if v == digest else 0
+    return cached_file_response(request, path, "image/png", f'"{digest}-{z}-{x}-{y}"', max_age=max_age)
+
+@robot_router.get("/voice/backup", response_model=TaskSubmitted, summary="Back up, as a navigation task")
+def backup(
+    backup_dist: Optional[float] = 0.30, backup_speed: Optional[float] = 0.2, time_allowance: Optional[int] = 10,
+    robot: Robot = Depends(robot_from_path),
+):
+    readiness.require(robot.navigation)
+    task = robot.tasks.submit(
+        "backup",
+        lambda nav: nav.backup(backup_dist, backup_speed, time_allowance),
+        backup_feedback(backup_dist, backup_speed),
+    )
+    if task is None:
+        return TaskSubmitted(status="stop the running task.")
+    return TaskSubmitted(status="accepted", task_id=task.id)
+
+@robot_router.post("/robot/goal/validate", response_model=GoalBatchResult, summary="Check many candidate goals against the active map")
+def validate_goals(batch: GoalBatch, robot: Robot = Depends(robot_from_path)):
+    index = _require_map_index(robot)
+    origin = robot.xy() if batch.from_robot and robot.amcl and robot.amcl.amcl_pose else None
+    results = index.validate([(p.x, p.y) for p in batch.points], origin, batch.max_snap)
+    return GoalBatchResult(map_name=index.name, results=[GoalCheck(**r) for r in results])
+
+@robot_router.post("/robot/goal", response_model=TaskSubmitted, summary="Set a navigation goal")
+def set_goal(goal: goalInput, robot: Robot = Depends(robot_from_path)):
+    index, check, initial_pose, goal_pose = _goal_request(goal, robot)
+
+    def start(nav):
+        entry, _ = _plan_path(nav, index, initial_pose, goal_pose)
+        if entry is None:
+            return False
+        return nav.followPath(entry[0])
+
+    task = robot.tasks.submit("goal", start, goal_feedback)
+    if task is None:
+        return TaskSubmitted(status="stop the running task.", goal=check)
+    return TaskSubmitted(status="accepted", task_id=task.id, goal=check)
+
+@robot_router.post("/robot/path/preview", response_model=PathPreview, summary="Plan a path to a goal without moving")
+def preview_path(goal: goalInput, robot: Robot = Depends(robot_from_path)):
+    index, check, initial_pose, goal_pose = _goal_request(goal, robot)
+    with robot.tasks.lock:
+        # Planning on the navigator replaces the running task's goal handle and result.
+        task = robot.tasks.current
+        if task is not None and task.state == "running":
+            raise HTTPException(status_code=409, detail=f"Task {task.id} is running; preview once it is done")
+        entry, cached = _plan_path(robot.navigator, index, initial_pose, goal_pose)
+    if entry is None:
+        raise HTTPException(status_code=422, detail="No path found")
+    _, points = entry
+    return PathPreview(
+        cached=cached,
+        goal=check,
+        points=points.tolist(),
+        length=path_length(points),
+        map_name=index.name if index else None,
+    )
+
+@app.get("/robot/path/cache", summary="Path cache size and hit rate")
+def get_path_cache_stats():
+    return path_cache.stats()
+
+def _goal_request(goal, robot):
+    """Validate a goal and build the robot's map index, start and goal poses for planning."""
+    from ros_nodes import map_pose, stamped_pose
+
+    readiness.require(robot.navigation)
+    if not robot.amcl.amcl_pose:
         raise HTTPException(status_code=503, detail="AMCL pose not yet received")
 
-    if not navigator.isTaskComplete():
-        return status(status = "stop the running task.")
-    
-    initial_pose = PoseStamped()
-    initial_pose.header = amcl_node.amcl_pose.header
-    initial_pose.pose = amcl_node.amcl_pose.pose.pose
-
-    goal_pose = PoseStamped()
-    goal_pose.header.frame_id = 'map'
-    goal_pose.header.stamp = navigator.get_clock().now().to_msg()
-    goal_pose.pose.position.x = goal.x
-    goal_pose.pose.position.y = goal.y
-    goal_pose.pose.orientation.w = 1.0
-
-     # Get the path, smooth it
-    path = navigator.getPath(initial_pose, goal_pose)
-    smoothed_path = navigator.smoothPath(path)
-
-    # Follow path
-    navigator.followPath(smoothed_path)
-
-    i = 0
-    while not navigator.isTaskComplete():
-        i += 1
-        feedback = navigator.getFeedback()
-        if feedback and i % 5 == 0:
-            try:
-                print(
-                    'Estimated distance remaining to goal position: '
-                    + f'{feedback.distance_to_goal:.3f}'
-                    + '\nCurrent speed of the robot: '
-                    + f'{feedback.speed:.3f}'
-                )
-            except Exception as e:
-                print(f"Error at goal feedback: {e}")
-
-    result = navigator.getResult()
-    if result == TaskResult.SUCCEEDED:
-        return status(status = "succeded")
-    elif result == TaskResult.CANCELED:
-        return status(status = "canceled")
-    elif result == TaskResult.FAILED:
-#        (error_code, error_msg) = navigator.getTaskError()
-        return status(status = "failed")
-    else:
-        return status(status = "unknown")
-    
-@app.get("/robot/position", response_model=positionOutput, summary="Get robot position from AMCL")
-def get_amcl_pose():
-    with amcl_lock:
-        return positionOutput(x = amcl_data["x"], y = amcl_data["y"])
+    # Without an index yet the goal goes to Nav2 unchecked, as before.
+    check = None
+    index = map_indexes.get(robot.map_name)
+    if index is not None:
+        result = index.validate([(goal.x, goal.y)], robot.xy())[0]
+        if result["status"] == "unreachable":
+            raise HTTPException(status_code=422, detail=result)
+        check = GoalCheck(**result)
+
+    initial_pose = stamped_pose(robot.amcl.amcl_pose)
+
+    goal_pose = map_pose(
+        check.x if check else goal.x,
+        check.y if check else goal.y,
+        robot.navigator.get_clock().now().to_msg(),
+    )
+    return index, check, initial_pose, goal_pose
+
+def _plan_path(nav, index, initial_pose, goal_pose):
+    """Return ``((path, points), cached)``, planning and smoothing on a cache miss.
+
+    The cache is shared, so robots on the same map reuse each other's paths.
+    """
+    start = initial_pose.pose.position
+    end = goal_pose.pose.position
+    key = path_cache.key(index, (start.x, start.y), (end.x, end.y))
+    entry = path_cache.get(key)
+    if entry is not None:
+        return entry, True
+
+    # Get the path, smooth it and cache it
+    path = nav.getPath(initial_pose, goal_pose)
+    if path is None:
+        return None, False
+    smoothed_path = nav.smoothPath(path)
+    return path_cache.put(key, smoothed_path if smoothed_path is not None else path), False
+
+@robot_router.post("/robot/route", response_model=RouteSubmitted, summary="Visit several stops as one navigation task")
+def set_route(route: RouteRequest, robot: Robot = Depends(robot_from_path)):
+    from ros_nodes import map_pose
+
+    readiness.require(robot.navigation)
+    if not robot.amcl.amcl_pose:
+        raise HTTPException(status_code=503, detail="AMCL pose not yet received")
+    index = _require_map_index(robot)
+    if not route.stops:
+        raise HTTPException(status_code=400, detail="No stops given")
+    if len(route.stops) > MAX_ROUTE_STOPS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_ROUTE_STOPS} stops per route")
+
+    origin = robot.xy()
+    started = time.perf_counter()
+    checks = index.validate([(stop.x, stop.y) for stop in route.stops], origin)
+    unreachable = [i for i, check in enumerate(checks) if check["status"] == "unreachable"]
+    if unreachable:
+        raise HTTPException(status_code=422, detail={"unreachable": unreachable, "stops": checks})
+
+    order, distance = route_planner.plan(
+        index, origin, [(check["x"], check["y"]) for check in checks], route.optimize, route.return_to_start
+    )
+    planning_ms = (time.perf_counter() - started) * 1000
+
+    waypoints = [checks[i] for i in order]
+    if route.return_to_start:
+        waypoints.append({"x": origin[0], "y": origin[1]})
+    stamp = robot.navigator.get_clock().now().to_msg()
+    poses = [map_pose(waypoint["x"], waypoint["y"], stamp) for waypoint in waypoints]
+
+    task = robot.tasks.submit(
+        "route", lambda nav: nav.followWaypoints(poses), waypoint_feedback(order, route.return_to_start)
+    )
+    return RouteSubmitted(
+        status="stop the running task." if task is None else "accepted",
+        task_id=None if task is None else task.id,
+        order=order,
+        stops=[GoalCheck(**check) for check in checks],
+        estimated_distance=distance if math.isfinite(distance) else None,
+        planning_ms=planning_ms,
+    )
+
+@robot_router.get("/robot/tasks/{task_id}", response_model=TaskStatus, summary="Get a navigation task's progress")
+def get_task(task_id: str, robot: Robot = Depends(robot_from_path)):
+    readiness.require(robot.navigation)
+    task = robot.tasks.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Unknown task")
+    return TaskStatus(**task.snapshot())
+
+@robot_router.post("/robot/tasks/{task_id}/cancel", response_model=TaskStatus, summary="Cancel a navigation task")
+def cancel_task_by_id(task_id: str, robot: Robot = Depends(robot_from_path)):
+    readiness.require(robot.navigation)
+    task = robot.tasks.cancel(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Unknown task")
+    return TaskStatus(**task.snapshot())
+
+@robot_router.websocket("/robot/tasks/{task_id}/stream")
+async def websocket_task(websocket: WebSocket, task_id: str, robot: Robot = Depends(robot_from_path)):
+    """Push the task's status whenever it changes, ending once it has finished."""
+    await websocket.accept()
+    if not readiness.ready(robot.navigation):
+        await websocket.close(code=1013)
+        return
+    if ROLE == "worker":
+        # The same route without /stream, with any /robots/{robot_id} prefix.
+        task_path = websocket.url.path.removesuffix("/stream")
+        try:
+            await relay_polled(
+                websocket, lambda: bridge_client.get(task_path), FEEDBACK_PERIOD,
+                finished=lambda body: body["state"] in ("succeeded", "canceled", "failed", "rejected"),
+            )
+        except WebSocketDisconnect:
+            pass
+        return
+    task = robot.tasks.get(task_id)
+    if task is None:
+        await websocket.close(code=4404)
+        return
+
+    updates = robot.tasks.listen(task_id)
+    try:
+        snapshot = task.snapshot()
+        while True:
+            await websocket.send_json(snapshot)
+            if snapshot["state"] in ("succeeded", "canceled", "failed", "rejected"):
+                break
+            snapshot = await updates.get()
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        robot.tasks.unlisten(task_id, updates)
+
+@robot_router.get("/robot/position", response_model=positionOutput, summary="Get robot position from AMCL")
+def get_amcl_pose(robot: Robot = Depends(robot_from_path)):
+    x, y = robot.xy()
+    return positionOutput(x = x, y = y)
     
-@app.get("/robot/cancel")
-def cancel_task():
-    navigator.cancelTask()
+@robot_router.websocket("/robot/pose/stream")
+async def websocket_pose(
+    websocket: WebSocket,
+    max_rate: float = Query(10.0, gt=0, le=100, description="Maximum messages per second"),
+    min_distance: float = Query(0.0, ge=0, description="Skip moves shorter than this, in meters"),
+    min_angle: float = Query(0.0, ge=0, description="...and turns smaller than this, in radians"),
+    robot: Robot = Depends(robot_from_path),
+):
+    """Push x, y, yaw, covariance and stamp from AMCL; a stationary robot sends nothing."""
+    if await _refuse_unfollowed(websocket, robot):
+        return
+    await websocket.accept()
 
-@app.websocket("/robot/velocity")
-async def websocket_cmd_vel(websocket: WebSocket):
+    async def send():
+        async for pose in robot.pose_stream.poses(max_rate, min_distance, min_angle):
+            await websocket.send_json(pose)
+
+    try:
+        await _until_disconnect(websocket, send())
+    except WebSocketDisconnect:
+        pass
+
+@robot_router.get("/robot/trajectory", summary="Get the path the robot has driven")
+def get_trajectory(
+    start: Optional[float] = Query(None, description="Unix time of the first sample"),
+    end: Optional[float] = Query(None, description="Unix time of the last sample"),
+    map_name: Optional[str] = Query(None, description="Map whose resolution turns tolerance_px into meters"),
+    tolerance_px: float = Query(1.0, ge=0, description="Simplification tolerance in map pixels"),
+    tolerance: float = Query(0.05, ge=0, description="Simplification tolerance in meters, without map_name"),
+    robot: Robot = Depends(robot_from_path),
+):
+    if map_name:
+        _check_map_name(map_name)
+        entry = map_catalog.get(map_name)
+        if entry is None:
+            raise HTTPException(status_code=404, detail=f"Map '{map_name}' not found")
+        tolerance = tolerance_px * entry["resolution"]
+
+    samples = robot.trajectory.window(start, end)
+    kept = samples[simplify(samples[:, 1:3], tolerance)]
+    return {
+        "samples": len(samples),
+        "tolerance": tolerance,
+        "points": [{"t": t, "x": x, "y": y, "yaw": yaw} for t, x, y, yaw in kept.tolist()],
+    }
+
+@robot_router.get("/robot/cancel")
+def cancel_task(robot: Robot = Depends(robot_from_path)):
+    readiness.require(robot.navigation)
+    robot.tasks.cancel()
+
+@robot_router.websocket("/robot/velocity")
+async def websocket_cmd_vel(websocket: WebSocket, robot: Robot = Depends(robot_from_path)):
+    # A worker only has a command queue for the first robot.
+    if await _refuse_unfollowed(websocket, robot):
+        return
     await websocket.accept()
+    if not readiness.ready("ros") or robot.cmd_vel is None:
+        await websocket.close(code=1013)
+        return
     try:
         while True:
             data = await websocket.receive_text()
@@ -345,44 +934,83 @@ async def websocket_cmd_vel(websocket: WebSocket):
                 cmd = json.loads(data)
                 linear = float(cmd.get("linear", 0.0))
                 angular = float(cmd.get("angular", 0.0))
-                if ros_node:
-                    ros_node.publish_cmd(linear, angular)
+                robot.cmd_vel.publish_cmd(linear, angular)
             except Exception as e:
                 await websocket.send_text(f"Error parsing: {e}")
     except WebSocketDisconnect:
         print("WebSocket disconnected")
 
-@app.get("/camera/stream")
-async def stream_camera(request: Request, topic: str = Query("/camera/image_raw")):
-    url = f"http://127.0.0.1:8080/stream?topic={topic}"
-    boundary = "frame"
+@robot_router.websocket("/robot/teleop")
+async def websocket_teleop(
+    websocket: WebSocket,
+    rate: float = Query(20.0, gt=0, le=100, description="Control loop rate in Hz"),
+    timeout: float = Query(0.5, gt=0, le=MAX_TIMEOUT, description="Deadman timeout in seconds"),
+    robot: Robot = Depends(robot_from_path),
+):
+    """Teleop with binary <Iff> frames, latest-wins coalescing and a deadman watchdog."""
+    if await _refuse_unfollowed(websocket, robot):
+        return
+    await websocket.accept()
+    if not readiness.ready("ros") or robot.cmd_vel is None:
+        await websocket.close(code=1013)
+        return
 
-    # JPEG start/end markers
-    JPEG_START = b'\xff\xd8'
-    JPEG_END = b'\xff\xd9'
+    session = TeleopSession(robot.cmd_vel.publish_cmd, rate, timeout)
 
-    async def generate():
+    async def report(stats):
         try:
-            async with httpx.AsyncClient() as client:
-                async with client.stream("GET", url) as response:
-                    if response.status_code != 200:
-                        raise HTTPException(status_code=response.status_code, detail="Error fetching stream")
-
-                    buffer = b""
-                    async for chunk in response.aiter_bytes():
-                        buffer += chunk
-                        while JPEG_START in buffer and JPEG_END in buffer:
-                            start = buffer.find(JPEG_START)
-                            end = buffer.find(JPEG_END, start) + 2
-                            if end > start:
-                                frame = buffer[start:end]
-                                buffer = buffer[end:]
-                                yield (
-                                    f"--{boundary}\r\n"
-                                    f"Content-Type: image/jpeg\r\n"
-                                    f"Content-Length: {len(frame)}\r\n\r\n"
-                                ).encode("utf-8") + frame + b"\r\n"
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to stream: {str(e)}")
-
-    return StreamingResponse(generate(), media_type=f"multipart/x-mixed-replace; boundary={boundary}")
\ No newline at end of file
+            await websocket.send_json(stats)
+        except Exception:
+            pass
+
+    control = asyncio.create_task(session.run(report))
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                session.submit_frame(message["bytes"])
+            elif message.get("text") is not None:
+                session.submit_json(message["text"])
+    finally:
+        control.cancel()
+        session.stop()
+        print(f"Teleop session ended: {session.stats()}")
+
+@robot_router.get("/camera/stream")
+async def stream_camera(
+    request: Request,
+    topic: Optional[str] = Query(None, description=f"Defaults to {CAMERA_TOPIC} in the robot's namespace"),
+    source: str = Query(CAMERA_SOURCE, description="'web_video_server' or 'ros' (in-process, default topic only)"),
+    profile: str = Query("full", description="Quality profile: " + ", ".join(PROFILES)),
+    max_width: Optional[int] = Query(None, ge=16, description="Overrides the profile's maximum width"),
+    quality: Optional[int] = Query(None, ge=1, le=100, description="Overrides the profile's JPEG quality"),
+    max_fps: Optional[float] = Query(None, gt=0, description="Overrides the profile's frame rate cap"),
+    adaptive: bool = Query(False, description="Move between profiles based on measured send latency"),
+    robot: Robot = Depends(robot_from_path),
+):
+    if profile not in PROFILES:
+        raise HTTPException(status_code=400, detail=f"Unknown profile '{profile}'")
+
+    tier = PROFILES[profile]._replace(**{
+        field: value for field, value in
+        (("max_width", max_width), ("quality", quality), ("max_fps", max_fps))
+        if value is not None
+    })
+
+    topic = topic or robot.topic(CAMERA_TOPIC)
+    if source == "ros" and robot.camera and topic == robot.camera.topic:
+        frames = camera_tiers.frames(
+            f"ros:{topic}", tier, adaptive, lambda key: PushedStream(key, robot.camera)
+        )
+    elif source in ("ros", "web_video_server"):
+        frames = camera_tiers.frames(f"{VIDEO_SERVER}/stream?topic={topic}", tier, adaptive)
+    else:
+        raise HTTPException(status_code=400, detail=f"Unknown source '{source}'")
+
+    return StreamingResponse(frames, media_type=MJPEG_MEDIA_TYPE)
+
+# After every robot route: once for the first robot, once per robot under /robots/{robot_id}.
+app.include_router(robot_router)
+app.include_router(robot_router, prefix="/robots/{robot_id}")
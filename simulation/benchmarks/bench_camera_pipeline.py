@@ -0,0 +1,126 @@
+"""Compare /camera/stream fed by web_video_server with the in-process ROS source.
+
+Run it inside the simulation container while the API is up:
+
+    python benchmarks/bench_camera_pipeline.py --duration 20
+
+For each source it reads /camera/stream while an rclpy subscriber watches the
+same camera topic. Frames are matched by their image stamp (``X-Timestamp``),
+so the reported latency is the time from a frame appearing on the ROS graph to
+it reaching an HTTP client. CPU is sampled from /proc for the API and
+web_video_server processes.
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+import httpx
+import rclpy
+from rclpy.node import Node
+from rclpy.qos import qos_profile_sensor_data
+from sensor_msgs.msg import CompressedImage
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from mjpeg import MJPEGSplitter
+
+PROCESSES = ("uvicorn", "web_video_server")
+
+
+class StampRecorder(Node):
+    def __init__(self, topic):
+        super().__init__("camera_pipeline_benchmark")
+        self.arrivals = {}
+        self.create_subscription(CompressedImage, topic, self.callback, qos_profile_sensor_data)
+
+    def callback(self, msg):
+        stamp = round(msg.header.stamp.sec + msg.header.stamp.nanosec * 1e-9, 6)
+        self.arrivals.setdefault(stamp, time.time())
+
+
+def process_ticks():
+    """Return {name: cpu ticks} summed over processes whose cmdline matches."""
+    ticks = dict.fromkeys(PROCESSES, 0)
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                cmdline = f.read().decode(errors="replace")
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        for name in PROCESSES:
+            if name in cmdline:
+                ticks[name] += int(fields[11]) + int(fields[12])
+    return ticks
+
+
+def read_stream(url, duration):
+    received = []
+    deadline = time.monotonic() + duration
+    splitter = MJPEGSplitter()
+    with httpx.stream("GET", url, timeout=None) as response:
+        for chunk in response.iter_raw():
+            for frame in splitter.feed(chunk):
+                received.append((time.time(), splitter.timestamp, len(frame)))
+            if time.monotonic() > deadline:
+                break
+    return received
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run(api, source, recorder, duration):
+    url = f"{api}/camera/stream?source={source}"
+    recorder.arrivals.clear()
+    hz = os.sysconf("SC_CLK_TCK")
+    before = process_ticks()
+    started = time.monotonic()
+    received = read_stream(url, duration)
+    elapsed = time.monotonic() - started
+    after = process_ticks()
+
+    latencies = [
+        (arrived - recorder.arrivals[round(stamp, 6)]) * 1000
+        for arrived, stamp, _ in received
+        if stamp is not None and round(stamp, 6) in recorder.arrivals
+    ]
+    print(f"[{source}]")
+    print(f"  frames:  {len(received)} ({len(received) / elapsed:.1f} fps, "
+          f"{sum(size for *_, size in received) / elapsed / 1e6:.2f} MB/s)")
+    if latencies:
+        print(f"  latency: p50 {statistics.median(latencies):.1f} ms, "
+              f"p99 {percentile(latencies, 0.99):.1f} ms ({len(latencies)} matched)")
+    else:
+        print("  latency: no frames matched by stamp")
+    for name in PROCESSES:
+        print(f"  cpu {name}: {(after[name] - before[name]) / hz / elapsed * 100:.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api", default="http://127.0.0.1:8000")
+    parser.add_argument("--topic", default="/camera/image_raw/compressed")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--sources", nargs="+", default=["web_video_server", "ros"])
+    args = parser.parse_args()
+
+    rclpy.init()
+    recorder = StampRecorder(args.topic)
+    threading.Thread(target=rclpy.spin, args=(recorder,), daemon=True).start()
+    try:
+        for source in args.sources:
+            run(args.api, source, recorder, args.duration)
+    finally:
+        recorder.destroy_node()
+        rclpy.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Compare the old ``buffer += chunk`` frame splitting with MJPEGSplitter.
+
+Feed it a recorded stream, e.g.
+
+    curl -s "http://localhost:8080/stream?topic=/camera/image_raw" --max-time 10 > camera.mjpeg
+    python benchmarks/bench_mjpeg.py camera.mjpeg
+
+Without a recording it synthesizes web_video_server style parts of roughly
+720p JPEG size.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from mjpeg import MJPEGSplitter, JPEG_START, JPEG_END
+
+
+def legacy_split(chunks):
+    """The splitting loop the stream proxies used before MJPEGSplitter."""
+    count = 0
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        while JPEG_START in buffer and JPEG_END in buffer:
+            start = buffer.find(JPEG_START)
+            end = buffer.find(JPEG_END, start) + 2
+            if end > start:
+                buffer[start:end]  # The frame copy the old loop made, kept for its cost.
+                buffer = buffer[end:]
+                count += 1
+    return count
+
+
+def splitter_split(chunks):
+    count = 0
+    splitter = MJPEGSplitter()
+    for chunk in chunks:
+        for frame in splitter.feed(chunk):
+            count += 1
+    return count
+
+
+def synthetic_stream(frames, frame_size):
+    body = os.urandom(frame_size).replace(b"\xff", b"\x00")
+    jpeg = JPEG_START + body + JPEG_END
+    part = (
+        b"--boundarydonotcross\r\n"
+        b"Content-type: image/jpeg\r\n"
+        b"Content-Length: %d\r\n"
+        b"X-Timestamp: 0.000000\r\n\r\n" % len(jpeg)
+    ) + jpeg + b"\r\n"
+    return part * frames
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def run(name, split, chunks, total_bytes, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = split(chunks)
+        best = min(best, time.perf_counter() - started)
+    print(
+        f"{name:>10}: {count} frames in {best * 1000:8.1f} ms "
+        f"({total_bytes / best / 1e6:8.1f} MB/s, {count / best:8.0f} frames/s)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", nargs="?", help="file with raw MJPEG stream bytes")
+    parser.add_argument("--frames", type=int, default=300, help="synthetic frame count")
+    parser.add_argument("--frame-size", type=int, default=120_000, help="synthetic JPEG size in bytes")
+    parser.add_argument("--chunk-size", type=int, default=4096, help="bytes per network read")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.recording:
+        with open(args.recording, "rb") as f:
+            data = f.read()
+    else:
+        data = synthetic_stream(args.frames, args.frame_size)
+
+    chunks = chunked(data, args.chunk_size)
+    print(f"{len(data) / 1e6:.1f} MB in {len(chunks)} chunks of {args.chunk_size} bytes")
+    run("legacy", legacy_split, chunks, len(data), args.repeat)
+    run("splitter", splitter_split, chunks, len(data), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+"""Benchmark the API's hot paths without ROS, Nav2 or a camera.
+
+    python benchmarks/bench_offline.py --json results.json
+    python benchmarks/bench_offline.py --compare results.json
+
+Starts ``offline_server.py`` (the API on fake ROS with a fake web_video_server)
+against a temporary copy of ``maps/``, then drives each scenario under
+concurrent load and reports throughput, p50/p99 latency, and the server's CPU
+time and resident memory over the scenario. ``map_callback`` is timed
+in-process. Runs on any Linux machine with the Python requirements installed.
+
+Absolute numbers depend on the machine, so every run also times a fixed
+calibration loop; ``--compare`` scales the baseline by the ratio of the two
+calibrations before flagging anything more than ``--threshold`` worse.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+import websockets
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SIMULATION_DIR = os.path.join(BENCH_DIR, "..")
+sys.path.insert(0, SIMULATION_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import fakes  # noqa: E402
+
+# Metrics where a larger value is better; everything else is a latency or a cost.
+HIGHER_IS_BETTER = ("rps", "fps", "msgs_per_s", "mb_per_s")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentiles(samples):
+    if not samples:
+        return {"p50_ms": None, "p99_ms": None}
+    values = np.asarray(samples) * 1000
+    return {"p50_ms": float(np.percentile(values, 50)), "p99_ms": float(np.percentile(values, 99))}
+
+
+def calibrate(rounds=5):
+    """Seconds for a fixed mix of interpreter and numpy work; the best of several rounds."""
+    rng = np.random.default_rng(0)
+    grid = rng.integers(-1, 101, size=(512, 512), dtype=np.int8)
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        total = 0
+        for i in range(200_000):
+            total += i * i % 7
+        for _ in range(20):
+            np.sort(grid, axis=None)
+        json.dumps([{"x": i, "y": i * 0.5} for i in range(20_000)])
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+class ProcessSampler:
+    """CPU seconds and resident memory of a process, read from /proc."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.ticks = os.sysconf("SC_CLK_TCK")
+
+    def cpu_seconds(self):
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self.ticks
+
+    def rss_mb(self):
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+        return None
+
+
+class Scenario:
+    """Times one scenario and attaches the server's CPU and memory use to its result."""
+
+    def __init__(self, sampler):
+        self.sampler = sampler
+
+    async def run(self, coroutine):
+        cpu = self.sampler.cpu_seconds()
+        started = time.perf_counter()
+        rss_peak = self.sampler.rss_mb()
+        task = asyncio.ensure_future(coroutine)
+        while not task.done():
+            await asyncio.sleep(0.1)
+            rss_peak = max(rss_peak, self.sampler.rss_mb())
+        result = task.result()
+        elapsed = time.perf_counter() - started
+        result["server_cpu_pct"] = 100 * (self.sampler.cpu_seconds() - cpu) / elapsed
+        result["server_rss_mb"] = rss_peak
+        return result
+
+
+async def request_load(client, make_request, concurrency, duration):
+    """Issue requests from ``concurrency`` workers for ``duration`` seconds."""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(n):
+        nonlocal errors
+        i = n
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await make_request(client, i)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 500:
+                errors += 1
+            i += concurrency
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"requests": len(latencies), "rps": len(latencies) / elapsed, "errors": errors, **percentiles(latencies)}
+
+
+async def stream_load(base, path, clients, duration):
+    """Hold ``clients`` MJPEG viewers open and measure delivered frames and gaps between them."""
+    marker = b"--frame\r\n"
+    gaps = []
+    counts = []
+    received = []
+
+    async def viewer():
+        frames = 0
+        size = 0
+        last = None
+        tail = b""
+        async with httpx.AsyncClient(base_url=base, timeout=None) as client:
+            async with client.stream("GET", path) as response:
+                deadline = time.perf_counter() + duration
+                async for chunk in response.aiter_raw():
+                    now = time.perf_counter()
+                    size += len(chunk)
+                    found = (tail + chunk).count(marker)
+                    tail = chunk[-len(marker):]
+                    for _ in range(found):
+                        if last is not None:
+                            gaps.append(now - last)
+                        last = now
+                        frames += 1
+                    if now >= deadline:
+                        break
+        counts.append(frames)
+        received.append(size)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(viewer() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    return {
+        "clients": clients,
+        "fps": sum(counts) / elapsed / clients,
+        "mb_per_s": sum(received) / elapsed / 1e6,
+        **{f"frame_gap_{k}": v for k, v in percentiles(gaps).items()},
+    }
+
+
+async def velocity_load(base, clients, messages):
+    """Send ``messages`` commands on each of ``clients`` velocity sockets as fast as they go."""
+    url = base.replace("http://", "ws://") + "/robot/velocity"
+    async with httpx.AsyncClient(base_url=base) as client:
+        await client.get("/_bench/cmd_vel", params={"reset": True})
+
+    async def sender():
+        async with websockets.connect(url) as ws:
+            for _ in range(messages):
+                await ws.send(json.dumps({"linear": 0.1, "angular": time.time()}))
+            # A round trip so every command above has been handled before closing.
+            await ws.send("not json")
+            await ws.recv()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sender() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    async with httpx.AsyncClient(base_url=base) as client:
+        body = (await client.get("/_bench/cmd_vel", params={"reset": True})).json()
+    return {
+        "clients": clients,
+        "msgs_per_s": len(body["latencies"]) / elapsed,
+        "published": len(body["latencies"]),
+        **percentiles(body["latencies"]),
+    }
+
+
+def map_callback_load(rounds, size):
+    """Time MapImagePublisher.map_callback in-process for full, partial and unchanged maps."""
+    from ros_nodes import MapImagePublisher
+
+    node = MapImagePublisher()
+    cells = fakes.synthetic_cells(size)
+    results = {}
+    cases = {
+        "full": lambda step: fakes.synthetic_cells(size, seed=step),
+        "partial": lambda step: fakes.grow_map(cells, step).copy(),
+        "unchanged": lambda step: cells,
+    }
+    for name, make in cases.items():
+        messages = [fakes.occupancy_grid(make(step)) for step in range(rounds)]
+        node.map_callback(messages[0])
+        timings = []
+        for msg in messages:
+            started = time.perf_counter()
+            node.map_callback(msg)
+            timings.append(time.perf_counter() - started)
+        results[f"map_callback_{name}"] = {"calls": rounds, **percentiles(timings)}
+    return results
+
+
+def wait_ready(base, timeout):
+    deadline = time.perf_counter() + timeout
+    with httpx.Client(base_url=base, timeout=2.0) as client:
+        while time.perf_counter() < deadline:
+            try:
+                response = client.get("/ready")
+                if response.status_code == 200 and client.get("/robot/position").json().get("x"):
+                    return True
+            except httpx.TransportError:
+                pass
+            time.sleep(0.1)
+    return False
+
+
+async def run_scenarios(base, sampler, args):
+    scenario = Scenario(sampler)
+    results = {}
+    rng = np.random.default_rng(0)
+    # Free cells of the house map, so goals are accepted rather than rejected.
+    goals = [(float(x), float(y)) for x, y in rng.uniform((-2.0, -0.5), (2.0, 0.5), size=(256, 2))]
+    cache_dir = os.path.join(args.maps_dir, ".cache", "turtlebot3_house")
+
+    for clients in args.stream_clients:
+        results[f"camera_stream_x{clients}"] = await scenario.run(
+            stream_load(base, "/camera/stream", clients, args.duration)
+        )
+    results["mapping_stream_x4"] = await scenario.run(stream_load(base, "/mapping/stream", 4, args.duration))
+
+    async with httpx.AsyncClient(base_url=base, timeout=30.0) as client:
+        async def cold_download(client, i):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            return await client.get("/map/download", params={"map_name": "turtlebot3_house"})
+
+        async def warm_download(client, i):
+            return await client.get("/map/download", params={"map_name": "turtlebot3_house"})
+
+        async def validate(client, i):
+            points = [{"x": x, "y": y} for x, y in goals[i % 200:i % 200 + 50]]
+            return await client.post("/robot/goal/validate", json={"points": points})
+
+        async def preview_cached(client, i):
+            return await client.post("/robot/path/preview", json={"x": 1.0, "y": 0.0})
+
+        async def preview_uncached(client, i):
+            x, y = rng.uniform((-2.0, -0.5), (2.0, 0.5))
+            return await client.post("/robot/path/preview", json={"x": float(x), "y": float(y)})
+
+        async def goal(client, i):
+            response = await client.post("/robot/goal", json={"x": 1.0, "y": 0.0})
+            await client.get("/robot/cancel")
+            return response
+
+        load = [
+            ("map_download_cold", cold_download, 1),
+            ("map_download_warm", warm_download, args.concurrency),
+            ("goal_validate_50", validate, args.concurrency),
+            ("path_preview_cached", preview_cached, args.concurrency),
+            ("path_preview_uncached", preview_uncached, args.concurrency),
+            ("goal_submit_cancel", goal, 1),
+        ]
+        for name, make_request, concurrency in load:
+            if name in args.skip:
+                continue
+            results[name] = await scenario.run(request_load(client, make_request, concurrency, args.duration))
+
+    for clients in args.velocity_clients:
+        results[f"velocity_ws_x{clients}"] = await scenario.run(velocity_load(base, clients, args.velocity_messages))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return ``[(scenario, metric, baseline, current, change)]`` for regressions beyond ``threshold``."""
+    # Times scale with the machine, throughputs inversely.
+    speed = results["calibration_s"] / baseline["calibration_s"]
+    regressions = []
+    for name, metrics in results["scenarios"].items():
+        for metric, current in metrics.items():
+            before = baseline["scenarios"].get(name, {}).get(metric)
+            if not isinstance(current, (int, float)) or not before or current is None:
+                continue
+            if metric.endswith("_ms"):
+                expected = before * speed
+                change = current / expected - 1
+            elif metric in HIGHER_IS_BETTER:
+                expected = before / speed
+                change = expected / current - 1 if current else float("inf")
+            else:
+                continue
+            if change > threshold:
+                regressions.append((name, metric, expected, current, change))
+    return regressions
+
+
+def print_results(results):
+    columns = ("rps", "fps", "msgs_per_s", "mb_per_s", "p50_ms", "p99_ms",
+               "frame_gap_p50_ms", "frame_gap_p99_ms", "server_cpu_pct", "server_rss_mb")
+    print(f"calibration: {results['calibration_s'] * 1000:.0f} ms")
+    print(f"{'scenario':<26}" + "".join(f"{c:>17}" for c in columns))
+    for name, metrics in results["scenarios"].items():
+        cells = []
+        for column in columns:
+            value = metrics.get(column)
+            cells.append(f"{value:>17.2f}" if isinstance(value, (int, float)) else f"{'-':>17}")
+        print(f"{name:<26}" + "".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per load scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--stream-clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--velocity-clients", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--velocity-messages", type=int, default=2000)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--frames", help="Directory of recorded JPEG frames for the fake camera")
+    parser.add_argument("--map-rounds", type=int, default=200)
+    parser.add_argument("--map-size", type=int, default=384)
+    parser.add_argument("--skip", nargs="*", default=[], help="Scenario names to leave out")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Baseline results to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown, 0.25 is 25%%")
+    args = parser.parse_args()
+
+    fakes.install()
+    results = {"calibration_s": calibrate(), "scenarios": {}}
+    results["scenarios"].update(map_callback_load(args.map_rounds, args.map_size))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        args.maps_dir = os.path.join(workdir, "maps")
+        shutil.copytree(os.path.join(SIMULATION_DIR, "maps"), args.maps_dir, ignore=shutil.ignore_patterns(".*"))
+        port = free_port()
+        command = [
+            sys.executable, os.path.join(BENCH_DIR, "offline_server.py"),
+            "--port", str(port), "--video-port", str(free_port()),
+            "--fps", str(args.fps), "--width", str(args.width), "--height", str(args.height),
+        ]
+        if args.frames:
+            command += ["--frames", args.frames]
+        server = subprocess.Popen(
+            command, env={**os.environ, "NAVIMATE_MAPS_DIR": args.maps_dir, "NAVIMATE_FAKE_DRIVE_SECONDS": "60"},
+        )
+        try:
+            base = f"http://127.0.0.1:{port}"
+            if not wait_ready(base, args.timeout):
+                print(f"offline server not ready after {args.timeout:.0f} s")
+                sys.exit(1)
+            results["scenarios"].update(asyncio.run(run_scenarios(base, ProcessSampler(server.pid), args)))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, metric, expected, current, change in regressions:
+            print(f"REGRESSION {name} {metric}: {current:.2f} vs {expected:.2f} expected (+{change:.0%})")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Replay a recording through the ROS nodes and time their callbacks.
+
+    python benchmarks/bench_replay.py session.navrec
+    python benchmarks/bench_replay.py --synthesize 60 synthetic.navrec
+
+Feeds every record of a recording (made with ``POST /recording/start``) to
+``AMCLListener``, ``MapImagePublisher`` and ``CameraStreamer`` in-process,
+as fast as they go or at ``--speed``, and reports per-topic throughput and
+p50/p99 callback time. Without rclpy the nodes run on the stand-ins in
+``fakes``, so a session captured on the robot can be replayed on any machine.
+``--synthesize`` writes a recording of the fake publishers instead.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+sys.path.insert(0, BENCH_DIR)
+
+import fakes  # noqa: E402
+
+
+def synthesize(path, seconds, pose_rate=10.0, map_rate=1.0, fps=15.0, map_size=384):
+    """Write a recording of synthetic poses, a growing map and camera frames."""
+    from recording import FRAME, MAP, POSE, TopicRecorder, encode_frame, encode_grid, encode_pose
+
+    recorder = TopicRecorder(path)
+    frames = fakes.synthetic_frames(30, 640, 480)
+    cells = fakes.synthetic_cells(map_size)
+    start = time.time()
+    events = []
+    for i in range(int(seconds * pose_rate)):
+        events.append((i / pose_rate, "pose", i))
+    for i in range(int(seconds * map_rate)):
+        events.append((i / map_rate, "map", i))
+    for i in range(int(seconds * fps)):
+        events.append((i / fps, "frame", i))
+    for at, kind, i in sorted(events, key=lambda e: e[0]):
+        if kind == "pose":
+            recorder.write(POSE, encode_pose(fakes.amcl_pose(at)), start + at)
+        elif kind == "map":
+            recorder.write(MAP, encode_grid(fakes.occupancy_grid(fakes.grow_map(cells, i))), start + at)
+        else:
+            recorder.write(FRAME, encode_frame(frames[i % len(frames)], start + at), start + at)
+    recorder.close()
+    return recorder.status()
+
+
+class TimedHandlers(dict):
+    """Wraps replay handlers to collect the time each call takes, per topic."""
+
+    def __init__(self, handlers):
+        super().__init__()
+        self.timings = {topic: [] for topic in handlers}
+        for topic, handler in handlers.items():
+            self[topic] = self._timed(handler, self.timings[topic])
+
+    @staticmethod
+    def _timed(handler, timings):
+        def timed(payload):
+            started = time.perf_counter()
+            handler(payload)
+            timings.append(time.perf_counter() - started)
+        return timed
+
+
+class CountingStream:
+    """A PushedStream stand-in that only counts frames, so the camera path runs fully."""
+
+    def __init__(self):
+        self.frames = 0
+
+    def push(self, jpeg, timestamp=None):
+        self.frames += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recording")
+    parser.add_argument("--speed", default="max", help="1, 4x or max")
+    parser.add_argument("--synthesize", type=float, metavar="SECONDS",
+                        help="Write a synthetic recording of this length to the path and exit")
+    args = parser.parse_args()
+
+    try:
+        import rclpy
+    except ImportError:
+        fakes.install()
+        import rclpy
+        print("rclpy not found; replaying into the stand-in nodes")
+
+    if args.synthesize:
+        print(synthesize(args.recording, args.synthesize))
+        return
+
+    from recording import TOPICS, Recording, Replayer, parse_speed
+    from ros_nodes import AMCLListener, CameraStreamer, MapImagePublisher, replay_handlers
+
+    if not rclpy.ok():
+        rclpy.init()
+    amcl_node = AMCLListener()
+    map_image_node = MapImagePublisher()
+    camera_node = CameraStreamer("/camera/image_raw")
+    stream = CountingStream()
+    camera_node.stream = stream
+
+    with Recording(args.recording) as recording:
+        print(recording.summary())
+
+    handlers = TimedHandlers(replay_handlers(amcl_node, map_image_node, camera_node))
+    replayer = Replayer(args.recording, handlers, parse_speed(args.speed))
+    started = time.perf_counter()
+    replayer.run()
+    elapsed = time.perf_counter() - started
+    print(f"replayed in {elapsed:.2f} s ({replayer.state}), final lag {replayer.lag * 1000:.1f} ms")
+
+    print(f"{'topic':<12}{'records':>10}{'per s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    for topic, timings in handlers.timings.items():
+        if not timings:
+            continue
+        values = np.asarray(timings) * 1000
+        print(
+            f"{TOPICS[topic]:<12}{len(timings):>10}{len(timings) / elapsed:>12.0f}"
+            f"{np.percentile(values, 50):>10.3f}{np.percentile(values, 99):>10.3f}"
+        )
+    print(f"camera frames pushed: {stream.frames}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Measure what each extra robot costs one API process.
+
+    python benchmarks/bench_robots.py --robots 1 2 4 8 16
+
+For each fleet size the API serves ``NAVIMATE_ROBOTS=r1,...,rN`` on the
+stand-ins in ``fakes``, every robot publishing its own AMCL poses at
+``--pose-rate`` on one shared map. The table shows the server's threads, memory
+and CPU while idle, then the latency of position requests spread over all
+robots while each robot has a pose stream open and takes velocity commands.
+The last line is the cost per robot past the first, from a linear fit.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+import websockets
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SIMULATION_DIR = os.path.join(BENCH_DIR, "..")
+sys.path.insert(0, BENCH_DIR)
+
+from bench_offline import ProcessSampler, free_port, percentiles, wait_ready  # noqa: E402
+
+
+def threads(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("Threads:"):
+                return int(line.split()[1])
+    return None
+
+
+def idle(sampler, seconds):
+    """Server CPU percent over ``seconds`` with only the fake topics running."""
+    before = sampler.cpu_seconds()
+    time.sleep(seconds)
+    return (sampler.cpu_seconds() - before) / seconds * 100
+
+
+async def load(base, robot_ids, concurrency, duration, rate):
+    """Position requests over every robot while each one streams poses and takes commands."""
+    ws_base = base.replace("http://", "ws://")
+    deadline = time.perf_counter() + duration
+    latencies = []
+    poses = {robot_id: 0 for robot_id in robot_ids}
+
+    async def requests(client, worker):
+        i = worker
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.get(f"/robots/{robot_ids[i % len(robot_ids)]}/robot/position")
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+            i += concurrency
+
+    async def pose_stream(robot_id):
+        async with websockets.connect(f"{ws_base}/robots/{robot_id}/robot/pose/stream") as ws:
+            while time.perf_counter() < deadline:
+                try:
+                    await asyncio.wait_for(ws.recv(), timeout=max(0.01, deadline - time.perf_counter()))
+                    poses[robot_id] += 1
+                except asyncio.TimeoutError:
+                    break
+
+    async def velocity(robot_id):
+        async with websockets.connect(f"{ws_base}/robots/{robot_id}/robot/velocity") as ws:
+            while time.perf_counter() < deadline:
+                await ws.send(json.dumps({"linear": 0.1, "angular": time.time()}))
+                await asyncio.sleep(1.0 / rate)
+
+    async with httpx.AsyncClient(base_url=base, timeout=30.0) as client:
+        await client.get("/_bench/cmd_vel", params={"reset": True})
+        await asyncio.gather(
+            *(requests(client, worker) for worker in range(concurrency)),
+            *(pose_stream(robot_id) for robot_id in robot_ids),
+            *(velocity(robot_id) for robot_id in robot_ids),
+        )
+        await asyncio.sleep(0.2)
+        commands = (await client.get("/_bench/cmd_vel", params={"reset": True})).json()["latencies"]
+    return {
+        "rps": len(latencies) / duration,
+        **percentiles(latencies),
+        **{f"cmd_vel_{k}": v for k, v in percentiles(commands).items()},
+        "poses_per_robot": min(poses.values()) / duration,
+    }
+
+
+def measure(count, args):
+    robot_ids = [f"r{i + 1}" for i in range(count)]
+    port = free_port()
+    env = {
+        **os.environ, "NAVIMATE_MAPS_DIR": args.maps_dir, "NAVIMATE_ROBOTS": ",".join(robot_ids),
+        "NAVIMATE_ROS_THREADS": str(args.ros_threads),
+    }
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "offline_server.py"), "--port", str(port),
+         "--video-port", str(free_port()), "--pose-rate", str(args.pose_rate)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        if not wait_ready(base, args.timeout):
+            raise RuntimeError(f"{count} robots: not ready after {args.timeout:.0f} s")
+        sampler = ProcessSampler(server.pid)
+        row = {"robots": count, "threads": threads(server.pid), "idle_cpu": idle(sampler, args.idle)}
+        row["rss_mb"] = sampler.rss_mb()
+        before = sampler.cpu_seconds()
+        row.update(asyncio.run(load(base, robot_ids, args.concurrency, args.duration, args.rate)))
+        row["load_cpu"] = (sampler.cpu_seconds() - before) / args.duration * 100
+        return row
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--robots", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--pose-rate", type=float, default=10.0, help="AMCL poses per second per robot")
+    parser.add_argument("--rate", type=float, default=20.0, help="Velocity commands per second per robot")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--idle", type=float, default=3.0, help="Seconds of idle CPU sampling")
+    parser.add_argument("--ros-threads", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", help="Write the rows to this file")
+    args = parser.parse_args()
+
+    # Column, width and decimals.
+    columns = [
+        ("robots", 7, 0), ("threads", 8, 0), ("rss_mb", 8, 1), ("idle_cpu", 9, 1), ("load_cpu", 9, 1),
+        ("rps", 8, 0), ("p50_ms", 8, 2), ("p99_ms", 8, 2), ("cmd_vel_p99_ms", 15, 2), ("poses_per_robot", 16, 1),
+    ]
+    print("".join(f"{name:>{width}}" for name, width, _ in columns))
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        args.maps_dir = os.path.join(workdir, "maps")
+        shutil.copytree(os.path.join(SIMULATION_DIR, "maps"), args.maps_dir, ignore=shutil.ignore_patterns(".*"))
+        for count in args.robots:
+            row = measure(count, args)
+            rows.append(row)
+            print("".join(
+                f"{'-':>{width}}" if row[name] is None else f"{row[name]:>{width}.{decimals}f}"
+                for name, width, decimals in columns
+            ))
+
+    if len(rows) > 1:
+        counts = np.array([row["robots"] for row in rows], dtype=float)
+        slopes = {
+            name: np.polyfit(counts, [row[name] for row in rows], 1)[0]
+            for name in ("threads", "rss_mb", "idle_cpu", "load_cpu")
+        }
+        print(
+            f"per robot: {slopes['threads']:.1f} threads, {slopes['rss_mb']:.2f} MB, "
+            f"{slopes['idle_cpu']:.2f}% CPU idle, {slopes['load_cpu']:.2f}% CPU under load"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
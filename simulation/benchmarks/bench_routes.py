@@ -0,0 +1,77 @@
+"""Time route planning on large synthetic maps and fail if it is too slow.
+
+    python benchmarks/bench_routes.py --sizes 1000 2000 4000 --stops 19 --budget 1.0
+
+Builds a ``MapIndex`` of a building with rows of rooms, ``size`` cells square
+at 0.05 m, and plans a route through ``--stops`` random reachable stops with a
+cold ``RoutePlanner``, so the coarse grid and every pair cost are computed.
+Exits non-zero if any size takes longer than ``--budget`` seconds.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from map_index import MapIndex  # noqa: E402
+from routes import RoutePlanner  # noqa: E402
+
+FREE = 254
+OCCUPIED = 0
+META = {"resolution": 0.05, "origin": [0.0, 0.0, 0.0], "negate": 0, "occupied_thresh": 0.65, "free_thresh": 0.25}
+
+
+def building(size, room=120, door=24, seed=0):
+    """A map image of rooms in a grid, each wall with one door at a random place."""
+    rng = np.random.default_rng(seed)
+    image = np.full((size, size), FREE, dtype=np.uint8)
+    image[:4], image[-4:], image[:, :4], image[:, -4:] = OCCUPIED, OCCUPIED, OCCUPIED, OCCUPIED
+    for wall in range(room, size - 4, room):
+        image[wall:wall + 4, :] = OCCUPIED
+        image[:, wall:wall + 4] = OCCUPIED
+    for wall in range(room, size - 4, room):
+        for start in range(4, size - 4, room):
+            at = start + int(rng.integers(8, room - door - 8))
+            image[wall:wall + 4, at:at + door] = FREE
+            image[at:at + door, wall:wall + 4] = FREE
+    return image
+
+
+def time_route(size, stops, seed=0):
+    index = MapIndex(building(size, seed=seed), META, name=f"building_{size}", digest=str(size))
+    rng = np.random.default_rng(seed)
+    rows, cols = np.nonzero(index.traversable)
+    picks = rng.choice(len(rows), stops + 1, replace=False)
+    xs, ys = index.to_world(rows[picks], cols[picks])
+    points = list(zip(xs.tolist(), ys.tolist()))
+
+    planner = RoutePlanner()
+    started = time.perf_counter()
+    order, distance = planner.plan(index, points[0], points[1:])
+    return time.perf_counter() - started, distance
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 2000, 4000])
+    parser.add_argument("--stops", type=int, default=19)
+    parser.add_argument("--budget", type=float, default=1.0, help="Seconds allowed per plan")
+    args = parser.parse_args()
+
+    print(f"{'cells':>12}{'stops':>7}{'plan s':>9}{'route m':>10}")
+    slow = []
+    for size in args.sizes:
+        seconds, distance = time_route(size, args.stops)
+        print(f"{f'{size}x{size}':>12}{args.stops:>7}{seconds:>9.3f}{distance:>10.1f}")
+        if seconds > args.budget:
+            slow.append(size)
+    if slow:
+        print(f"over the {args.budget:.2f} s budget: {', '.join(map(str, slow))}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
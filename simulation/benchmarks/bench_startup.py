@@ -0,0 +1,93 @@
+"""Measure how quickly the API starts answering and what its import costs.
+
+Run it inside the simulation container (ROS sourced, Nav2 launched or not):
+
+    python benchmarks/bench_startup.py --port 8001
+
+It prints the slowest modules of ``import api`` from ``python -X importtime``,
+then starts uvicorn and reports when ``/health`` first answers and when each
+subsystem in ``/ready`` came up.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+SIMULATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def import_profile(top):
+    """Return ``[(cumulative_us, module)]`` for the slowest imports of api."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import api"],
+        cwd=SIMULATION_DIR, capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        rows.append((int(cumulative), module.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def wait_for(client, url, deadline, accept=(200,)):
+    while time.perf_counter() < deadline:
+        try:
+            response = client.get(url)
+            if response.status_code in accept:
+                return response
+        except httpx.TransportError:
+            pass
+        time.sleep(0.02)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    print("slowest imports of api (cumulative):")
+    for cumulative, module in import_profile(args.top):
+        print(f"  {cumulative / 1000:8.1f} ms  {module}")
+
+    base = f"http://127.0.0.1:{args.port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(args.port)],
+        cwd=SIMULATION_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = started + args.timeout
+        with httpx.Client(base_url=base, timeout=2.0) as client:
+            if wait_for(client, "/health", deadline) is None:
+                print("/health never answered")
+                return
+            print(f"/health answered after {time.perf_counter() - started:.2f} s")
+
+            response = wait_for(client, "/ready", deadline)
+            if response is None:
+                response = client.get("/ready")
+                print(f"not ready after {args.timeout:.0f} s")
+            else:
+                print(f"/ready answered 200 after {time.perf_counter() - started:.2f} s")
+            body = response.json()
+            print(f"import api: {body['import_seconds'] * 1000:.0f} ms")
+            for name, subsystem in body["subsystems"].items():
+                seconds = subsystem["seconds"]
+                at = f"{seconds:.2f} s" if seconds is not None else "-"
+                print(f"  {name:<12} {subsystem['state']:<9} {at:>8}  {subsystem['error'] or ''}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
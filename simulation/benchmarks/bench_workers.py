@@ -0,0 +1,153 @@
+"""Compare one API process against a ROS bridge with several workers.
+
+    python benchmarks/bench_workers.py --workers 1 2 4 --load-processes 4
+
+For each worker count the API runs on the stand-ins in ``fakes``: one process
+as today for 1, otherwise ``offline_server.py`` as the bridge on a Unix
+socket plus ``uvicorn --workers N`` (see ``bridge.py``). Several client
+processes then load read endpoints while one WebSocket sends velocity
+commands, and the table shows request throughput and latency next to the
+command latency measured at the fake ``/cmd_vel`` publisher.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+import websockets
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SIMULATION_DIR = os.path.join(BENCH_DIR, "..")
+sys.path.insert(0, BENCH_DIR)
+
+from bench_offline import free_port, percentiles, wait_ready  # noqa: E402
+
+POINTS = [{"x": x, "y": y} for x in np.linspace(-2.0, 2.0, 10) for y in np.linspace(-0.5, 0.5, 5)]
+REQUESTS = {
+    "position": ("GET", "/robot/position", None),
+    "validate_50": ("POST", "/robot/goal/validate", {"points": [{"x": float(p["x"]), "y": float(p["y"])} for p in POINTS]}),
+    "map_download": ("GET", "/map/download?map_name=turtlebot3_house", None),
+}
+
+
+def _load(base, request, concurrency, duration, results):
+    method, path, body = REQUESTS[request]
+
+    async def run():
+        latencies = []
+        deadline = time.perf_counter() + duration
+        async with httpx.AsyncClient(base_url=base, timeout=30.0) as client:
+            async def worker():
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    await client.request(method, path, json=body)
+                    latencies.append(time.perf_counter() - started)
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies
+
+    results.put(asyncio.run(run()))
+
+
+async def _velocity(base, rate, duration):
+    url = base.replace("http://", "ws://") + "/robot/velocity"
+    async with httpx.AsyncClient(base_url=base) as client:
+        await client.get("/_bench/cmd_vel", params={"reset": True})
+    async with websockets.connect(url) as ws:
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            await ws.send(json.dumps({"linear": 0.1, "angular": time.time()}))
+            await asyncio.sleep(1.0 / rate)
+    await asyncio.sleep(0.2)
+    async with httpx.AsyncClient(base_url=base) as client:
+        return (await client.get("/_bench/cmd_vel", params={"reset": True})).json()["latencies"]
+
+
+def measure(base, request, processes, concurrency, duration, rate):
+    results = multiprocessing.Queue()
+    clients = [
+        multiprocessing.Process(target=_load, args=(base, request, concurrency, duration, results))
+        for _ in range(processes)
+    ]
+    started = time.perf_counter()
+    for client in clients:
+        client.start()
+    commands = asyncio.run(_velocity(base, rate, duration))
+    latencies = [value for _ in clients for value in results.get()]
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "rps": len(latencies) / elapsed,
+        **percentiles(latencies),
+        **{f"cmd_vel_{k}": v for k, v in percentiles(commands).items()},
+        "cmd_vel_received": len(commands),
+    }
+
+
+def start(workers, maps_dir, socket_path):
+    """Start the API with ``workers`` workers; returns ``(base_url, processes)``."""
+    port = free_port()
+    env = {
+        **os.environ, "NAVIMATE_MAPS_DIR": maps_dir, "NAVIMATE_BRIDGE_SOCKET": socket_path,
+        "NAVIMATE_BRIDGE_NAME": f"navimate-bench-{os.getpid()}",
+    }
+    server = [sys.executable, os.path.join(BENCH_DIR, "offline_server.py"), "--video-port", str(free_port())]
+    quiet = {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+    if workers == 1:
+        processes = [subprocess.Popen(server + ["--port", str(port)], env=env, **quiet)]
+    else:
+        processes = [
+            subprocess.Popen(server + ["--uds", socket_path], env={**env, "NAVIMATE_ROLE": "bridge"}, **quiet),
+            subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port),
+                 "--workers", str(workers), "--log-level", "warning"],
+                cwd=SIMULATION_DIR, env={**env, "NAVIMATE_ROLE": "worker"}, **quiet,
+            ),
+        ]
+    return f"http://127.0.0.1:{port}", processes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", nargs="+", default=list(REQUESTS), choices=list(REQUESTS))
+    parser.add_argument("--load-processes", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=8, help="Connections per load process")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--rate", type=float, default=50.0, help="Velocity commands per second")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'request':<14}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}"
+          f"{'cmd p50 ms':>12}{'cmd p99 ms':>12}{'cmds':>7}")
+    with tempfile.TemporaryDirectory() as workdir:
+        maps_dir = os.path.join(workdir, "maps")
+        shutil.copytree(os.path.join(SIMULATION_DIR, "maps"), maps_dir, ignore=shutil.ignore_patterns(".*"))
+        for workers in args.workers:
+            base, processes = start(workers, maps_dir, os.path.join(workdir, "bridge.sock"))
+            try:
+                if not wait_ready(base, args.timeout):
+                    print(f"{workers} workers: not ready after {args.timeout:.0f} s")
+                    continue
+                for request in args.requests:
+                    row = measure(base, request, args.load_processes, args.concurrency, args.duration, args.rate)
+                    print(
+                        f"{workers:>8} {request:<14}{row['rps']:>10.0f}{row['p50_ms']:>10.2f}{row['p99_ms']:>10.2f}"
+                        f"{row['cmd_vel_p50_ms']:>12.2f}{row['cmd_vel_p99_ms']:>12.2f}{row['cmd_vel_received']:>7}"
+                    )
+            finally:
+                for process in reversed(processes):
+                    process.terminate()
+                    process.wait()
+
+
+if __name__ == "__main__":
+    main()
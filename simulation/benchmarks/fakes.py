@@ -0,0 +1,501 @@
+"""Local stand-ins for the ROS graph, Nav2 and web_video_server.
+
+``install()`` registers minimal ``rclpy``, ``nav2_simple_commander``, message
+and ``cv_bridge`` modules so that ``api`` imports and starts without ROS.
+Publishers and subscriptions meet on an in-process ``GRAPH``; the synthetic
+sources below publish on it the way AMCL and the map server would.
+
+Only what the API touches is imitated. Nothing here is imported by the API
+itself; it exists for the benchmarks.
+"""
+import array
+import asyncio
+import math
+import os
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+
+
+class Message:
+    """A message whose nested fields spring into existence when first read."""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        value = Message()
+        setattr(self, name, value)
+        return value
+
+
+class Stamp:
+    def __init__(self, t=None):
+        t = time.time() if t is None else t
+        self.sec = int(t)
+        self.nanosec = int((t - int(t)) * 1e9)
+
+
+class Graph:
+    """Topic name to subscription callbacks, delivered on the publisher's thread."""
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+        self.published = {}
+
+    def subscribe(self, topic, callback):
+        with self._lock:
+            self._subscriptions.setdefault(topic, []).append(callback)
+        return (topic, callback)
+
+    def unsubscribe(self, subscription):
+        topic, callback = subscription
+        with self._lock:
+            callbacks = self._subscriptions.get(topic, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+    def publish(self, topic, msg):
+        with self._lock:
+            callbacks = list(self._subscriptions.get(topic, ()))
+            self.published[topic] = self.published.get(topic, 0) + 1
+        for callback in callbacks:
+            callback(msg)
+
+
+GRAPH = Graph()
+
+
+class Publisher:
+    def __init__(self, topic):
+        self.topic = topic
+
+    def publish(self, msg):
+        GRAPH.publish(self.topic, msg)
+
+
+class Clock:
+    def now(self):
+        return types.SimpleNamespace(to_msg=Stamp)
+
+
+class Node:
+    def __init__(self, name, *args, namespace="", **kwargs):
+        self.name = name
+        self.namespace = namespace
+        self._logger = types.SimpleNamespace(
+            debug=lambda *a: None, info=lambda *a: None, warning=print, warn=print, error=print
+        )
+
+    def resolve(self, topic):
+        return topic if topic.startswith("/") else f"{self.namespace}/{topic}"
+
+    def create_publisher(self, msg_type, topic, qos):
+        return Publisher(self.resolve(topic))
+
+    def create_subscription(self, msg_type, topic, callback, qos):
+        return GRAPH.subscribe(self.resolve(topic), callback)
+
+    def destroy_subscription(self, subscription):
+        GRAPH.unsubscribe(subscription)
+
+    def get_logger(self):
+        return self._logger
+
+    def get_clock(self):
+        return Clock()
+
+    def destroy_node(self):
+        pass
+
+
+class Executor:
+    def __init__(self, *args, **kwargs):
+        self.nodes = []
+        self._stopped = threading.Event()
+
+    def add_node(self, node):
+        self.nodes.append(node)
+
+    def spin(self):
+        # Callbacks run on the publishing threads; spinning only has to block.
+        self._stopped.wait()
+
+    def shutdown(self, *args, **kwargs):
+        self._stopped.set()
+
+
+class Future:
+    def __init__(self, finish_at):
+        self.finish_at = finish_at
+        self.cancelled = False
+
+    def done(self):
+        return self.cancelled or time.monotonic() >= self.finish_at
+
+    def result(self):
+        status = GoalStatus.STATUS_CANCELED if self.cancelled else GoalStatus.STATUS_SUCCEEDED
+        return Message(status=status, result=Message(error_code=0, error_msg=""))
+
+
+class GoalHandle:
+    """An accepted goal whose result is ``future``."""
+
+    def __init__(self, future):
+        self.future = future
+
+    def cancel_goal_async(self):
+        self.future.cancelled = True
+        return Future(0.0)
+
+
+def spin_until_future_complete(node, future, timeout_sec=None):
+    deadline = time.monotonic() + (timeout_sec if timeout_sec is not None else 1e9)
+    while not future.done() and time.monotonic() < deadline:
+        time.sleep(min(0.01, max(0.0, deadline - time.monotonic())))
+
+
+class GoalStatus:
+    STATUS_UNKNOWN = 0
+    STATUS_SUCCEEDED = 4
+    STATUS_CANCELED = 5
+    STATUS_ABORTED = 6
+
+
+class TaskResult:
+    UNKNOWN = 0
+    SUCCEEDED = 1
+    CANCELED = 2
+    FAILED = 3
+
+
+class BasicNavigator(Node):
+    """Nav2 stand-in: plans straight lines and "drives" for a fixed time.
+
+    ``NAVIMATE_FAKE_PLAN_SECONDS`` and ``NAVIMATE_FAKE_DRIVE_SECONDS`` set how
+    long planning and execution take.
+    """
+
+    def __init__(self, node_name="basic_navigator", namespace=""):
+        super().__init__(node_name, namespace=namespace)
+        self.plan_seconds = float(os.environ.get("NAVIMATE_FAKE_PLAN_SECONDS", "0.02"))
+        self.drive_seconds = float(os.environ.get("NAVIMATE_FAKE_DRIVE_SECONDS", "0.5"))
+        self.goal_handle = None
+        self.result_future = None
+        self.status = None
+        self.plans = 0
+
+    def waitUntilNav2Active(self, *args, **kwargs):
+        pass
+
+    def changeMap(self, map_path):
+        pass
+
+    def getPath(self, start, goal, *args, **kwargs):
+        time.sleep(self.plan_seconds)
+        self.plans += 1
+        # Like Nav2's, planning is an action of its own that replaces the current goal.
+        self._send(Future(0.0))
+        a = start.pose.position
+        b = goal.pose.position
+        steps = max(2, int(math.hypot(b.x - a.x, b.y - a.y) / 0.05))
+        poses = []
+        for i in range(steps + 1):
+            f = i / steps
+            pose = Message()
+            pose.pose.position.x = a.x + (b.x - a.x) * f
+            pose.pose.position.y = a.y + (b.y - a.y) * f
+            poses.append(pose)
+        return Message(poses=poses)
+
+    def smoothPath(self, path, *args, **kwargs):
+        return path
+
+    def _send(self, future):
+        self.goal_handle = GoalHandle(future)
+        self.result_future = future
+        self.status = None
+
+    def _drive(self):
+        self._send(Future(time.monotonic() + self.drive_seconds))
+        return True
+
+    def followPath(self, path, *args, **kwargs):
+        return self._drive()
+
+    def followWaypoints(self, poses):
+        return self._drive()
+
+    def backup(self, *args, **kwargs):
+        return self._drive()
+
+    def getFeedback(self):
+        future = self.result_future
+        remaining = max(0.0, future.finish_at - time.monotonic()) if future else 0.0
+        return Message(distance_to_goal=remaining * 0.2, speed=0.2, distance_traveled=0.0, current_waypoint=0)
+
+    def cancelTask(self):
+        if self.goal_handle is not None:
+            self.goal_handle.cancel_goal_async()
+
+    def isTaskComplete(self):
+        if self.result_future is None:
+            return True
+        if not self.result_future.done():
+            return False
+        self.status = self.result_future.result().status
+        return True
+
+    def getResult(self):
+        return {
+            GoalStatus.STATUS_SUCCEEDED: TaskResult.SUCCEEDED,
+            GoalStatus.STATUS_CANCELED: TaskResult.CANCELED,
+            GoalStatus.STATUS_ABORTED: TaskResult.FAILED,
+        }.get(self.status, TaskResult.UNKNOWN)
+
+    def getTaskError(self):
+        return 0, ""
+
+    def destroyNode(self):
+        pass
+
+
+class CvBridge:
+    def cv2_to_imgmsg(self, image, encoding="passthrough"):
+        return Message(data=image.tobytes(), height=image.shape[0], width=image.shape[1], encoding=encoding)
+
+    def imgmsg_to_cv2(self, msg, desired_encoding="passthrough"):
+        return np.frombuffer(msg.data, dtype=np.uint8).reshape(msg.height, msg.width, -1)
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+def install():
+    """Register the fake modules; call before importing ``api``."""
+    _module(
+        "rclpy",
+        ok=lambda: True,
+        init=lambda *a, **k: None,
+        shutdown=lambda *a, **k: None,
+        spin_until_future_complete=spin_until_future_complete,
+    )
+    _module("rclpy.node", Node=Node)
+    _module("rclpy.executors", MultiThreadedExecutor=Executor, SingleThreadedExecutor=Executor)
+    _module("rclpy.qos", qos_profile_sensor_data=None)
+    _module("nav2_simple_commander")
+    _module("nav2_simple_commander.robot_navigator", BasicNavigator=BasicNavigator, TaskResult=TaskResult)
+    _module("action_msgs")
+    _module("action_msgs.msg", GoalStatus=GoalStatus)
+    _module("geometry_msgs")
+    _module("geometry_msgs.msg", TwistStamped=Message, PoseStamped=Message, PoseWithCovarianceStamped=Message)
+    _module("nav_msgs")
+    _module("nav_msgs.msg", OccupancyGrid=Message, Path=Message)
+    _module("sensor_msgs")
+    _module("sensor_msgs.msg", Image=Message, CompressedImage=Message)
+    _module("cv_bridge", CvBridge=CvBridge)
+
+
+def occupancy_grid(cells, resolution=0.05, origin=(-10.0, -10.0)):
+    """An OccupancyGrid message around an int8 ``(height, width)`` array, row 0 at the origin."""
+    msg = Message()
+    msg.header.stamp = Stamp()
+    msg.header.frame_id = "map"
+    msg.info.width = cells.shape[1]
+    msg.info.height = cells.shape[0]
+    msg.info.resolution = resolution
+    msg.info.origin.position.x = origin[0]
+    msg.info.origin.position.y = origin[1]
+    msg.info.origin.position.z = 0.0
+    msg.info.origin.orientation.x = 0.0
+    msg.info.origin.orientation.y = 0.0
+    msg.info.origin.orientation.z = 0.0
+    msg.info.origin.orientation.w = 1.0
+    # rclpy delivers int8[] fields as array.array("b").
+    msg.data = array.array("b", cells.tobytes())
+    return msg
+
+
+def synthetic_cells(size, seed=0):
+    """Rooms of free space with walls, ringed by unknown cells, like a small building."""
+    rng = np.random.default_rng(seed)
+    cells = np.full((size, size), -1, dtype=np.int8)
+    margin = size // 10
+    cells[margin:-margin, margin:-margin] = 0
+    for _ in range(max(2, size // 64)):
+        if rng.random() < 0.5:
+            row = int(rng.integers(margin, size - margin))
+            cells[row:row + 2, margin:-margin] = 100
+        else:
+            col = int(rng.integers(margin, size - margin))
+            cells[margin:-margin, col:col + 2] = 100
+    return cells
+
+
+def grow_map(cells, step, patch=32):
+    """Change one patch of the grid in place, as Cartographer does while exploring."""
+    size = cells.shape[0]
+    row = (step * 37) % max(1, size - patch)
+    col = (step * 53) % max(1, size - patch)
+    block = cells[row:row + patch, col:col + patch]
+    block[block == -1] = 0
+    return cells
+
+
+def amcl_pose(t, radius=1.0):
+    """A PoseWithCovarianceStamped moving on a circle around the origin."""
+    yaw = t * 0.5
+    msg = Message()
+    msg.header.stamp = Stamp()
+    msg.header.frame_id = "map"
+    msg.pose.pose.position.x = radius * math.cos(yaw)
+    msg.pose.pose.position.y = radius * math.sin(yaw)
+    msg.pose.pose.position.z = 0.0
+    msg.pose.pose.orientation.x = 0.0
+    msg.pose.pose.orientation.y = 0.0
+    msg.pose.pose.orientation.z = math.sin((yaw + math.pi / 2) / 2)
+    msg.pose.pose.orientation.w = math.cos((yaw + math.pi / 2) / 2)
+    msg.pose.covariance = [0.0] * 36
+    return msg
+
+
+def compressed_image(jpeg):
+    msg = Message(format="jpeg", data=jpeg)
+    msg.header.stamp = Stamp()
+    msg.header.frame_id = "camera_rgb_optical_frame"
+    return msg
+
+
+def start_publishers(pose_rate=10.0, map_rate=1.0, map_size=384, frames=None, fps=30.0,
+                     camera_topic="/camera/image_raw/compressed", stop=None, namespaces=("",)):
+    """Publish AMCL poses, a growing map and, given ``frames``, camera JPEGs on ``GRAPH``.
+
+    Every robot namespace in ``namespaces`` gets its own ``amcl_pose``; the map is shared.
+    """
+    stop = stop or threading.Event()
+
+    def poses():
+        started = time.monotonic()
+        while not stop.wait(1.0 / pose_rate):
+            t = time.monotonic() - started
+            for i, namespace in enumerate(namespaces):
+                GRAPH.publish(f"{namespace}/amcl_pose", amcl_pose(t, radius=1.0 + 0.25 * i))
+
+    def maps():
+        cells = synthetic_cells(map_size)
+        step = 0
+        while True:
+            GRAPH.publish("/map", occupancy_grid(cells.copy()))
+            step += 1
+            grow_map(cells, step)
+            if stop.wait(1.0 / map_rate):
+                break
+
+    def camera():
+        index = 0
+        while not stop.wait(1.0 / fps):
+            GRAPH.publish(camera_topic, compressed_image(frames[index % len(frames)]))
+            index += 1
+
+    for target in (poses, maps) + ((camera,) if frames else ()):
+        threading.Thread(target=target, daemon=True, name=f"fake-{target.__name__}").start()
+    return stop
+
+
+def synthetic_frames(count, width, height, quality=80, seed=0):
+    """Distinct JPEG frames of noise and gradients, roughly camera-sized when encoded."""
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    base = np.zeros((height, width, 3), dtype=np.uint8)
+    base[..., 0] = np.linspace(0, 255, width, dtype=np.uint8)[None, :]
+    base[..., 1] = np.linspace(0, 255, height, dtype=np.uint8)[:, None]
+    frames = []
+    for i in range(count):
+        image = base.copy()
+        noise = rng.integers(0, 64, size=(height // 8, width // 8, 3), dtype=np.uint8)
+        image += cv2.resize(noise, (width, height), interpolation=cv2.INTER_NEAREST)
+        cv2.putText(image, str(i), (20, height // 2), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        frames.append(cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes())
+    return frames
+
+
+def load_frames(directory):
+    """JPEG files of a directory in name order, e.g. frames dumped from a real camera."""
+    names = sorted(n for n in os.listdir(directory) if n.lower().endswith((".jpg", ".jpeg")))
+    frames = []
+    for name in names:
+        with open(os.path.join(directory, name), "rb") as f:
+            frames.append(f.read())
+    return frames
+
+
+class FakeVideoServer:
+    """web_video_server's ``/stream`` endpoint, replaying frames at a fixed rate.
+
+    Every connection gets its own paced loop over the same frames, with
+    ``Content-Length`` and ``X-Timestamp`` headers like the real server.
+    """
+
+    BOUNDARY = b"boundarydonotcross"
+
+    def __init__(self, frames, fps=30.0):
+        self.frames = frames
+        self.fps = fps
+        self.connections = 0
+        self.frames_sent = 0
+
+    async def handle(self, reader, writer):
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            writer.close()
+            return
+        if not request.startswith(b"GET /stream"):
+            writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+            writer.close()
+            return
+
+        self.connections += 1
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nConnection: close\r\nCache-Control: no-cache\r\n"
+            b"Content-Type: multipart/x-mixed-replace;boundary=" + self.BOUNDARY + b"\r\n\r\n"
+        )
+        loop = asyncio.get_running_loop()
+        period = 1.0 / self.fps
+        next_frame = loop.time()
+        try:
+            index = 0
+            while True:
+                frame = self.frames[index % len(self.frames)]
+                index += 1
+                header = (
+                    b"--" + self.BOUNDARY + b"\r\nContent-Type: image/jpeg\r\n"
+                    + b"Content-Length: %d\r\nX-Timestamp: %.6f\r\n\r\n" % (len(frame), time.time())
+                )
+                writer.write(header + frame + b"\r\n")
+                await writer.drain()
+                self.frames_sent += 1
+                next_frame += period
+                await asyncio.sleep(max(0.0, next_frame - loop.time()))
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8080):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
@@ -0,0 +1,97 @@
+"""Run the API against the stand-ins in ``fakes`` instead of ROS and Nav2.
+
+    python benchmarks/offline_server.py --port 8002 --video-port 8090
+
+Starts a fake web_video_server, publishes AMCL poses, a growing map and the
+same camera frames on the fake graph, and serves ``api:app`` with uvicorn. With
+``--replay`` the nodes are fed from a recording instead (see ``recording.py``).
+With ``NAVIMATE_ROBOTS`` every robot gets its own poses. Every ``cmd_vel``
+message is timed against the send time the benchmark puts in ``angular``; the
+latencies are served from ``/_bench/cmd_vel``.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+SIMULATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SIMULATION_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakes  # noqa: E402
+
+
+def serve_video(frames, fps, port):
+    server = fakes.FakeVideoServer(frames, fps)
+    thread = threading.Thread(
+        target=lambda: asyncio.run(server.serve(port=port)), daemon=True, name="fake-video-server"
+    )
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--uds", help="Serve on this Unix socket instead, e.g. as NAVIMATE_ROLE=bridge")
+    parser.add_argument("--video-port", type=int, default=8090)
+    parser.add_argument("--frames", help="Directory of recorded JPEG frames to replay")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--pose-rate", type=float, default=10.0)
+    parser.add_argument("--map-rate", type=float, default=1.0)
+    parser.add_argument("--map-size", type=int, default=384)
+    parser.add_argument("--replay", help="Recording to replay instead of the synthetic topics")
+    parser.add_argument("--speed", default="1", help="Replay speed: 1, 4x, max")
+    parser.add_argument("--loop", action="store_true", help="Start the replay over when it ends")
+    args = parser.parse_args()
+
+    fakes.install()
+    frames = fakes.load_frames(args.frames) if args.frames else fakes.synthetic_frames(30, args.width, args.height)
+    serve_video(frames, args.fps, args.video_port)
+    os.environ["NAVIMATE_VIDEO_SERVER"] = f"http://127.0.0.1:{args.video_port}"
+    if args.replay:
+        os.environ["NAVIMATE_REPLAY"] = os.path.abspath(args.replay)
+        os.environ["NAVIMATE_REPLAY_SPEED"] = args.speed
+        os.environ["NAVIMATE_REPLAY_LOOP"] = "1" if args.loop else "0"
+
+    import uvicorn
+
+    os.chdir(SIMULATION_DIR)
+    import api
+
+    latencies = []
+
+    def on_cmd_vel(msg):
+        latencies.append(time.time() - msg.twist.angular.z)
+
+    namespaces = [robot.namespace for robot in api.robots.values()]
+    for namespace in namespaces:
+        fakes.GRAPH.subscribe(f"{namespace}/cmd_vel", on_cmd_vel)
+
+    @api.app.get("/_bench/cmd_vel", include_in_schema=False)
+    def cmd_vel_latencies(reset: bool = False):
+        values = list(latencies)
+        if reset:
+            latencies.clear()
+        published = sum(fakes.GRAPH.published.get(f"{namespace}/cmd_vel", 0) for namespace in namespaces)
+        return {"latencies": values, "published": published}
+
+    if not args.replay:
+        @api.app.on_event("startup")
+        def start_publishers():
+            fakes.start_publishers(
+                args.pose_rate, args.map_rate, args.map_size, frames, args.fps, namespaces=namespaces
+            )
+
+    if args.uds:
+        uvicorn.run(api.app, uds=args.uds, log_level="warning")
+    else:
+        uvicorn.run(api.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""One ROS bridge process serving several uvicorn workers.
+
+With ``NAVIMATE_ROLE=bridge`` the API runs as before, owning rclpy, the nodes,
+``BasicNavigator`` and the task manager, but listens on a Unix socket and also
+publishes the latest pose, map, camera frame and its status into
+``shared_state``. Workers (``NAVIMATE_ROLE=worker``, any number) serve the
+public port:
+
+* pose, map and camera endpoints and WebSockets read the shared slots through
+  a ``BridgeFollower`` thread that feeds the worker's own streams;
+* velocity and teleop commands go to the bridge as datagrams on a local
+  socket, which a bridge thread publishes without touching its event loop.
+  While a worker holds a velocity its event loop sends heartbeats, and the
+  bridge stops the robot if they cease, so a stalled or killed worker cannot
+  leave it driving;
+* requests that need the navigator, the mapping session or the task manager
+  are forwarded to the bridge by ``BridgeProxy``.
+
+Nothing the bridge does waits on a worker: slots are overwritten in place and
+a full command socket drops the datagram, so a stalled worker only delays its
+own clients.
+"""
+import asyncio
+import os
+import re
+import socket
+import struct
+import time
+from threading import Event, Lock, Thread
+
+import httpx
+
+from shared_state import decode
+
+# How long one camera lease from a worker keeps the bridge's camera subscription alive.
+CAMERA_LEASE = 3.0
+# A bridge whose status is older than this is considered gone.
+STATUS_TIMEOUT = 5.0
+# The bridge publishes zero velocity once the worker that sent the last one is silent this long.
+DEADMAN_TIMEOUT = 1.0
+# How often a worker holding a non-zero velocity tells the bridge it is still alive.
+HEARTBEAT_PERIOD = 0.2
+
+# Every datagram starts with its kind and the sending worker's pid.
+VELOCITY = struct.Struct("<cIdd")
+HEARTBEAT = struct.Struct("<cI")
+COMMAND_VELOCITY = b"V"
+COMMAND_HEARTBEAT = b"H"
+COMMAND_CAMERA = b"C"
+
+# Worker paths answered from local state; every other HTTP request goes to the bridge.
+LOCAL_PATHS = (
+    "/health", "/ready", "/metrics", "/docs", "/openapi.json",
+    "/map/list", "/map/download", "/map/thumbnail", "/map/tiles/",
+    "/robot/position", "/robot/goal/validate", "/mapping/stream", "/camera/stream",
+)
+# The same under /robots/{robot_id}: only the MJPEG streams, which every worker reads from the video
+# server itself. The rest need the robot's own state, which a worker only has for the first robot.
+LOCAL_ROBOT_PATHS = ("/mapping/stream", "/camera/stream")
+ROBOT_PREFIX = re.compile(r"^/robots/[^/]+")
+# Not copied between the client and the bridge; httpx also undoes any content encoding.
+SKIPPED_HEADERS = {
+    "connection", "keep-alive", "transfer-encoding", "upgrade", "host", "content-length", "content-encoding"
+}
+
+
+class CommandServer:
+    """Bridge end of the command socket: a thread receiving worker datagrams.
+
+    A watchdog thread publishes zero velocity when the worker that sent the
+    last non-zero one has sent neither a command nor a heartbeat for
+    ``deadman`` seconds.
+    """
+
+    def __init__(self, path, on_velocity, on_camera_lease, deadman=DEADMAN_TIMEOUT):
+        self.path = path
+        self.on_velocity = on_velocity
+        self.on_camera_lease = on_camera_lease
+        self.deadman = deadman
+        self.received = 0
+        self.deadman_stops = 0
+        self._socket = None
+        # The worker whose non-zero velocity is being held, and when it was last heard from.
+        self._owner = None
+        self._heard = 0.0
+        self._velocity_lock = Lock()
+        self._closed = Event()
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(self.path)
+        Thread(target=self._serve, daemon=True, name="bridge-commands").start()
+        Thread(target=self._watch, daemon=True, name="bridge-deadman").start()
+
+    def _serve(self):
+        while True:
+            try:
+                data = self._socket.recv(64)
+            except OSError:
+                return
+            self.received += 1
+            try:
+                kind = data[:1]
+                if kind == COMMAND_VELOCITY:
+                    _, pid, linear, angular = VELOCITY.unpack(data)
+                    self._velocity(pid, linear, angular)
+                elif kind == COMMAND_HEARTBEAT:
+                    _, pid = HEARTBEAT.unpack(data)
+                    with self._velocity_lock:
+                        if pid == self._owner:
+                            self._heard = time.monotonic()
+                elif kind == COMMAND_CAMERA:
+                    self.on_camera_lease(time.monotonic() + CAMERA_LEASE)
+            except Exception as e:
+                print(f"Bad bridge command {data!r}: {e}")
+
+    def _velocity(self, pid, linear, angular):
+        # Publishing under the lock keeps a watchdog stop from overtaking a newer command.
+        with self._velocity_lock:
+            self._owner = pid if (linear, angular) != (0.0, 0.0) else None
+            self._heard = time.monotonic()
+            self.on_velocity(linear, angular)
+
+    def _watch(self):
+        while not self._closed.wait(self.deadman / 4):
+            with self._velocity_lock:
+                if self._owner is None or time.monotonic() - self._heard <= self.deadman:
+                    continue
+                print(f"Worker {self._owner} went silent holding a velocity; stopping the robot")
+                self._owner = None
+                self.deadman_stops += 1
+                self.on_velocity(0.0, 0.0)
+
+    def close(self):
+        self._closed.set()
+        if self._socket is not None:
+            self._socket.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+class CommandQueue:
+    """Worker end of the command socket; stands in for CmdVelPublisher.
+
+    Sends never block: with the bridge gone or its socket buffer full the
+    command is dropped and counted, like a lost message on a busy topic.
+    While the last velocity is non-zero, a task on the publishing event loop
+    sends heartbeats, so the bridge notices the loop stalling as well as the
+    process dying.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.dropped = 0
+        self.pid = os.getpid()
+        self.moving = False
+        self._heartbeat = None
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+
+    def _send(self, data):
+        try:
+            self._socket.sendto(data, self.path)
+        except OSError:
+            self.dropped += 1
+
+    def publish_cmd(self, linear: float, angular: float):
+        self._send(VELOCITY.pack(COMMAND_VELOCITY, self.pid, linear, angular))
+        self.moving = (linear, angular) != (0.0, 0.0)
+        if self.moving and (self._heartbeat is None or self._heartbeat.done()):
+            try:
+                self._heartbeat = asyncio.get_running_loop().create_task(self._send_heartbeats())
+            except RuntimeError:
+                # Off the event loop nothing vouches for the command; the bridge stops it after DEADMAN_TIMEOUT.
+                pass
+
+    async def _send_heartbeats(self):
+        while self.moving:
+            await asyncio.sleep(HEARTBEAT_PERIOD)
+            if self.moving:
+                self._send(HEARTBEAT.pack(COMMAND_HEARTBEAT, self.pid))
+
+    def lease_camera(self):
+        self._send(COMMAND_CAMERA)
+
+    def destroy_node(self):
+        self._socket.close()
+
+
+class SharedCamera:
+    """Worker-side camera source for ``PushedStream``, fed from the bridge's frame slot.
+
+    While a stream is attached it renews the bridge's camera lease every
+    second, so the bridge only subscribes to the camera while someone watches.
+    """
+
+    def __init__(self, topic, commands):
+        self.topic = topic
+        self.commands = commands
+        self.stream = None
+        self._renewed = 0.0
+
+    def attach(self, stream):
+        self.stream = stream
+        self._renewed = 0.0
+        self.renew()
+
+    def detach(self, stream):
+        if self.stream is stream:
+            self.stream = None
+
+    def renew(self):
+        now = time.monotonic()
+        if self.stream is not None and now - self._renewed >= 1.0:
+            self._renewed = now
+            self.commands.lease_camera()
+
+    def push(self, jpeg, stamp):
+        stream = self.stream
+        if stream is not None:
+            stream.push(jpeg, stamp)
+
+
+class BridgeFollower:
+    """Polls the shared slots and hands every new value to the worker's callbacks.
+
+    Stands in for AMCLListener too: ``amcl_pose`` is the latest pose message.
+    ``on_status`` gets the bridge's status dict, or None once it is older than
+    ``STATUS_TIMEOUT``.
+    """
+
+    def __init__(self, state, on_pose, on_map, camera, on_status, period=0.005):
+        self.state = state
+        self.camera = camera
+        self.period = period
+        self.amcl_pose = None
+        self.status = None
+        self._callbacks = {"pose": on_pose, "map": on_map, "frame": self._on_frame, "status": on_status}
+        self._sequences = {kind: None for kind in self._callbacks}
+        self._stop = Event()
+
+    def start(self):
+        Thread(target=self._run, daemon=True, name="bridge-follower").start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _on_frame(self, frame):
+        self.camera.push(*frame)
+
+    def _run(self):
+        status_at = time.monotonic()
+        while not self._stop.wait(self.period):
+            for kind, callback in self._callbacks.items():
+                if kind == "frame" and self.camera.stream is None:
+                    continue
+                slot = self.state.slots[kind]
+                if slot.sequence() == self._sequences[kind]:
+                    continue
+                value = slot.read(after=self._sequences[kind])
+                if value is None:
+                    continue
+                self._sequences[kind] = value[0]
+                try:
+                    decoded = decode(kind, value[2])
+                    if kind == "pose":
+                        self.amcl_pose = decoded
+                    elif kind == "status":
+                        self.status = decoded
+                        status_at = time.monotonic()
+                    callback(decoded)
+                except Exception as e:
+                    print(f"Failed to apply bridge {kind}: {e}")
+            self.camera.renew()
+            if self.status is not None and time.monotonic() - status_at > STATUS_TIMEOUT:
+                self.status = None
+                self._callbacks["status"](None)
+
+
+class BridgeClient:
+    """HTTP over the bridge's Unix socket, for forwarded requests and polled streams."""
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self._http = None
+
+    @property
+    def http(self):
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(uds=self.socket_path), base_url="http://bridge", timeout=30.0
+            )
+        return self._http
+
+    async def get(self, path):
+        """``(status, json)`` of a GET on the bridge, ``(503, None)`` if it cannot be reached."""
+        try:
+            response = await self.http.get(path)
+        except httpx.TransportError:
+            return 503, None
+        return response.status_code, response.json()
+
+
+class BridgeProxy:
+    """ASGI middleware forwarding every HTTP request outside ``local_paths`` to the bridge."""
+
+    def __init__(self, app, client, local_paths=LOCAL_PATHS, local_robot_paths=LOCAL_ROBOT_PATHS):
+        self.app = app
+        self.client = client
+        self.local_paths = local_paths
+        self.local_robot_paths = local_robot_paths
+
+    def local(self, path):
+        if path.startswith(self.local_paths):
+            return True
+        prefix = ROBOT_PREFIX.match(path)
+        return prefix is not None and path[prefix.end():].startswith(self.local_robot_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.local(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        url = scope["path"]
+        if scope["query_string"]:
+            url += "?" + scope["query_string"].decode("latin-1")
+        headers = [(k, v) for k, v in scope["headers"] if k.decode("latin-1").lower() not in SKIPPED_HEADERS]
+        try:
+            response = await self.client.http.request(scope["method"], url, headers=headers, content=body)
+            status, content = response.status_code, response.content
+            headers = [
+                (k.encode("latin-1"), v.encode("latin-1")) for k, v in response.headers.multi_items()
+                if k.lower() not in SKIPPED_HEADERS
+            ]
+        except httpx.TransportError as e:
+            status, content = 503, f'{{"detail": "bridge unavailable: {type(e).__name__}"}}'.encode()
+            headers = [(b"content-type", b"application/json"), (b"retry-after", b"5")]
+        headers.append((b"content-length", str(len(content)).encode("latin-1")))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": content})
+
+
+async def relay_polled(websocket, fetch, period, finished=lambda body: False, changed=lambda a, b: a != b):
+    """Send ``fetch()`` results over a WebSocket whenever they change, until ``finished``.
+
+    Workers use this for the bridge's task and mapping status streams, which
+    only exist in the bridge process. ``fetch`` returns ``(status, body)``.
+    """
+    last = None
+    while True:
+        status, body = await fetch()
+        if status == 404:
+            await websocket.close(code=4404)
+            return
+        if status != 200:
+            await websocket.close(code=1013)
+            return
+        if last is None or changed(last, body):
+            await websocket.send_json(body)
+            last = body
+        if finished(body):
+            await websocket.close()
+            return
+        await asyncio.sleep(period)
@@ -0,0 +1,169 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from stream_hub import MJPEGUpstream, SharedStream, multipart_part, part_payload, part_timestamp
+
+
+class QualityTier(NamedTuple):
+    max_width: Optional[int] = None
+    quality: Optional[int] = None
+    max_fps: Optional[float] = None
+
+    @property
+    def reencodes(self):
+        return self.max_width is not None or self.quality is not None
+
+
+FULL = QualityTier()
+
+# Ordered from best to cheapest; adaptive clients move along this ladder.
+PROFILES = {
+    "full": FULL,
+    "high": QualityTier(max_width=1280, quality=85, max_fps=30),
+    "medium": QualityTier(max_width=640, quality=70, max_fps=15),
+    "low": QualityTier(max_width=320, quality=50, max_fps=8),
+}
+LADDER = list(PROFILES.values())
+
+# Exponentially averaged time spent handing one frame to the client connection.
+DOWNGRADE_LATENCY = 0.15
+UPGRADE_LATENCY = 0.03
+UPGRADE_AFTER_FRAMES = 90
+
+
+def reencode(jpeg, tier):
+    """Decode a JPEG, shrink it to the tier's width and re-encode it."""
+    # Imported on first use so that starting the API does not pay for cv2.
+    import cv2
+
+    image = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+
+    height, width = image.shape[:2]
+    if tier.max_width and width > tier.max_width:
+        size = (tier.max_width, max(1, round(height * tier.max_width / width)))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+    params = [cv2.IMWRITE_JPEG_QUALITY, tier.quality] if tier.quality else []
+    ok, encoded = cv2.imencode(".jpg", image, params)
+    return encoded if ok else None
+
+
+class TierEncoder(SharedStream):
+    """Derives one quality tier from an upstream stream, shared by its viewers.
+
+    Source frames arriving faster than the tier's fps cap are skipped before
+    they are decoded, and frames arriving while an encode is in flight are
+    replaced by newer ones, so each tier encodes at most once per sent frame.
+    """
+
+    def __init__(self, key, hub, pool, source_factory=MJPEGUpstream):
+        super().__init__(key)
+        self.hub = hub
+        self.pool = pool
+        self.source_factory = source_factory
+        self.source = None
+        self.queue = None
+
+    def start(self):
+        # Subscribe right away so the source is already held when a client
+        # switches tiers and releases its previous one.
+        self.source, self.queue = self.hub.subscribe(self.key[0], self.source_factory)
+        super().start()
+        self.task.add_done_callback(lambda _: self.hub.unsubscribe(self.source, self.queue))
+
+    async def run(self):
+        tier = self.key[1]
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / tier.max_fps if tier.max_fps else 0.0
+        next_due = 0.0
+
+        while True:
+            part = await self.queue.get()
+            if part is None:
+                return
+
+            now = loop.time()
+            if now < next_due:
+                continue
+            next_due = max(next_due + interval, now)
+
+            if tier.reencodes:
+                jpeg = await loop.run_in_executor(self.pool, reencode, part_payload(part), tier)
+                if jpeg is None:
+                    continue
+                part = multipart_part(jpeg, part_timestamp(part))
+            self.channel.publish(part)
+
+
+class TieredStreams:
+    """Serves upstream streams at per-client quality tiers.
+
+    Every distinct ``(source, tier)`` pair is encoded once, in a bounded worker
+    pool, and shared by all clients that asked for it.
+    """
+
+    def __init__(self, hub, max_workers=2):
+        self.hub = hub
+        self.hub.profiles.update({tier: name for name, tier in PROFILES.items()})
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="camera-tier")
+
+    def _subscribe(self, source, tier, factory):
+        if tier == FULL:
+            return self.hub.subscribe(source, factory)
+        return self.hub.subscribe(
+            (source, tier), lambda key: TierEncoder(key, self.hub, self.pool, factory)
+        )
+
+    async def frames(self, source, tier=FULL, adaptive=False, factory=MJPEGUpstream):
+        """Yield multipart parts of ``source`` at ``tier``.
+
+        ``source`` is a hub key, an upstream URL unless ``factory`` says otherwise.
+
+        With ``adaptive`` the client starts at ``tier`` and is moved along
+        ``LADDER`` based on how long each frame takes to hand to its
+        connection; a client that keeps up is moved back up over time.
+        """
+        level = LADDER.index(tier) if tier in LADDER else None
+        adaptive = adaptive and level is not None
+        stream, queue = self._subscribe(source, tier, factory)
+        latency = 0.0
+        fast_frames = 0
+        try:
+            while True:
+                part = await queue.get()
+                if part is None:
+                    break
+
+                started = time.monotonic()
+                yield part
+                if not adaptive:
+                    continue
+
+                latency = 0.8 * latency + 0.2 * (time.monotonic() - started)
+                fast_frames = fast_frames + 1 if latency < UPGRADE_LATENCY else 0
+                if latency > DOWNGRADE_LATENCY and level < len(LADDER) - 1:
+                    new_level = level + 1
+                elif fast_frames >= UPGRADE_AFTER_FRAMES and level > 0:
+                    new_level = level - 1
+                else:
+                    continue
+
+                # Join the new tier before leaving the old one so a shared
+                # upstream is not torn down and reopened in between.
+                old_stream, old_queue = stream, queue
+                level = new_level
+                stream, queue = self._subscribe(source, LADDER[level], factory)
+                self.hub.unsubscribe(old_stream, old_queue)
+                latency = 0.0
+                fast_frames = 0
+        finally:
+            self.hub.unsubscribe(stream, queue)
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,140 @@
+"""The robots one API instance serves, each under its own ROS namespace.
+
+``NAVIMATE_ROBOTS`` lists robot IDs, which are also their namespaces
+(``tb1,tb2`` drives ``/tb1/cmd_vel``, ``/tb2/amcl_pose``, ...). Unset, there is
+one robot with no namespace, as before. Each ``Robot`` owns its velocity
+publisher, AMCL listener, camera streamer, navigator and task queue, plus its
+pose stream and trajectory. Live maps are a ``MapFeed`` per map topic, so
+robots sharing a floor (and so ``/map``) share its image node and grid stream.
+"""
+import re
+import time
+from threading import Lock
+
+from grid_stream import GridStream
+from pose_stream import PoseStream, pose_from_msg
+from trajectory import TrajectoryBuffer
+
+# A robot ID has to be a valid ROS namespace token.
+ROBOT_ID = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def parse_robots(value):
+    """Robot IDs from ``NAVIMATE_ROBOTS``; ``[""]``, the un-namespaced robot, when empty."""
+    ids = [robot_id.strip() for robot_id in value.split(",") if robot_id.strip()]
+    for robot_id in ids:
+        if not ROBOT_ID.match(robot_id):
+            raise ValueError(f"Invalid robot ID '{robot_id}'")
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"Duplicate robot IDs in '{value}'")
+    return ids or [""]
+
+
+def resolve(namespace, topic):
+    """The absolute name of ``topic`` in ``namespace``; absolute topics stay as they are."""
+    if topic.startswith("/"):
+        return topic
+    return f"{namespace}/{topic}"
+
+
+class MapFeed:
+    """One live map topic with its image node and grid stream, shared by the robots on it."""
+
+    def __init__(self, namespace="", on_map=None):
+        self.namespace = namespace
+        self.on_map = on_map
+        self.node = None
+        self.grid_stream = GridStream()
+
+    @property
+    def image_topic(self):
+        return resolve(self.namespace, "map_image")
+
+    def start(self):
+        from ros_nodes import MapImagePublisher
+
+        self.node = MapImagePublisher(self.receive, self.namespace)
+        return self.node
+
+    def receive(self, msg):
+        if self.on_map is not None:
+            self.on_map(msg)
+        self.grid_stream.update(msg)
+
+
+class Robot:
+    """One robot's nodes, navigator and pose state.
+
+    ``navigation`` is the robot's readiness subsystem: ``navigation`` for the
+    un-namespaced robot, ``navigation/<id>`` otherwise.
+    """
+
+    def __init__(self, robot_id, map_feed, map_name, on_pose=None):
+        self.id = robot_id
+        self.namespace = f"/{robot_id}" if robot_id else ""
+        self.navigation = f"navigation/{robot_id}" if robot_id else "navigation"
+        self.map_feed = map_feed
+        self.map_name = map_name
+        self.on_pose = on_pose
+        self.cmd_vel = None
+        self.amcl = None
+        self.camera = None
+        self.navigator = None
+        self.tasks = None
+        self.pose_stream = PoseStream()
+        self.trajectory = TrajectoryBuffer()
+        self._xy = (0.0, 0.0)
+        self._lock = Lock()
+
+    def topic(self, name):
+        """``name`` inside the robot's namespace, leading slash or not."""
+        return resolve(self.namespace, name.lstrip("/")) if self.namespace else name
+
+    def start_nodes(self, camera_topic, camera_transport):
+        """Create the robot's nodes; returns them for the shared executor."""
+        from ros_nodes import AMCLListener, CameraStreamer, CmdVelPublisher
+
+        self.cmd_vel = CmdVelPublisher(self.namespace)
+        self.amcl = AMCLListener(self.receive_pose, self.namespace)
+        self.camera = CameraStreamer(self.topic(camera_topic), camera_transport, namespace=self.namespace)
+        return [self.cmd_vel, self.amcl, self.camera]
+
+    def start_navigator(self):
+        """Wait for the robot's Nav2 stack; blocks until it is active."""
+        from nav2_simple_commander.robot_navigator import BasicNavigator
+        from nav_tasks import TaskManager
+
+        nav = BasicNavigator(namespace=self.namespace)  # Has its own internal node
+        self.navigator = nav
+        nav.waitUntilNav2Active()
+        self.tasks = TaskManager(nav)
+
+    def receive_pose(self, msg):
+        if self.on_pose is not None:
+            self.on_pose(msg)
+        pose = pose_from_msg(msg)
+        with self._lock:
+            self._xy = (pose["x"], pose["y"])
+        self.pose_stream.publish(pose)
+        self.trajectory.append(time.time(), pose["x"], pose["y"], pose["yaw"])
+
+    def xy(self):
+        with self._lock:
+            return self._xy
+
+    def status(self):
+        x, y = self.xy()
+        task = self.tasks.current if self.tasks is not None else None
+        return {
+            "id": self.id,
+            "namespace": self.namespace or "/",
+            "map_name": self.map_name,
+            "position": {"x": x, "y": y} if self.amcl is not None and self.amcl.amcl_pose else None,
+            "task": task.snapshot() if task is not None else None,
+        }
+
+    def close(self):
+        if self.cmd_vel is not None:
+            self.cmd_vel.destroy_node()
+        if self.navigator is not None:
+            self.navigator.destroyNode()
@@ -0,0 +1,179 @@
+"""Lossless OccupancyGrid streaming as a keyframe followed by rectangle deltas.
+
+Every message is binary and little-endian and starts with the common header
+``<cBI``: kind (``b"K"`` keyframe, ``b"D"`` delta), codec (``CODEC_ZLIB`` or
+``CODEC_ZSTD``) and sequence number.
+
+Keyframe: ``<IIfdd`` width, height, resolution, origin x, origin y, followed by
+the compressed int8 grid in ``OccupancyGrid.data`` order (row 0 at the bottom).
+
+Delta: ``<H`` rectangle count, that many ``<IIII`` x, y, width, height
+rectangles, followed by the compressed concatenation of each rectangle's int8
+cells in row-major order. A delta with sequence ``n`` applies to the grid at
+sequence ``n - 1``; on a gap the client waits for the next keyframe, which the
+server sends whenever a client falls behind, the geometry changes, or
+``keyframe_interval`` seconds have passed.
+"""
+import asyncio
+import struct
+import time
+import zlib
+from threading import Lock
+
+from occupancy import dirty_tiles, grid_geometry, grid_view
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODEC_ZLIB = 0
+CODEC_ZSTD = 1
+
+HEADER = struct.Struct("<cBI")
+KEYFRAME = struct.Struct("<IIfdd")
+RECT_COUNT = struct.Struct("<H")
+RECT = struct.Struct("<IIII")
+
+DELTA_TILE_SIZE = 64
+MAX_RECTS = 0xFFFF
+
+# Tells a client's frame generator to start over from a keyframe.
+RESYNC = object()
+
+
+class GridStream:
+    """Turns ``/map`` updates into keyframe/delta messages for WebSocket clients.
+
+    ``update`` runs on the ROS executor thread; clients iterate ``frames`` on
+    the event loop. Each client has a bounded queue, and one that falls behind
+    is resynchronised with a fresh keyframe instead of queueing more deltas.
+    """
+
+    def __init__(self, keyframe_interval=30.0, queue_size=16):
+        self.keyframe_interval = keyframe_interval
+        self.queue_size = queue_size
+        if zstandard is not None:
+            self.codec = CODEC_ZSTD
+            self._compress = zstandard.ZstdCompressor(level=3).compress
+        else:
+            self.codec = CODEC_ZLIB
+            self._compress = lambda data: zlib.compress(data, 1)
+
+        self._lock = Lock()
+        self._grid = None
+        self._geometry = None
+        self._seq = 0
+        self._keyframe = None
+        self._last_keyframe = 0.0
+        self._clients = set()
+        self._loop = None
+
+    def update(self, msg):
+        """Record a new OccupancyGrid and broadcast it to connected clients."""
+        grid = grid_view(msg)
+        geometry = grid_geometry(msg)
+
+        with self._lock:
+            previous, previous_geometry = self._grid, self._geometry
+            if not self._clients:
+                self._store(grid, geometry)
+                return
+
+            if previous is None or geometry != previous_geometry \
+                    or time.monotonic() - self._last_keyframe > self.keyframe_interval:
+                self._store(grid, geometry)
+                frame = self._keyframe_locked()
+            else:
+                rects = list(dirty_tiles(previous, grid, DELTA_TILE_SIZE))
+                if not rects:
+                    return
+                self._store(grid, geometry)
+                frame = self._delta(grid, rects) if len(rects) <= MAX_RECTS else self._keyframe_locked()
+            seq = self._seq
+
+        self._loop.call_soon_threadsafe(self._broadcast, seq, frame)
+
+    def _store(self, grid, geometry):
+        self._grid = grid
+        self._geometry = geometry
+        self._seq += 1
+        self._keyframe = None
+
+    def keyframe(self):
+        """Return ``(seq, message)`` for the current grid, or ``None`` before the first map."""
+        with self._lock:
+            if self._grid is None:
+                return None
+            return self._seq, self._keyframe_locked()
+
+    def _keyframe_locked(self):
+        if self._keyframe is None:
+            width, height, resolution, origin_x, origin_y = self._geometry
+            self._keyframe = b"".join((
+                HEADER.pack(b"K", self.codec, self._seq & 0xFFFFFFFF),
+                KEYFRAME.pack(width, height, resolution, origin_x, origin_y),
+                self._compress(self._grid),
+            ))
+            self._last_keyframe = time.monotonic()
+        return self._keyframe
+
+    def _delta(self, grid, rects):
+        table = [RECT_COUNT.pack(len(rects))]
+        cells = []
+        for y0, y1, x0, x1 in rects:
+            table.append(RECT.pack(x0, y0, x1 - x0, y1 - y0))
+            cells.append(grid[y0:y1, x0:x1].tobytes())
+        return b"".join((
+            HEADER.pack(b"D", self.codec, self._seq & 0xFFFFFFFF),
+            *table,
+            self._compress(b"".join(cells)),
+        ))
+
+    def _broadcast(self, seq, frame):
+        for queue in self._clients:
+            if queue.full():
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+            else:
+                queue.put_nowait((seq, frame))
+
+    async def frames(self):
+        """Yield binary messages for one client, starting with a keyframe."""
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._clients.add(queue)
+        try:
+            base = None
+            while True:
+                if base is None:
+                    # Compressing a large grid takes a while; keep it off the event loop.
+                    keyframe = await loop.run_in_executor(None, self.keyframe)
+                    if keyframe is not None:
+                        base, frame = keyframe
+                        yield frame
+
+                item = await queue.get()
+                if item is RESYNC:
+                    base = None
+                    continue
+                seq, frame = item
+                if base is None:
+                    # Still waiting for the first map; a keyframe carries all of it.
+                    if frame[:1] == b"K":
+                        base = seq
+                        yield frame
+                    continue
+                if seq <= base:
+                    continue
+                if frame[:1] == b"D" and seq != base + 1:
+                    base = None
+                    continue
+                base = seq
+                yield frame
+        finally:
+            with self._lock:
+                self._clients.discard(queue)
@@ -1,6 +1,14 @@
 from PIL import Image
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+from threading import Lock
+import hashlib
+import os
 import sys
 
+_digests = {}
+_digests_lock = Lock()
+
 def pgm_to_png(pgm_path, png_path=None):
 
     img = Image.open(pgm_path)
@@ -11,3 +19,54 @@ def pgm_to_png(pgm_path, png_path=None):
     print(f"Saved: {png_path}")
     
     return png_path
+
+# map_saver writes unknown cells as this gray, which a 0.25 free threshold would
+# otherwise classify as free.
+UNKNOWN_SHADE = 205
+
+def occupancy_masks(image, meta):
+    """Return ``(free, occupied)`` boolean masks of a map image given its yaml metadata."""
+    occupancy = image / 255.0 if meta.get("negate", 0) else (255 - image) / 255.0
+    unknown = image == UNKNOWN_SHADE
+    occupied = (occupancy > meta.get("occupied_thresh", 0.65)) & ~unknown
+    free = (occupancy < meta.get("free_thresh", 0.25)) & ~unknown
+    return free, occupied
+
+def map_digest(pgm_path, yaml_path=None):
+    """Return a content hash of a saved map's files.
+
+    The hash is memoized against each file's mtime and size, so the files are
+    only read again after they change on disk.
+    """
+    paths = [p for p in (pgm_path, yaml_path) if p and os.path.exists(p)]
+    stamp = tuple((p, os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in paths)
+
+    with _digests_lock:
+        cached = _digests.get(pgm_path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    digest = digest.hexdigest()
+
+    with _digests_lock:
+        _digests[pgm_path] = (stamp, digest)
+    return digest
+
+def etag_matches(request: Request, etag):
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+def cached_file_response(request: Request, path, media_type, etag, max_age=86400, filename=None):
+    """Serve a file with an ETag, answering a matching If-None-Match with 304."""
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=media_type, filename=filename, headers=headers)
@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+from threading import Lock
+
+import numpy as np
+from PIL import Image
+
+from helper import map_digest
+
+THUMBNAIL_SIZES = (64, 128, 256)
+
+_build_locks = {}
+_build_locks_lock = Lock()
+
+
+def map_cache_dir(cache_dir, map_name):
+    """Directory of a map's cached versions; ``ValueError`` if ``map_name`` would leave ``cache_dir``."""
+    root = os.path.realpath(cache_dir)
+    directory = os.path.realpath(os.path.join(root, map_name))
+    if os.path.dirname(directory) != root:
+        raise ValueError(f"Invalid map name '{map_name}'")
+    return directory
+
+
+def artifact_dir(cache_dir, map_name, digest):
+    """Directory holding every derived artifact of one version of a map."""
+    return os.path.join(map_cache_dir(cache_dir, map_name), digest)
+
+
+def ensure_artifact(maps_dir, map_name, cache_dir, kind, build):
+    """Return ``(digest, directory)`` of one kind of derived map artifact.
+
+    Artifacts are keyed by the content hash of the map's ``.pgm`` and
+    ``.yaml``. A missing one is produced by ``build(image, directory)`` into a
+    staging directory that is renamed into place when complete, so readers
+    never see a half-written artifact. Older versions of the map are removed
+    once a new one is published.
+    """
+    map_cache_dir(cache_dir, map_name)
+    pgm_path = os.path.join(maps_dir, f"{map_name}.pgm")
+    yaml_path = os.path.join(maps_dir, f"{map_name}.yaml")
+    if not os.path.exists(pgm_path):
+        raise FileNotFoundError(pgm_path)
+
+    digest = map_digest(pgm_path, yaml_path)
+    directory = os.path.join(artifact_dir(cache_dir, map_name, digest), kind)
+    if os.path.isdir(directory):
+        return digest, directory
+
+    with _build_locks_lock:
+        lock = _build_locks.setdefault(directory, Lock())
+    with lock:
+        try:
+            if not os.path.isdir(directory):
+                _build(pgm_path, directory, kind, build)
+                remove_stale_versions(cache_dir, map_name, digest)
+        finally:
+            # Only builds in progress keep a lock; a later caller finds the directory published.
+            with _build_locks_lock:
+                if _build_locks.get(directory) is lock:
+                    del _build_locks[directory]
+    return digest, directory
+
+
+def _build(pgm_path, directory, kind, build):
+    image = np.array(Image.open(pgm_path).convert("L"))
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{kind}-", dir=parent)
+    try:
+        build(image, staging)
+        os.replace(staging, directory)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        # Another process may have published the same version first.
+        if not os.path.isdir(directory):
+            raise
+
+
+def remove_stale_versions(cache_dir, map_name, digest):
+    map_cache = map_cache_dir(cache_dir, map_name)
+    for entry in os.listdir(map_cache):
+        if entry != digest and not entry.startswith("."):
+            shutil.rmtree(os.path.join(map_cache, entry), ignore_errors=True)
+
+
+def write_images(image, out_dir):
+    """Write the full-size PNG and one PNG thumbnail per ``THUMBNAIL_SIZES`` entry."""
+    full = Image.fromarray(image)
+    full.save(os.path.join(out_dir, "map.png"), optimize=True)
+    for size in THUMBNAIL_SIZES:
+        thumbnail = full.copy()
+        thumbnail.thumbnail((size, size), Image.Resampling.BOX)
+        thumbnail.save(os.path.join(out_dir, f"thumb_{size}.png"), optimize=True)
+
+
+def ensure_images(maps_dir, map_name, cache_dir):
+    """Return ``(digest, directory)`` holding ``map.png`` and the thumbnails."""
+    return ensure_artifact(maps_dir, map_name, cache_dir, "images", write_images)
+
+
+def thumbnail_size(requested):
+    """Pick the smallest cached thumbnail at least ``requested`` pixels wide."""
+    for size in THUMBNAIL_SIZES:
+        if size >= requested:
+            return size
+    return THUMBNAIL_SIZES[-1]
+
+
+def map_names(maps_dir):
+    return sorted(f[:-len(".yaml")] for f in os.listdir(maps_dir) if f.endswith(".yaml"))
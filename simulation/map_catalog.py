@@ -0,0 +1,164 @@
+import json
+import os
+import time
+from threading import Lock
+
+import numpy as np
+import yaml
+from PIL import Image
+
+from helper import map_digest, occupancy_masks
+
+CATALOG_FILE = ".catalog.json"
+# Bumped whenever describe_map changes, so entries computed the old way are redone.
+CATALOG_VERSION = 2
+# How long a listing may be served without looking at the maps directory again.
+RESCAN_INTERVAL = 5.0
+
+
+def file_signature(*paths):
+    """``[mtime_ns, size]`` pairs used to notice that a map's files changed."""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append([stat.st_mtime_ns, stat.st_size])
+        except FileNotFoundError:
+            signature.append(None)
+    return signature
+
+
+def describe_map(maps_dir, map_name):
+    """Read a saved map and return its catalog entry."""
+    yaml_path = os.path.join(maps_dir, f"{map_name}.yaml")
+    with open(yaml_path) as f:
+        meta = yaml.safe_load(f)
+
+    image_path = meta.get("image", f"{map_name}.pgm")
+    if not os.path.isabs(image_path):
+        image_path = os.path.join(maps_dir, image_path)
+    image = np.asarray(Image.open(image_path).convert("L"))
+
+    free, occupied = occupancy_masks(image, meta)
+    cells = image.size
+    occupied = int(np.count_nonzero(occupied))
+    free = int(np.count_nonzero(free))
+
+    stat = os.stat(yaml_path)
+    origin = meta.get("origin", [0.0, 0.0, 0.0])
+    return {
+        "name": map_name,
+        "width": int(image.shape[1]),
+        "height": int(image.shape[0]),
+        "resolution": float(meta.get("resolution", 0.0)),
+        "origin": [float(v) for v in origin],
+        "free_ratio": free / cells if cells else 0.0,
+        "occupied_ratio": occupied / cells if cells else 0.0,
+        "bytes": os.path.getsize(image_path) + stat.st_size,
+        "hash": map_digest(image_path, yaml_path),
+        "modified": max(stat.st_mtime, os.path.getmtime(image_path)),
+        "image": image_path,
+        "signature": file_signature(yaml_path, image_path),
+    }
+
+
+class MapCatalog:
+    """Persistent, in-memory index of the saved maps and their metadata.
+
+    The index lives in ``.catalog.json`` beside the maps. Listings are served
+    from memory; the directory is rescanned at most every ``RESCAN_INTERVAL``
+    seconds and only maps whose files changed are read again.
+    """
+
+    def __init__(self, maps_dir):
+        self.maps_dir = maps_dir
+        self.path = os.path.join(maps_dir, CATALOG_FILE)
+        self._lock = Lock()
+        self._entries = {}
+        self._scanned_at = 0.0
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+            if saved.get("version") == CATALOG_VERSION:
+                self._entries = {entry["name"]: entry for entry in saved["maps"]}
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+
+    def refresh(self, force=False):
+        """Bring the index in line with the maps directory."""
+        with self._lock:
+            if not force and time.monotonic() - self._scanned_at < RESCAN_INTERVAL:
+                return
+            self._scanned_at = time.monotonic()
+
+            names = set()
+            with os.scandir(self.maps_dir) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(".yaml"):
+                        names.add(entry.name[:-len(".yaml")])
+
+            changed = False
+            for name in set(self._entries) - names:
+                del self._entries[name]
+                changed = True
+            for name in names:
+                changed |= self._index(name)
+            if changed:
+                self._save()
+
+    def update(self, map_name):
+        """Re-index a single map, e.g. right after it was saved."""
+        with self._lock:
+            if self._index(map_name):
+                self._save()
+
+    def _index(self, map_name):
+        yaml_path = os.path.join(self.maps_dir, f"{map_name}.yaml")
+        previous = self._entries.get(map_name)
+        if previous and previous["signature"] == file_signature(yaml_path, previous["image"]):
+            return False
+        try:
+            entry = describe_map(self.maps_dir, map_name)
+        except Exception as e:
+            print(f"Failed to index map {map_name}: {e}")
+            return self._entries.pop(map_name, None) is not None
+
+        entry["created"] = previous["created"] if previous else entry["modified"]
+        entry["indexed"] = time.time()
+        self._entries[map_name] = entry
+        return True
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": CATALOG_VERSION, "maps": list(self._entries.values())}, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, map_name):
+        """Return the catalog entry of one map, or ``None``."""
+        self.refresh()
+        with self._lock:
+            entry = self._entries.get(map_name)
+            if entry is None and os.path.exists(os.path.join(self.maps_dir, f"{map_name}.yaml")):
+                if self._index(map_name):
+                    self._save()
+                entry = self._entries.get(map_name)
+        return entry
+
+    def query(self, offset=0, limit=None, name=None, sort="name", descending=False):
+        """Return ``(total, entries)`` for one page of the filtered listing."""
+        self.refresh()
+        with self._lock:
+            entries = list(self._entries.values())
+
+        if name:
+            needle = name.lower()
+            entries = [e for e in entries if needle in e["name"].lower()]
+        entries.sort(key=lambda e: e[sort], reverse=descending)
+
+        end = None if limit is None else offset + limit
+        page = [
+            {k: v for k, v in e.items() if k not in ("signature", "image")}
+            for e in entries[offset:end]
+        ]
+        return len(entries), page
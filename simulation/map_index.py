@@ -0,0 +1,162 @@
+"""Instant goal validation against the active map.
+
+A ``MapIndex`` is built once per map: the free space is shrunk by the robot
+radius with a distance transform and split into connected components. A goal
+is then accepted, snapped to the nearest reachable cell, or rejected without
+a round trip to the Nav2 planner.
+"""
+import os
+from collections import OrderedDict
+from threading import Lock
+
+import cv2
+import numpy as np
+import yaml
+from PIL import Image
+
+from helper import map_digest, occupancy_masks
+
+# robot_radius of the waffle costmaps in miscellaneous/waffle.yaml.
+ROBOT_RADIUS = 0.15
+# Goals further than this from reachable space are rejected rather than moved.
+MAX_SNAP_DISTANCE = 0.5
+# Nearest-cell images kept per map, one per component asked about.
+CACHED_NEAREST = 8
+
+
+class MapIndex:
+    def __init__(self, image, meta, robot_radius=ROBOT_RADIUS, name=None, digest=None):
+        self.name = name
+        self.digest = digest
+        self.robot_radius = robot_radius
+        self.resolution = float(meta["resolution"])
+        self.origin = [float(v) for v in meta.get("origin", [0.0, 0.0, 0.0])[:2]]
+        self.height, self.width = image.shape
+
+        free, _ = occupancy_masks(image, meta)
+        # Distance of every free cell to the closest occupied or unknown one.
+        self.clearance = cv2.distanceTransform(free.astype(np.uint8), cv2.DIST_L2, 5) * self.resolution
+        self.traversable = self.clearance > robot_radius
+        count, self.components = cv2.connectedComponents(self.traversable.astype(np.uint8), connectivity=8)
+        self.component_count = count - 1
+
+        self._nearest = OrderedDict()
+        self._nearest_lock = Lock()
+
+    @classmethod
+    def load(cls, maps_dir, map_name, robot_radius=ROBOT_RADIUS):
+        yaml_path = os.path.join(maps_dir, f"{map_name}.yaml")
+        with open(yaml_path) as f:
+            meta = yaml.safe_load(f)
+        image_path = meta.get("image", f"{map_name}.pgm")
+        if not os.path.isabs(image_path):
+            image_path = os.path.join(maps_dir, image_path)
+        image = np.asarray(Image.open(image_path).convert("L"))
+        return cls(image, meta, robot_radius, map_name, map_digest(image_path, yaml_path))
+
+    def to_cells(self, xs, ys):
+        """Image ``(rows, cols)`` of world points; row 0 is the top of the image."""
+        cols = np.floor((np.asarray(xs) - self.origin[0]) / self.resolution).astype(np.int64)
+        rows = self.height - 1 - np.floor((np.asarray(ys) - self.origin[1]) / self.resolution).astype(np.int64)
+        return rows, cols
+
+    def to_world(self, rows, cols):
+        """World coordinates of the centres of the given cells."""
+        xs = self.origin[0] + (np.asarray(cols) + 0.5) * self.resolution
+        ys = self.origin[1] + (self.height - 1 - np.asarray(rows) + 0.5) * self.resolution
+        return xs, ys
+
+    def nearest(self, component=None):
+        """``int32`` image of the flat index (``row * width + col``) of every cell's closest target.
+
+        Targets are the cells of ``component``, or every traversable cell for
+        ``None``. Each transform is computed on first use; the last
+        ``CACHED_NEAREST`` are kept.
+        """
+        with self._nearest_lock:
+            if component in self._nearest:
+                self._nearest.move_to_end(component)
+                return self._nearest[component]
+
+            targets = self.traversable if component is None else self.components == component
+            source = np.where(targets, 0, 1).astype(np.uint8)
+            _, labels = cv2.distanceTransformWithLabels(source, cv2.DIST_L2, 5, labelType=cv2.DIST_LABEL_PIXEL)
+            # Labels number the target cells 1..n in row-major order.
+            index = np.flatnonzero(targets).astype(np.int32)[labels - 1]
+            self._nearest[component] = index
+            while len(self._nearest) > CACHED_NEAREST:
+                self._nearest.popitem(last=False)
+            return index
+
+    def reachable_cell(self, x, y):
+        """``(row, col)`` of the traversable cell closest to a world point."""
+        rows, cols = self.to_cells([x], [y])
+        row = int(np.clip(rows[0], 0, self.height - 1))
+        col = int(np.clip(cols[0], 0, self.width - 1))
+        if not self.traversable[row, col]:
+            # AMCL can put the robot a little too close to a wall; use the free space next to it.
+            row, col = divmod(int(self.nearest()[row, col]), self.width)
+        return row, col
+
+    def component_at(self, x, y):
+        """Component the robot at ``(x, y)`` can drive in; 0 if the map has no free space."""
+        if self.component_count == 0:
+            return 0
+        return int(self.components[self.reachable_cell(x, y)])
+
+    def validate(self, points, robot=None, max_snap=None):
+        """Check many ``(x, y)`` goals at once.
+
+        Goals are judged against the component the robot stands in, or any
+        traversable cell when ``robot`` is ``None``. Each result has a
+        ``status`` of ``accepted``, ``snapped`` (``x``/``y`` moved to the
+        nearest reachable cell, at most ``max_snap`` metres away) or
+        ``unreachable`` with a ``reason``.
+        """
+        if max_snap is None:
+            max_snap = MAX_SNAP_DISTANCE
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if self.component_count == 0:
+            return [self._result("unreachable", x, y, reason="map has no free space") for x, y in points]
+
+        component = None if robot is None else self.component_at(*robot)
+        nearest = self.nearest(component)
+
+        rows, cols = self.to_cells(points[:, 0], points[:, 1])
+        inside = (rows >= 0) & (rows < self.height) & (cols >= 0) & (cols < self.width)
+        rows = np.clip(rows, 0, self.height - 1)
+        cols = np.clip(cols, 0, self.width - 1)
+
+        near = nearest[rows, cols]
+        snap_rows, snap_cols = np.divmod(near, self.width)
+        snap_xs, snap_ys = self.to_world(snap_rows, snap_cols)
+        snap_distance = np.hypot(snap_xs - points[:, 0], snap_ys - points[:, 1])
+        reachable = near == rows * self.width + cols
+        clearance = self.clearance[snap_rows, snap_cols]
+
+        results = []
+        for i, (x, y) in enumerate(points):
+            if not inside[i]:
+                results.append(self._result("unreachable", x, y, reason="outside the map"))
+            elif reachable[i]:
+                results.append(self._result("accepted", x, y, clearance=clearance[i]))
+            elif snap_distance[i] <= max_snap:
+                results.append(self._result(
+                    "snapped", snap_xs[i], snap_ys[i], clearance=clearance[i], snap_distance=snap_distance[i]
+                ))
+            elif self.traversable[rows[i], cols[i]]:
+                results.append(self._result("unreachable", x, y, reason="not connected to the robot's position"))
+            else:
+                results.append(self._result("unreachable", x, y, reason="too close to an obstacle or unknown space"))
+        return results
+
+    @staticmethod
+    def _result(status, x, y, reason=None, clearance=None, snap_distance=None):
+        return {
+            "status": status,
+            "x": float(x),
+            "y": float(y),
+            "reason": reason,
+            "clearance": None if clearance is None else float(clearance),
+            "snap_distance": None if snap_distance is None else float(snap_distance),
+        }
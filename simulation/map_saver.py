@@ -0,0 +1,97 @@
+"""Save OccupancyGrid messages as map_server maps without map_saver_cli.
+
+The output matches what ``map_saver_cli`` writes in trinary mode: a binary
+``.pgm`` (0 occupied, 254 free, 205 unknown, top row first) and a ``.yaml``
+with the thresholds used to classify the cells.
+"""
+import math
+import os
+import re
+import tempfile
+
+import numpy as np
+
+from occupancy import grid_view
+
+OCCUPIED_THRESH = 0.65
+FREE_THRESH = 0.25
+MAP_NAME = re.compile(r"^[A-Za-z0-9_\-.]+$")
+
+
+def valid_map_name(map_name):
+    return bool(map_name) and MAP_NAME.match(map_name) is not None and not map_name.startswith(".")
+
+
+def snapshot_grid(msg):
+    """Copy what saving needs out of an OccupancyGrid, so the message can be released."""
+    info = msg.info
+    q = info.origin.orientation
+    yaw = math.atan2(2.0 * (q.w * q.z + q.x * q.y), 1.0 - 2.0 * (q.y * q.y + q.z * q.z))
+    return {
+        "cells": grid_view(msg).copy(),
+        "resolution": float(info.resolution),
+        "origin": [float(info.origin.position.x), float(info.origin.position.y), yaw],
+    }
+
+
+def trinary_lut(occupied_thresh=OCCUPIED_THRESH, free_thresh=FREE_THRESH):
+    """Pixel for every int8 cell value reinterpreted as uint8, as map_saver classifies it."""
+    values = np.arange(256, dtype=np.uint8).view(np.int8).astype(np.int16)
+    lut = np.full(256, 205, dtype=np.uint8)
+    known = (values >= 0) & (values <= 100)
+    lut[known & (values >= occupied_thresh * 100)] = 0
+    lut[known & (values <= free_thresh * 100)] = 254
+    return lut
+
+
+def grid_to_pgm(cells, occupied_thresh=OCCUPIED_THRESH, free_thresh=FREE_THRESH):
+    """Occupancy cells (row 0 at the map origin) to an image with row 0 at the top."""
+    return trinary_lut(occupied_thresh, free_thresh)[cells.view(np.uint8)][::-1]
+
+
+def map_yaml(map_name, resolution, origin, occupied_thresh=OCCUPIED_THRESH, free_thresh=FREE_THRESH):
+    return (
+        f"image: ./{map_name}.pgm\n"
+        f"mode: trinary\n"
+        f"resolution: {resolution:g}\n"
+        f"origin: [{origin[0]:g}, {origin[1]:g}, {origin[2]:g}]\n"
+        f"negate: 0\n"
+        f"occupied_thresh: {occupied_thresh:g}\n"
+        f"free_thresh: {free_thresh:g}\n"
+    )
+
+
+def write_map(maps_dir, map_name, snapshot):
+    """Write ``<map_name>.pgm`` and ``<map_name>.yaml`` from a ``snapshot_grid`` result.
+
+    Both files are written under temporary names and renamed into place, the
+    yaml last, so map listings never pick up a half-written map.
+    """
+    image = np.ascontiguousarray(grid_to_pgm(snapshot["cells"]))
+    height, width = image.shape
+    header = f"P5\n# CREATOR: navimate {snapshot['resolution']:.3f} m/pix\n{width} {height}\n255\n".encode()
+    yaml_text = map_yaml(map_name, snapshot["resolution"], snapshot["origin"])
+
+    os.makedirs(maps_dir, exist_ok=True)
+    pgm_path = os.path.join(maps_dir, f"{map_name}.pgm")
+    yaml_path = os.path.join(maps_dir, f"{map_name}.yaml")
+    _write_atomic(pgm_path, header + image.tobytes())
+    _write_atomic(yaml_path, yaml_text.encode())
+    return pgm_path, yaml_path
+
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}-", dir=os.path.dirname(path))
+    try:
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
@@ -0,0 +1,61 @@
+import json
+import math
+import os
+
+import numpy as np
+from PIL import Image
+
+from map_cache import ensure_artifact
+
+TILE_SIZE = 256
+# Value map_saver writes for unknown cells; used to pad partial edge tiles.
+UNKNOWN = 205
+
+
+def downsample(image):
+    """Halve an image with 2x2 min-pooling so thin walls survive zooming out."""
+    height, width = image.shape
+    padded = np.pad(image, ((0, height % 2), (0, width % 2)), constant_values=255)
+    return padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2).min(axis=(1, 3))
+
+
+def write_pyramid(image, out_dir, tile_size=TILE_SIZE):
+    """Write ``{z}/{x}/{y}.png`` tiles and ``meta.json`` for a grayscale image.
+
+    Zoom ``max_zoom`` is the native resolution and zoom 0 fits the whole map
+    in a single tile.
+    """
+    height, width = image.shape
+    max_zoom = max(0, math.ceil(math.log2(max(width, height) / tile_size)))
+
+    level = image
+    for z in range(max_zoom, -1, -1):
+        level_height, level_width = level.shape
+        for x in range(math.ceil(level_width / tile_size)):
+            os.makedirs(os.path.join(out_dir, str(z), str(x)), exist_ok=True)
+            for y in range(math.ceil(level_height / tile_size)):
+                tile = np.full((tile_size, tile_size), UNKNOWN, dtype=np.uint8)
+                part = level[y * tile_size:(y + 1) * tile_size, x * tile_size:(x + 1) * tile_size]
+                tile[:part.shape[0], :part.shape[1]] = part
+                Image.fromarray(tile).save(os.path.join(out_dir, str(z), str(x), f"{y}.png"))
+        if z:
+            level = downsample(level)
+
+    meta = {"width": width, "height": height, "tile_size": tile_size, "max_zoom": max_zoom}
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return meta
+
+
+def ensure_pyramid(maps_dir, map_name, cache_dir):
+    """Return ``(digest, tiles_dir)`` for a saved map, building the pyramid if needed."""
+    return ensure_artifact(maps_dir, map_name, cache_dir, "tiles", write_pyramid)
+
+
+def pyramid_meta(tiles_dir):
+    with open(os.path.join(tiles_dir, "meta.json")) as f:
+        return json.load(f)
+
+
+def tile_path(tiles_dir, z, x, y):
+    return os.path.join(tiles_dir, str(z), str(x), f"{y}.png")
@@ -0,0 +1,213 @@
+import asyncio
+import os
+import signal
+import time
+from subprocess import DEVNULL, PIPE, CalledProcessError, Popen, TimeoutExpired, run
+from threading import RLock, Thread
+
+CARTOGRAPHER_COMMAND = [
+    "ros2", "launch", "turtlebot3_cartographer", "cartographer.launch.py", "use_sim_time:=true"
+]
+# The spare waits without a trajectory: no scans integrated, no map->odom TF, no /map.
+STANDBY_COMMAND = CARTOGRAPHER_COMMAND + ["start_trajectory:=false"]
+CARTOGRAPHER_CONFIG = "turtlebot3_lds_2d.lua"
+# How long ``ros2 launch`` gets to shut its nodes down after SIGINT.
+STOP_TIMEOUT = 10.0
+# How long a handed-over spare gets to start its trajectory.
+TRAJECTORY_TIMEOUT = 30.0
+
+
+def start_trajectory_command(basename=CARTOGRAPHER_CONFIG):
+    """The ``/start_trajectory`` call that begins mapping on a waiting Cartographer."""
+    from ament_index_python.packages import get_package_share_directory
+
+    config_dir = os.path.join(get_package_share_directory("turtlebot3_cartographer"), "config")
+    request = (
+        f"{{configuration_directory: '{config_dir}', configuration_basename: '{basename}', "
+        "use_initial_pose: false, relative_to_trajectory_id: 0}"
+    )
+    return ["ros2", "service", "call", "/start_trajectory", "cartographer_ros_msgs/srv/StartTrajectory", request]
+
+
+class MappingSession:
+    """Runs Cartographer in the background and tracks when its map is usable.
+
+    ``start`` and ``stop`` return immediately; launching and teardown happen on
+    helper threads. The session is ``starting`` until ``map_received`` sees the
+    first ``/map`` message after the start, then ``ready``. With ``standby``
+    a spare Cartographer is launched ahead of time without a trajectory, so it
+    neither maps nor publishes while it waits. The next start hands it over
+    and begins a fresh trajectory on it, so only that and the first map
+    message are waited for.
+
+    States: ``stopped``, ``starting``, ``ready``, ``stopping``, ``failed``.
+    """
+
+    def __init__(self, command=CARTOGRAPHER_COMMAND, standby=False, stop_timeout=STOP_TIMEOUT,
+                 standby_command=STANDBY_COMMAND, start_trajectory=start_trajectory_command):
+        self.command = command
+        self.standby = standby
+        self.standby_command = standby_command
+        self.start_trajectory = start_trajectory
+        self.stop_timeout = stop_timeout
+        self.state = "stopped"
+        self.error = None
+        self.process = None
+        self.standby_process = None
+        self.started = None
+        self.ready_at = None
+        self.changed = time.time()
+        self.maps_received = 0
+        self.last_map = None
+        self._lock = RLock()
+        self._listeners = set()
+
+    def start(self):
+        """Begin a session; returns False if one is already active or shutting down."""
+        with self._lock:
+            if self.state in ("starting", "ready", "stopping"):
+                return False
+            self.started = time.time()
+            self.ready_at = None
+            self.maps_received = 0
+            process, self.standby_process = self.standby_process, None
+            spare = process is not None and process.poll() is None
+            try:
+                if not spare:
+                    process = self._launch(self.command)
+            except Exception as e:
+                self._set("failed", f"failed to launch mapping: {e}")
+                raise
+            self.process = process
+            self._set("starting")
+        Thread(target=self._watch, args=(process,), daemon=True, name="mapping-watch").start()
+        if spare:
+            Thread(target=self._begin_trajectory, args=(process,), daemon=True, name="mapping-trajectory").start()
+        return True
+
+    def stop(self):
+        """End the active session; returns False if there was none."""
+        with self._lock:
+            if self.state not in ("starting", "ready", "failed"):
+                return False
+            process, self.process = self.process, None
+            self._set("stopping")
+        Thread(target=self._shutdown, args=(process,), daemon=True, name="mapping-stop").start()
+        return True
+
+    def warm(self):
+        """Launch the standby Cartographer if standby is enabled and none is running."""
+        with self._lock:
+            if not self.standby:
+                return
+            if self.standby_process is None or self.standby_process.poll() is not None:
+                try:
+                    self.standby_process = self._launch(self.standby_command)
+                except Exception as e:
+                    print(f"Failed to launch standby mapping: {e}")
+
+    def close(self):
+        with self._lock:
+            processes = [self.process, self.standby_process]
+            self.process = self.standby_process = None
+            self.standby = False
+        for process in processes:
+            terminate(process, self.stop_timeout)
+
+    def map_received(self):
+        """Called for every ``/map`` message, on the ROS executor thread."""
+        now = time.time()
+        self.last_map = now
+        if self.state == "starting":
+            with self._lock:
+                if self.state == "starting":
+                    self.ready_at = now
+                    self._set("ready")
+        if self.state == "ready":
+            self.maps_received += 1
+
+    def status(self):
+        with self._lock:
+            process = self.process
+            standby = self.standby_process
+            return {
+                "state": self.state,
+                "error": self.error,
+                "changed": self.changed,
+                "pid": process.pid if process else None,
+                "started": self.started,
+                "ready_at": self.ready_at,
+                "startup_seconds": self.ready_at - self.started if self.ready_at and self.started else None,
+                "maps_received": self.maps_received,
+                "last_map_age": time.time() - self.last_map if self.last_map else None,
+                "standby": self.standby,
+                "standby_ready": standby is not None and standby.poll() is None,
+            }
+
+    def listen(self):
+        """Return an asyncio queue that receives the status after every state change."""
+        updates = asyncio.Queue()
+        with self._lock:
+            self._listeners.add((asyncio.get_running_loop(), updates))
+        return updates
+
+    def unlisten(self, updates):
+        with self._lock:
+            self._listeners = {entry for entry in self._listeners if entry[1] is not updates}
+
+    def _launch(self, command):
+        # A session of its own, so the whole launch tree can be signalled at once.
+        return Popen(command, start_new_session=True)
+
+    def _begin_trajectory(self, process):
+        """Start mapping on a handed-over spare; the call waits for its service to come up."""
+        try:
+            run(self.start_trajectory(), check=True, timeout=TRAJECTORY_TIMEOUT, stdout=DEVNULL, stderr=PIPE)
+            return
+        except CalledProcessError as e:
+            error = e.stderr.decode().strip() or str(e)
+        except Exception as e:
+            error = str(e)
+        with self._lock:
+            if self.process is process and self.state == "starting":
+                self._set("failed", f"failed to start a trajectory: {error}")
+
+    def _set(self, state, error=None):
+        self.state = state
+        self.error = error
+        self.changed = time.time()
+        snapshot = self.status()
+        for loop, updates in self._listeners:
+            loop.call_soon_threadsafe(updates.put_nowait, snapshot)
+
+    def _watch(self, process):
+        code = process.wait()
+        with self._lock:
+            if self.process is process:
+                self.process = None
+                self._set("failed", f"mapping exited with code {code}")
+
+    def _shutdown(self, process):
+        terminate(process, self.stop_timeout)
+        with self._lock:
+            if self.state == "stopping":
+                self._set("stopped")
+        self.warm()
+
+
+def terminate(process, timeout=STOP_TIMEOUT):
+    """Stop a launch process group: SIGINT, then SIGTERM, then SIGKILL."""
+    if process is None:
+        return
+    for sig, wait in ((signal.SIGINT, timeout), (signal.SIGTERM, 2.0), (signal.SIGKILL, None)):
+        if process.poll() is not None:
+            return
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            return
+        try:
+            process.wait(wait)
+            return
+        except TimeoutExpired:
+            continue
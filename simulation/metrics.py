@@ -0,0 +1,265 @@
+"""In-process metrics served as Prometheus text from ``/metrics``.
+
+Recording is meant to stay on in the hot paths (per frame, per ROS
+callback): look up a labelled child once and keep it, after which a counter
+increment or histogram observation is a short critical section and a
+``bisect``. Counters are totals; Prometheus' ``rate()`` turns them into
+frames, bytes or publishes per second.
+"""
+import bisect
+import time
+from threading import Lock
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TASK_BUCKETS = (1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _CounterValue:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = Lock()
+
+    def inc(self, amount=1.0):
+        with self.lock:
+            self.value += amount
+
+
+class _GaugeValue(_CounterValue):
+    __slots__ = ()
+
+    def dec(self, amount=1.0):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.lock = Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = Lock()
+        registry.register(self)
+
+    def labels(self, *values):
+        """The child for one combination of label values; keep it to skip this lookup."""
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def remove(self, *values):
+        with self._lock:
+            self._children.pop(tuple(str(v) for v in values), None)
+
+    def _items(self):
+        with self._lock:
+            return list(self._children.items())
+
+    def _labels_text(self, values, extra=None):
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def inc(self, amount=1.0):
+        self.labels().inc(amount)
+
+    def samples(self):
+        for values, child in self._items():
+            yield f"{self.name}{self._labels_text(values)} {_number(child.value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeValue()
+
+    def dec(self, amount=1.0):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def samples(self):
+        for values, child in self._items():
+            with child.lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{self._labels_text(values, le)} {cumulative}"
+            yield f"{self.name}_sum{self._labels_text(values)} {_number(total)}"
+            yield f"{self.name}_count{self._labels_text(values)} {cumulative}"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+HTTP_LATENCY = Histogram(
+    "navimate_http_request_duration_seconds",
+    "Time from receiving a request to sending the response headers, per route.",
+    ("method", "route", "status"),
+)
+WEBSOCKET_CLIENTS = Gauge("navimate_websocket_clients", "Open WebSocket connections, per route.", ("route",))
+STREAM_CLIENTS = Gauge("navimate_stream_clients", "Viewers of each shared MJPEG stream.", ("stream",))
+STREAM_FRAMES = Counter("navimate_stream_frames_total", "Frames published by each shared stream.", ("stream",))
+STREAM_BYTES = Counter("navimate_stream_bytes_total", "Bytes published by each shared stream.", ("stream",))
+STREAM_DROPPED = Counter(
+    "navimate_stream_dropped_frames_total",
+    "Frames replaced before a slow viewer picked them up.",
+    ("stream",),
+)
+ROS_CALLBACK = Histogram(
+    "navimate_ros_callback_duration_seconds", "Time spent in ROS subscription callbacks.", ("callback",)
+)
+CMD_VEL_PUBLISHED = Counter("navimate_cmd_vel_published_total", "Velocity commands published on /cmd_vel.")
+NAV_TASK_DURATION = Histogram(
+    "navimate_nav_task_duration_seconds",
+    "Duration of finished navigation tasks, by kind and final state.",
+    ("kind", "state"),
+    buckets=TASK_BUCKETS,
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording HTTP latency and open WebSockets per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            await self._http(scope, receive, send)
+        elif scope["type"] == "websocket":
+            await self._websocket(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def _http(self, scope, receive, send):
+        started = time.perf_counter()
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                HTTP_LATENCY.labels(scope["method"], _route(scope), message["status"]).observe(
+                    time.perf_counter() - started
+                )
+            await send(message)
+
+        await self.app(scope, receive, timed_send)
+
+    async def _websocket(self, scope, receive, send):
+        gauge = None
+
+        async def counted_send(message):
+            nonlocal gauge
+            if message["type"] == "websocket.accept" and gauge is None:
+                gauge = WEBSOCKET_CLIENTS.labels(_route(scope))
+                gauge.inc()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, counted_send)
+        finally:
+            if gauge is not None:
+                gauge.dec()
+
+
+def _route(scope):
+    # The path template, not the raw path, so ids in URLs do not explode the label set.
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
@@ -35,6 +35,7 @@ def generate_launch_description():
                                                   turtlebot3_cartographer_prefix, 'config'))
     configuration_basename = LaunchConfiguration('configuration_basename',
                                                  default='turtlebot3_lds_2d.lua')
+    start_trajectory = LaunchConfiguration('start_trajectory', default='true')
 
     resolution = LaunchConfiguration('resolution', default='0.05')
     publish_period_sec = LaunchConfiguration('publish_period_sec', default='1.0')
@@ -51,6 +52,10 @@ def generate_launch_description():
             'configuration_basename',
             default_value=configuration_basename,
             description='Name of lua file for cartographer'),
+        DeclareLaunchArgument(
+            'start_trajectory',
+            default_value='true',
+            description='Start a trajectory right away; if false, wait for /start_trajectory'),
         DeclareLaunchArgument(
             'use_sim_time',
             default_value='false',
@@ -63,7 +68,8 @@ def generate_launch_description():
             output='screen',
             parameters=[{'use_sim_time': use_sim_time}],
             arguments=['-configuration_directory', cartographer_config_dir,
-                       '-configuration_basename', configuration_basename]),
+                       '-configuration_basename', configuration_basename,
+                       ['-start_trajectory_with_default_topics=', start_trajectory]]),
 
         DeclareLaunchArgument(
             'resolution',
@@ -0,0 +1,97 @@
+import re
+
+JPEG_START = b'\xff\xd8'
+JPEG_END = b'\xff\xd9'
+
+CONTENT_LENGTH = re.compile(rb"content-length:[ \t]*(\d+)", re.IGNORECASE)
+X_TIMESTAMP = re.compile(rb"x-timestamp:[ \t]*([\d.]+)", re.IGNORECASE)
+
+
+class MJPEGSplitter:
+    """Incremental splitter for multipart MJPEG (or bare concatenated JPEG) streams.
+
+    Bytes are accumulated in a single ``bytearray`` and scanned forward from
+    where the previous call stopped, so each byte is looked at a bounded number
+    of times. When the part headers carry a ``Content-Length`` the frame end is
+    taken from it; otherwise the splitter falls back to the JPEG end marker.
+
+    ``feed`` yields ``memoryview`` slices of the internal buffer. They stay
+    valid only until the next ``feed`` call, so copy or consume them first.
+    ``timestamp`` holds the ``X-Timestamp`` of the last yielded frame, if any.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._views = []
+        self._consumed = 0
+        self._pos = 0
+        self._frame_start = None
+        self._frame_end = None
+        self._frame_timestamp = None
+        self.timestamp = None
+
+    def __len__(self):
+        return len(self._buffer) - self._consumed
+
+    def feed(self, chunk):
+        self._compact()
+        self._buffer += chunk
+        while True:
+            frame = self._next_frame()
+            if frame is None:
+                return
+            yield frame
+
+    def _compact(self):
+        for view in self._views:
+            view.release()
+        self._views.clear()
+
+        consumed = self._consumed
+        if not consumed:
+            return
+        del self._buffer[:consumed]
+        self._consumed = 0
+        self._pos -= consumed
+        if self._frame_start is not None:
+            self._frame_start -= consumed
+        if self._frame_end is not None:
+            self._frame_end -= consumed
+
+    def _next_frame(self):
+        buffer = self._buffer
+
+        if self._frame_start is None:
+            start = buffer.find(JPEG_START, self._pos)
+            if start < 0:
+                # Keep the last byte in case it is the first half of a marker.
+                self._pos = max(self._pos, len(buffer) - 1)
+                return None
+            self._frame_start = start
+            self._pos = start + len(JPEG_START)
+            match = CONTENT_LENGTH.search(buffer, self._consumed, start)
+            self._frame_end = start + int(match.group(1)) if match else None
+            match = X_TIMESTAMP.search(buffer, self._consumed, start)
+            self._frame_timestamp = float(match.group(1)) if match else None
+
+        if self._frame_end is not None:
+            end = self._frame_end
+            if len(buffer) < end:
+                return None
+            if buffer[end - 2:end] != JPEG_END:
+                # The declared length does not frame a JPEG; scan for the marker.
+                self._frame_end = None
+                return self._next_frame()
+        else:
+            marker = buffer.find(JPEG_END, self._pos)
+            if marker < 0:
+                self._pos = max(self._pos, len(buffer) - 1)
+                return None
+            end = marker + len(JPEG_END)
+
+        view = memoryview(buffer)[self._frame_start:end]
+        self._views.append(view)
+        self._consumed = self._pos = end
+        self._frame_start = self._frame_end = None
+        self.timestamp = self._frame_timestamp
+        return view
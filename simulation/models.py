@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 class goalInput(BaseModel):
     x: float
@@ -18,5 +18,72 @@ class MappingStatus(BaseModel):
 class SaveMapRequest(BaseModel):
     map_name: Optional[str] = "my_map"
 
+class MapSaveStatus(BaseModel):
+    map_name: str
+    state: str
+    error: Optional[str] = None
+    started: float
+    finished: Optional[float] = None
+
 class ChangeMapRequest(BaseModel):
     map_name: str
+
+class GoalCheck(BaseModel):
+    status: str
+    x: float
+    y: float
+    reason: Optional[str] = None
+    clearance: Optional[float] = None
+    snap_distance: Optional[float] = None
+
+class GoalBatch(BaseModel):
+    points: List[goalInput]
+    max_snap: Optional[float] = None
+    from_robot: bool = True
+
+class GoalBatchResult(BaseModel):
+    map_name: Optional[str] = None
+    results: List[GoalCheck]
+
+class TaskSubmitted(BaseModel):
+    status: str
+    task_id: Optional[str] = None
+    goal: Optional[GoalCheck] = None
+
+class PathPreview(BaseModel):
+    cached: bool
+    goal: Optional[GoalCheck] = None
+    points: List[List[float]]
+    length: float
+    map_name: Optional[str] = None
+
+class RouteRequest(BaseModel):
+    stops: List[goalInput]
+    optimize: bool = True
+    return_to_start: bool = False
+
+class RouteSubmitted(BaseModel):
+    status: str
+    task_id: Optional[str] = None
+    order: List[int] = []
+    stops: List[GoalCheck] = []
+    estimated_distance: Optional[float] = None
+    planning_ms: Optional[float] = None
+
+class TaskStatus(BaseModel):
+    id: str
+    kind: str
+    state: str
+    created: float
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    feedback: dict = {}
+    error: Optional[str] = None
+
+class RecordingRequest(BaseModel):
+    name: Optional[str] = None
+
+class RecordingStatus(BaseModel):
+    status: str
+    recording: Optional[dict] = None
+    replay: Optional[dict] = None
@@ -0,0 +1,230 @@
+import asyncio
+import itertools
+import queue
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock, RLock, Thread
+
+from metrics import NAV_TASK_DURATION
+
+# How often a running task wakes up to publish feedback and check for cancellation.
+FEEDBACK_PERIOD = 0.2
+HISTORY_SIZE = 100
+
+
+def result_state(status):
+    """Task state for an action GoalStatus; ROS is imported here so the API can start without it."""
+    from action_msgs.msg import GoalStatus
+
+    return {
+        GoalStatus.STATUS_SUCCEEDED: "succeeded",
+        GoalStatus.STATUS_CANCELED: "canceled",
+        GoalStatus.STATUS_ABORTED: "failed",
+    }.get(status, "failed")
+
+
+class NavigationTask:
+    """One navigation request and everything known about its progress."""
+
+    _counter = itertools.count(1)
+
+    def __init__(self, kind, start, estimate=None):
+        self.id = f"{next(self._counter)}-{uuid.uuid4().hex[:8]}"
+        self.kind = kind
+        self.state = "pending"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.feedback = {}
+        self.error = None
+        self.cancel_requested = False
+        self._start = start
+        self._estimate = estimate
+
+    @property
+    def done(self):
+        return self.state in ("succeeded", "canceled", "failed", "rejected")
+
+    def snapshot(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "state": self.state,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "feedback": self.feedback,
+            "error": self.error,
+        }
+
+
+def goal_feedback(feedback):
+    """Progress of a FollowPath/NavigateToPose task from its action feedback."""
+    remaining = feedback.distance_to_goal
+    speed = feedback.speed
+    return {
+        "distance_remaining": remaining,
+        "speed": speed,
+        "eta": remaining / speed if speed > 0.01 else None,
+    }
+
+
+def backup_feedback(distance, speed):
+    def estimate(feedback):
+        traveled = feedback.distance_traveled
+        return {
+            "distance_traveled": traveled,
+            "distance_remaining": max(0.0, distance - traveled),
+            "speed": speed,
+            "eta": max(0.0, distance - traveled) / speed if speed > 0 else None,
+        }
+    return estimate
+
+
+def waypoint_feedback(order, return_to_start=False):
+    """Progress of a FollowWaypoints task; ``order`` maps waypoints back to the requested stops."""
+    def estimate(feedback):
+        current = feedback.current_waypoint
+        return {
+            "current_waypoint": current,
+            "waypoints": len(order) + (1 if return_to_start else 0),
+            "current_stop": order[current] if current < len(order) else None,
+        }
+    return estimate
+
+
+class TaskManager:
+    """Runs navigation tasks on one thread that owns every navigator call.
+
+    Submitting returns immediately. The worker waits on the Nav2 result future
+    (no polling loop in request threads) and wakes every ``FEEDBACK_PERIOD``
+    seconds to publish feedback and honour cancellation. Anything else that
+    needs the navigator must hold ``lock``. Other calls such as ``getPath``
+    replace the navigator's goal handle and result future, so each task keeps
+    its own and cancels and reads its result through them.
+    """
+
+    def __init__(self, navigator):
+        self.navigator = navigator
+        self.lock = RLock()
+        self.current = None
+        self._tasks = OrderedDict()
+        self._tasks_lock = Lock()
+        self._queue = queue.Queue()
+        self._listeners = {}
+        self._thread = Thread(target=self._work, daemon=True, name="navigation-tasks")
+        self._thread.start()
+
+    def submit(self, kind, start, estimate=None):
+        """Queue a task; ``start(navigator)`` sends the Nav2 request and returns whether it was accepted."""
+        task = NavigationTask(kind, start, estimate)
+        with self._tasks_lock:
+            if self.current is not None and not self.current.done:
+                return None
+            self.current = task
+            self._tasks[task.id] = task
+            while len(self._tasks) > HISTORY_SIZE:
+                oldest = next(iter(self._tasks.values()))
+                if not oldest.done:
+                    break
+                self._tasks.popitem(last=False)
+        self._queue.put(task)
+        return task
+
+    def get(self, task_id):
+        with self._tasks_lock:
+            return self._tasks.get(task_id)
+
+    def cancel(self, task_id=None):
+        """Ask a task (the current one by default) to stop; returns it, or None."""
+        task = self.get(task_id) if task_id else self.current
+        if task is None or task.done:
+            return task
+        task.cancel_requested = True
+        return task
+
+    def listen(self, task_id):
+        """Return an asyncio queue that receives the task's snapshots, latest first."""
+        updates = asyncio.Queue(maxsize=1)
+        loop = asyncio.get_running_loop()
+        with self._tasks_lock:
+            self._listeners.setdefault(task_id, set()).add((loop, updates))
+        return updates
+
+    def unlisten(self, task_id, updates):
+        with self._tasks_lock:
+            listeners = self._listeners.get(task_id, set())
+            listeners = {entry for entry in listeners if entry[1] is not updates}
+            if listeners:
+                self._listeners[task_id] = listeners
+            else:
+                self._listeners.pop(task_id, None)
+
+    def _notify(self, task):
+        snapshot = task.snapshot()
+        with self._tasks_lock:
+            listeners = list(self._listeners.get(task.id, ()))
+        for loop, updates in listeners:
+            loop.call_soon_threadsafe(_replace_latest, updates, snapshot)
+
+    def _work(self):
+        while True:
+            task = self._queue.get()
+            try:
+                self._run(task)
+            except Exception as e:
+                task.state = "failed"
+                task.error = str(e)
+            task.finished = time.time()
+            NAV_TASK_DURATION.labels(task.kind, task.state).observe(task.finished - (task.started or task.created))
+            self._notify(task)
+
+    def _run(self, task):
+        import rclpy
+
+        navigator = self.navigator
+        if task.cancel_requested:
+            task.state = "canceled"
+            return
+
+        task.state = "running"
+        task.started = time.time()
+        self._notify(task)
+        with self.lock:
+            accepted = task._start(navigator)
+        if not accepted:
+            task.state = "rejected"
+            return
+
+        goal_handle = navigator.goal_handle
+        future = navigator.result_future
+        cancel_sent = False
+        while not future.done():
+            with self.lock:
+                rclpy.spin_until_future_complete(navigator, future, timeout_sec=FEEDBACK_PERIOD)
+                if task.cancel_requested and not cancel_sent and not future.done():
+                    canceling = goal_handle.cancel_goal_async()
+                    rclpy.spin_until_future_complete(navigator, canceling, timeout_sec=FEEDBACK_PERIOD)
+                    cancel_sent = True
+                feedback = navigator.getFeedback()
+            if feedback is not None and task._estimate is not None:
+                try:
+                    task.feedback = task._estimate(feedback)
+                except AttributeError:
+                    pass
+                self._notify(task)
+
+        response = future.result()
+        task.state = result_state(response.status)
+        if task.state == "failed":
+            try:
+                task.error = f"{response.result.error_code}: {response.result.error_msg}"
+            except AttributeError:
+                pass
+
+
+def _replace_latest(updates, item):
+    if updates.full():
+        updates.get_nowait()
+    updates.put_nowait(item)
@@ -0,0 +1,92 @@
+import zlib
+
+import numpy as np
+
+TILE_SIZE = 256
+
+# Indexed by the int8 cell value reinterpreted as uint8:
+# -1 (unknown) -> 127, 0 (free) -> 255, 100 (occupied) and anything else -> 0.
+OCCUPANCY_LUT = np.zeros(256, dtype=np.uint8)
+OCCUPANCY_LUT[np.uint8(255)] = 127
+OCCUPANCY_LUT[0] = 255
+OCCUPANCY_LUT[100] = 0
+
+
+def grid_view(msg):
+    """Return the OccupancyGrid cells as a (height, width) int8 array.
+
+    rclpy hands ``msg.data`` over as an ``array.array``, which is viewed
+    without copying.
+    """
+    info = msg.info
+    data = msg.data
+    if isinstance(data, (list, tuple)):
+        data = np.asarray(data, dtype=np.int8)
+    return np.frombuffer(data, dtype=np.int8).reshape((info.height, info.width))
+
+
+def grid_geometry(msg):
+    info = msg.info
+    origin = info.origin.position
+    return (info.width, info.height, info.resolution, origin.x, origin.y)
+
+
+def render_cells(cells):
+    """Map int8 occupancy cells to mono8 pixels through ``OCCUPANCY_LUT``."""
+    # cv2 is only needed once maps are rendered; grid_stream imports this module at startup.
+    import cv2
+
+    return cv2.LUT(cells.view(np.uint8), OCCUPANCY_LUT)
+
+
+def dirty_tiles(previous, grid, tile_size=TILE_SIZE):
+    """Yield ``(y0, y1, x0, x1)`` bounds of the tiles that differ between two grids."""
+    height, width = grid.shape
+    changed = previous != grid
+    changed_rows = changed.any(axis=1)
+    col_starts = np.arange(0, width, tile_size)
+    for y0 in range(0, height, tile_size):
+        y1 = min(y0 + tile_size, height)
+        if not changed_rows[y0:y1].any():
+            continue
+        band = np.logical_or.reduceat(changed[y0:y1].any(axis=0), col_starts)
+        for x0 in col_starts[band]:
+            yield y0, y1, x0, min(x0 + tile_size, width)
+
+
+class OccupancyRenderer:
+    """Renders OccupancyGrid messages into a flipped mono8 image, incrementally.
+
+    A grid identical to the previous one (same geometry and checksum) is not
+    rendered at all. When only part of it changed, only the affected tiles of
+    the kept image are rewritten.
+    """
+
+    def __init__(self, tile_size=TILE_SIZE):
+        self.tile_size = tile_size
+        self.image = None
+        self._grid = None
+        self._geometry = None
+        self._checksum = None
+
+    def render(self, msg):
+        """Return the updated image, or ``None`` if the grid did not change."""
+        grid = grid_view(msg)
+        geometry = grid_geometry(msg)
+        checksum = zlib.crc32(grid)
+
+        if geometry == self._geometry and checksum == self._checksum:
+            return None
+
+        if geometry != self._geometry or self.image is None:
+            self.image = render_cells(grid)[::-1].copy()
+        else:
+            height = grid.shape[0]
+            for y0, y1, x0, x1 in dirty_tiles(self._grid, grid, self.tile_size):
+                self.image[height - y1:height - y0, x0:x1] = render_cells(grid[y0:y1, x0:x1])[::-1]
+
+        # Holding the view keeps the previous message's buffer alive; no copy needed.
+        self._grid = grid
+        self._geometry = geometry
+        self._checksum = checksum
+        return self.image
@@ -0,0 +1,85 @@
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+
+DEFAULT_CAPACITY = 256
+# Start and goal positions closer than this share a cached path.
+QUANTUM = 0.1
+
+
+class PathCache:
+    """Bounded LRU of planned paths keyed by map version and quantized start/goal cells."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, quantum=QUANTUM):
+        self.capacity = capacity
+        self.quantum = quantum
+        self._paths = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def key(self, index, start, goal):
+        """Cache key of a trip on the map behind ``index``, or ``None`` without an index."""
+        if index is None:
+            return None
+        factor = max(1, round(self.quantum / index.resolution))
+        rows, cols = index.to_cells([start[0], goal[0]], [start[1], goal[1]])
+        return (
+            index.name, index.digest,
+            (int(rows[0]) // factor, int(cols[0]) // factor),
+            (int(rows[1]) // factor, int(cols[1]) // factor),
+        )
+
+    def get(self, key):
+        with self._lock:
+            entry = self._paths.get(key) if key is not None else None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._paths.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, path):
+        """Store a nav_msgs Path; returns the cached ``(path, points)`` entry."""
+        points = np.array([(p.pose.position.x, p.pose.position.y) for p in path.poses], dtype=np.float64)
+        entry = (path, points.reshape(-1, 2))
+        if key is None:
+            return entry
+        with self._lock:
+            self._paths[key] = entry
+            self._paths.move_to_end(key)
+            while len(self._paths) > self.capacity:
+                self._paths.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, map_name=None):
+        """Drop the paths planned on one map, or on every map."""
+        with self._lock:
+            stale = [key for key in self._paths if map_name is None or key[0] == map_name]
+            for key in stale:
+                del self._paths[key]
+            self.invalidations += len(stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._paths),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def path_length(points):
+    if len(points) < 2:
+        return 0.0
+    return float(np.hypot(*np.diff(points, axis=0).T).sum())
@@ -0,0 +1,79 @@
+import asyncio
+import math
+from threading import Lock
+
+
+def pose_from_msg(msg):
+    """Flatten a PoseWithCovarianceStamped into a JSON-ready dict."""
+    pose = msg.pose.pose
+    q = pose.orientation
+    return {
+        "x": pose.position.x,
+        "y": pose.position.y,
+        "yaw": math.atan2(2.0 * (q.w * q.z + q.x * q.y), 1.0 - 2.0 * (q.y * q.y + q.z * q.z)),
+        "covariance": list(msg.pose.covariance),
+        "stamp": msg.header.stamp.sec + msg.header.stamp.nanosec * 1e-9,
+        "frame_id": msg.header.frame_id,
+    }
+
+
+def angle_between(a, b):
+    return abs(math.atan2(math.sin(a - b), math.cos(a - b)))
+
+
+class PoseStream:
+    """Latest-value pose broadcast for WebSocket clients.
+
+    ``publish`` only replaces the latest pose and wakes the clients, so a
+    slow client never builds a backlog: it simply sees the newest pose the
+    next time it is ready.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._latest = None
+        self._clients = set()
+
+    @property
+    def latest(self):
+        return self._latest
+
+    def publish(self, pose):
+        """Record a new pose; safe to call from the ROS executor thread."""
+        with self._lock:
+            self._latest = pose
+            clients = list(self._clients)
+        for loop, event in clients:
+            loop.call_soon_threadsafe(event.set)
+
+    async def poses(self, max_rate=10.0, min_distance=0.0, min_angle=0.0):
+        """Yield poses at most ``max_rate`` times per second, skipping small moves."""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        client = (loop, event)
+        if self._latest is not None:
+            event.set()
+        with self._lock:
+            self._clients.add(client)
+
+        period = 1.0 / max_rate if max_rate else 0.0
+        sent = None
+        try:
+            while True:
+                await event.wait()
+                event.clear()
+                pose = self._latest
+
+                if sent is not None:
+                    moved = math.hypot(pose["x"] - sent["x"], pose["y"] - sent["y"])
+                    turned = angle_between(pose["yaw"], sent["yaw"])
+                    if moved <= min_distance and turned <= min_angle:
+                        continue
+
+                yield pose
+                sent = pose
+                if period:
+                    await asyncio.sleep(period)
+        finally:
+            with self._lock:
+                self._clients.discard(client)
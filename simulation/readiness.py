@@ -0,0 +1,57 @@
+import time
+from threading import Lock
+
+from fastapi import HTTPException
+
+
+class Readiness:
+    """Which subsystems have finished starting, for ``/ready`` and 503 responses.
+
+    Each subsystem is ``starting`` until marked ``ready`` or ``failed``;
+    ``seconds`` is how long after process start that happened.
+    """
+
+    def __init__(self, *names, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self._lock = Lock()
+        self._subsystems = {name: {"state": "starting", "error": None, "seconds": None} for name in names}
+
+    def ready(self, name):
+        return self._subsystems[name]["state"] == "ready"
+
+    def mark_ready(self, name):
+        self._mark(name, "ready", None)
+
+    def mark_failed(self, name, error):
+        self._mark(name, "failed", str(error))
+
+    def _mark(self, name, state, error):
+        with self._lock:
+            self._subsystems[name] = {
+                "state": state,
+                "error": error,
+                "seconds": time.perf_counter() - self.started,
+            }
+
+    def mirror(self, name, subsystem):
+        """Copy one subsystem's entry from another process's ``snapshot``."""
+        with self._lock:
+            self._subsystems[name] = dict(subsystem)
+
+    def require(self, *names):
+        """Raise a 503 unless every named subsystem is ready."""
+        for name in names:
+            subsystem = self._subsystems[name]
+            if subsystem["state"] != "ready":
+                detail = f"{name} is {subsystem['state']}"
+                if subsystem["error"]:
+                    detail += f": {subsystem['error']}"
+                raise HTTPException(status_code=503, detail=detail, headers={"Retry-After": "5"})
+
+    def snapshot(self):
+        with self._lock:
+            subsystems = {name: dict(state) for name, state in self._subsystems.items()}
+        return {
+            "ready": all(s["state"] == "ready" for s in subsystems.values()),
+            "subsystems": subsystems,
+        }
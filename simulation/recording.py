@@ -0,0 +1,344 @@
+"""Recording of the topics the API consumes, and replay without a ROS graph.
+
+A recording is one append-only file, written and read through ``mmap``. It
+starts with ``MAGIC`` and holds records aligned to 8 bytes, each a ``<dIB3x``
+header (receive time in seconds, payload length, topic) and the payload:
+
+``POSE``   ``<iI7d36d`` stamp sec, nanosec, position xyz, orientation xyzw,
+           covariance; then the frame id.
+``MAP``    ``<iIIIf7d`` stamp sec, nanosec, width, height, resolution, origin
+           position xyz and orientation xyzw; then the frame id and the
+           zlib-compressed int8 cells in ``OccupancyGrid.data`` order.
+``FRAME``  ``<iI`` stamp sec, nanosec; then the format and the JPEG bytes.
+
+Frame ids and formats are a ``<H`` length and UTF-8 text. The file grows in
+``chunk_size`` steps and is zero-filled ahead of the writer; a record's header
+is written after its payload, so a reader stops cleanly at the first zero
+header, including after a crash mid-record.
+"""
+import mmap
+import struct
+import time
+import zlib
+from threading import Event, Lock, Thread
+
+from occupancy import grid_view
+
+MAGIC = b"NAVREC\x00\x01"
+RECORD = struct.Struct("<dIB3x")
+POSE = 1
+MAP = 2
+FRAME = 3
+TOPICS = {POSE: "amcl_pose", MAP: "map", FRAME: "camera"}
+
+POSE_FIELDS = struct.Struct("<iI7d36d")
+MAP_FIELDS = struct.Struct("<iIIIf7d")
+FRAME_FIELDS = struct.Struct("<iI")
+TEXT_LENGTH = struct.Struct("<H")
+
+CHUNK_SIZE = 16 * 1024 * 1024
+
+
+def _text(value):
+    data = value.encode("utf-8")
+    return TEXT_LENGTH.pack(len(data)) + data
+
+
+def _read_text(payload, offset):
+    (length,) = TEXT_LENGTH.unpack_from(payload, offset)
+    start = offset + TEXT_LENGTH.size
+    return bytes(payload[start:start + length]).decode("utf-8"), start + length
+
+
+def encode_pose(msg):
+    """Payload of a PoseWithCovarianceStamped."""
+    stamp = msg.header.stamp
+    pose = msg.pose.pose
+    p = pose.position
+    q = pose.orientation
+    return POSE_FIELDS.pack(
+        stamp.sec, stamp.nanosec, p.x, p.y, p.z, q.x, q.y, q.z, q.w, *msg.pose.covariance
+    ) + _text(msg.header.frame_id)
+
+
+def decode_pose(payload, msg):
+    """Fill a PoseWithCovarianceStamped from a ``POSE`` payload and return it."""
+    fields = POSE_FIELDS.unpack_from(payload)
+    msg.header.stamp.sec, msg.header.stamp.nanosec = fields[0], fields[1]
+    msg.header.frame_id, _ = _read_text(payload, POSE_FIELDS.size)
+    pose = msg.pose.pose
+    pose.position.x, pose.position.y, pose.position.z = fields[2:5]
+    pose.orientation.x, pose.orientation.y, pose.orientation.z, pose.orientation.w = fields[5:9]
+    msg.pose.covariance = list(fields[9:])
+    return msg
+
+
+def encode_grid(msg, level=1):
+    """Payload of an OccupancyGrid; level 1 keeps compression cheap on the executor thread."""
+    stamp = msg.header.stamp
+    info = msg.info
+    p = info.origin.position
+    q = info.origin.orientation
+    return b"".join((
+        MAP_FIELDS.pack(
+            stamp.sec, stamp.nanosec, info.width, info.height, info.resolution,
+            p.x, p.y, p.z, q.x, q.y, q.z, q.w,
+        ),
+        _text(msg.header.frame_id),
+        zlib.compress(grid_view(msg), level),
+    ))
+
+
+def decode_grid(payload, msg):
+    """Fill an OccupancyGrid from a ``MAP`` payload and return it; ``data`` is an ``array('b')``."""
+    from array import array
+
+    fields = MAP_FIELDS.unpack_from(payload)
+    msg.header.stamp.sec, msg.header.stamp.nanosec = fields[0], fields[1]
+    msg.header.frame_id, offset = _read_text(payload, MAP_FIELDS.size)
+    info = msg.info
+    info.width, info.height, info.resolution = fields[2:5]
+    origin = info.origin
+    origin.position.x, origin.position.y, origin.position.z = fields[5:8]
+    origin.orientation.x, origin.orientation.y, origin.orientation.z, origin.orientation.w = fields[8:12]
+    msg.data = array("b", zlib.decompress(payload[offset:]))
+    return msg
+
+
+def encode_frame(jpeg, stamp, format="jpeg"):
+    """Payload of a camera JPEG with its source stamp in seconds."""
+    sec = int(stamp)
+    return b"".join((FRAME_FIELDS.pack(sec, int((stamp - sec) * 1e9)), _text(format), jpeg))
+
+
+def decode_frame(payload, msg):
+    """Fill a CompressedImage from a ``FRAME`` payload and return it."""
+    from array import array
+
+    sec, nanosec = FRAME_FIELDS.unpack_from(payload)
+    msg.header.stamp.sec, msg.header.stamp.nanosec = sec, nanosec
+    msg.format, offset = _read_text(payload, FRAME_FIELDS.size)
+    data = array("B")
+    data.frombytes(payload[offset:])
+    msg.data = data
+    return msg
+
+
+class TopicRecorder:
+    """Appends records to a recording from any thread.
+
+    Stops accepting records, without failing the callers, once ``max_bytes``
+    is reached or after ``close``.
+    """
+
+    def __init__(self, path, max_bytes=None, chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.started = time.time()
+        self.records = {name: 0 for name in TOPICS.values()}
+        self.dropped = 0
+        self.closed = False
+        self._lock = Lock()
+        self._file = open(path, "w+b")
+        self._file.truncate(chunk_size)
+        self._map = mmap.mmap(self._file.fileno(), chunk_size)
+        self._map[:len(MAGIC)] = MAGIC
+        self._offset = len(MAGIC)
+
+    def write(self, topic, payload, received=None):
+        received = time.time() if received is None else received
+        length = len(payload)
+        size = RECORD.size + (length + 7) // 8 * 8
+        with self._lock:
+            if self.closed:
+                return False
+            if self.max_bytes is not None and self._offset + size > self.max_bytes:
+                self.dropped += 1
+                return False
+            if self._offset + size > len(self._map):
+                self._grow(self._offset + size)
+            start = self._offset + RECORD.size
+            self._map[start:start + length] = payload
+            RECORD.pack_into(self._map, self._offset, received, length, topic)
+            self._offset += size
+            self.records[TOPICS[topic]] += 1
+        return True
+
+    # The closed checks only skip encoding; ``write`` decides under the lock.
+    def pose(self, msg):
+        return not self.closed and self.write(POSE, encode_pose(msg))
+
+    def grid(self, msg):
+        return not self.closed and self.write(MAP, encode_grid(msg))
+
+    def frame(self, jpeg, stamp):
+        return not self.closed and self.write(FRAME, encode_frame(jpeg, stamp))
+
+    def _grow(self, needed):
+        capacity = (needed // self.chunk_size + 1) * self.chunk_size
+        self._map.flush()
+        self._map.close()
+        self._file.truncate(capacity)
+        self._map = mmap.mmap(self._file.fileno(), capacity)
+
+    def close(self):
+        """Flush and trim the file to the records written."""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            self._map.flush()
+            self._map.close()
+            self._file.truncate(self._offset)
+            self._file.close()
+
+    def status(self):
+        return {
+            "path": self.path,
+            "started": self.started,
+            "closed": self.closed,
+            "bytes": self._offset,
+            "records": dict(self.records),
+            "dropped": self.dropped,
+        }
+
+
+class Recording:
+    """Read-only view of a recording; iterating yields ``(received, topic, payload)``.
+
+    Payloads are memoryviews into the mapped file, valid until ``close``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a recording")
+        self._view = memoryview(self._map)
+
+    def __iter__(self):
+        offset = len(MAGIC)
+        end = len(self._map)
+        while offset + RECORD.size <= end:
+            received, length, topic = RECORD.unpack_from(self._map, offset)
+            start = offset + RECORD.size
+            if topic == 0 or start + length > end:
+                break
+            yield received, topic, self._view[start:start + length]
+            offset = start + (length + 7) // 8 * 8
+
+    def summary(self):
+        counts = {name: 0 for name in TOPICS.values()}
+        first = last = None
+        for received, topic, _ in self:
+            counts[TOPICS[topic]] += 1
+            first = received if first is None else first
+            last = received
+        return {
+            "path": self.path,
+            "bytes": len(self._map),
+            "records": counts,
+            "duration": last - first if first is not None else 0.0,
+        }
+
+    def close(self):
+        self._view.release()
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def parse_speed(value):
+    """``"1"`` or ``"4x"`` for a multiple of real time; ``"max"`` or ``0`` for no pacing."""
+    value = str(value).strip().lower()
+    if value in ("max", "0", ""):
+        return 0.0
+    speed = float(value[:-1] if value.endswith("x") else value)
+    if speed < 0:
+        raise ValueError("speed must not be negative")
+    return speed
+
+
+class Replayer:
+    """Feeds a recording to per-topic handlers on a thread, paced by the receive times.
+
+    ``handlers`` maps topics to callables taking the payload; topics without a
+    handler are skipped. ``speed`` multiplies real time, 0 replays as fast as
+    the handlers allow. With ``loop`` the recording starts over when it ends.
+    """
+
+    def __init__(self, path, handlers, speed=1.0, loop=False):
+        self.path = path
+        self.handlers = handlers
+        self.speed = speed
+        self.loop = loop
+        self.state = "idle"
+        self.error = None
+        self.replayed = {name: 0 for name in TOPICS.values()}
+        self.passes = 0
+        self.lag = 0.0
+        self._stop = Event()
+        self._thread = None
+
+    def start(self):
+        self.state = "replaying"
+        self._thread = Thread(target=self.run, daemon=True, name="replay")
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run(self):
+        try:
+            with Recording(self.path) as recording:
+                while not self._stop.is_set():
+                    self._replay(recording)
+                    self.passes += 1
+                    if not self.loop:
+                        break
+            self.state = "stopped" if self._stop.is_set() else "finished"
+        except Exception as e:
+            print(f"Replay of {self.path} failed: {e}")
+            self.state = "failed"
+            self.error = str(e)
+
+    def _replay(self, recording):
+        first = None
+        started = time.monotonic()
+        for received, topic, payload in recording:
+            if self._stop.is_set():
+                return
+            handler = self.handlers.get(topic)
+            if handler is None:
+                continue
+            if first is None:
+                first = received
+            if self.speed:
+                due = started + (received - first) / self.speed
+                delay = due - time.monotonic()
+                if delay > 0 and self._stop.wait(delay):
+                    return
+                self.lag = max(0.0, -delay)
+            handler(payload)
+            self.replayed[TOPICS[topic]] += 1
+
+    def status(self):
+        return {
+            "path": self.path,
+            "state": self.state,
+            "error": self.error,
+            "speed": self.speed,
+            "loop": self.loop,
+            "passes": self.passes,
+            "replayed": dict(self.replayed),
+            "lag": self.lag,
+        }
@@ -0,0 +1,236 @@
+"""ROS nodes of the API, kept apart so rclpy and friends load after startup.
+
+Topic names are relative, so a node created in a robot's namespace (see
+``fleet.py``) talks to that robot; without a namespace they resolve as before.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+import cv2
+import numpy as np
+from cv_bridge import CvBridge
+from geometry_msgs.msg import TwistStamped, PoseStamped, PoseWithCovarianceStamped
+from nav_msgs.msg import OccupancyGrid
+from rclpy.node import Node
+from rclpy.qos import qos_profile_sensor_data
+from sensor_msgs.msg import Image, CompressedImage
+
+from metrics import CMD_VEL_PUBLISHED, ROS_CALLBACK
+from occupancy import OccupancyRenderer
+from recording import FRAME, MAP, POSE, decode_frame, decode_grid, decode_pose
+
+AMCL_CALLBACK = ROS_CALLBACK.labels("amcl_callback")
+MAP_CALLBACK = ROS_CALLBACK.labels("map_callback")
+CMD_VEL = CMD_VEL_PUBLISHED.labels()
+
+
+def map_pose(x, y, stamp):
+    """A PoseStamped in the map frame facing along +x."""
+    pose = PoseStamped()
+    pose.header.frame_id = 'map'
+    pose.header.stamp = stamp
+    pose.pose.position.x = x
+    pose.pose.position.y = y
+    pose.pose.orientation.w = 1.0
+    return pose
+
+
+def stamped_pose(msg):
+    """The PoseStamped part of a PoseWithCovarianceStamped."""
+    pose = PoseStamped()
+    pose.header = msg.header
+    pose.pose = msg.pose.pose
+    return pose
+
+
+def replay_handlers(amcl_node, map_image_node, camera_node):
+    """Handlers for ``recording.Replayer`` that feed recorded messages to the nodes' callbacks."""
+    return {
+        POSE: lambda payload: amcl_node.amcl_callback(decode_pose(payload, PoseWithCovarianceStamped())),
+        MAP: lambda payload: map_image_node.map_callback(decode_grid(payload, OccupancyGrid())),
+        FRAME: lambda payload: camera_node.compressed_callback(decode_frame(payload, CompressedImage())),
+    }
+
+
+class CmdVelPublisher(Node):
+    
+    def __init__(self, namespace=""):
+        super().__init__('websocket_cmd_vel_publisher', namespace=namespace)
+        self.publisher = self.create_publisher(TwistStamped, 'cmd_vel', 10)
+
+    def publish_cmd(self, linear: float, angular: float):
+        msg = TwistStamped()
+        msg.header.stamp = self.get_clock().now().to_msg()
+        msg.header.frame_id = 'base_link'
+        msg.twist.linear.x = linear
+        msg.twist.angular.z = angular
+        self.publisher.publish(msg)
+        CMD_VEL.inc()
+        self.get_logger().debug(f"Published: linear={linear}, angular={angular}")
+
+class AMCLListener(Node):
+
+    def __init__(self, on_pose=None, namespace=""):
+        super().__init__('amcl_listener_node', namespace=namespace)
+        self.amcl_pose = None
+        self.on_pose = on_pose
+
+        self.create_subscription(
+            PoseWithCovarianceStamped,
+            'amcl_pose',
+            self.amcl_callback,
+            10
+        )
+
+    def amcl_callback(self, msg):
+        with AMCL_CALLBACK.time():
+            self.get_logger().debug("Received AMCL pose")
+            self.amcl_pose = msg
+            if self.on_pose is not None:
+                self.on_pose(msg)
+
+class MapImagePublisher(Node):
+    # Republish an unchanged map this often so late web_video_server viewers get a frame.
+    KEEPALIVE_SEC = 5.0
+
+    def __init__(self, on_map=None, namespace=""):
+        super().__init__('map_image_publisher', namespace=namespace)
+        self.on_map = on_map
+        self.bridge = CvBridge()
+        self.renderer = OccupancyRenderer()
+        self.last_image_msg = None
+        self.last_map = None
+        self.last_published = 0.0
+        self.publisher = self.create_publisher(Image, 'map_image', 10)
+        self.subscription = self.create_subscription(
+            OccupancyGrid,
+            'map',
+            self.map_callback,
+            10
+        )
+
+    def map_callback(self, msg):
+        with MAP_CALLBACK.time():
+            self.last_map = msg
+            if self.on_map is not None:
+                self.on_map(msg)
+
+            # Convert OccupancyGrid to grayscale image, redrawing only what changed
+            image = self.renderer.render(msg)
+            now = time.monotonic()
+
+            if image is not None:
+                self.last_image_msg = self.bridge.cv2_to_imgmsg(image, encoding="mono8")
+            elif self.last_image_msg is None or now - self.last_published < self.KEEPALIVE_SEC:
+                return
+
+            self.last_image_msg.header = msg.header
+            self.publisher.publish(self.last_image_msg)
+            self.last_published = now
+
+class CameraStreamer(Node):
+    """Feeds camera frames straight into a PushedStream, bypassing web_video_server.
+
+    The subscription only exists while the stream has viewers or a recorder
+    is set with ``record``. Compressed JPEG messages are forwarded as they are;
+    anything else is encoded on a single worker thread, keeping at most one
+    frame waiting so the executor never blocks.
+    """
+
+    def __init__(self, topic, transport="compressed", jpeg_quality=80, namespace=""):
+        super().__init__('camera_streamer', namespace=namespace)
+        self.topic = topic
+        self.transport = transport
+        self.jpeg_quality = jpeg_quality
+        self.bridge = CvBridge()
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="camera-encode")
+        self.stream = None
+        self.on_frame = None
+        self.subscription = None
+        self._lock = Lock()
+        self._subscription_lock = Lock()
+        self._encoding = False
+        self._pending = None
+
+    def attach(self, stream):
+        self.stream = stream
+        self._update_subscription()
+
+    def detach(self, stream):
+        if self.stream is not stream:
+            return
+        self.stream = None
+        self._update_subscription()
+
+    def record(self, on_frame):
+        """Also hand every JPEG to ``on_frame(jpeg, stamp)``; ``None`` stops."""
+        self.on_frame = on_frame
+        self._update_subscription()
+
+    def _update_subscription(self):
+        with self._subscription_lock:
+            wanted = self.stream is not None or self.on_frame is not None
+            if wanted and self.subscription is None:
+                if self.transport == "compressed":
+                    self.subscription = self.create_subscription(
+                        CompressedImage, f"{self.topic}/compressed", self.compressed_callback,
+                        qos_profile_sensor_data,
+                    )
+                else:
+                    self.subscription = self.create_subscription(
+                        Image, self.topic, self.image_callback, qos_profile_sensor_data
+                    )
+            elif not wanted and self.subscription is not None:
+                self.destroy_subscription(self.subscription)
+                self.subscription = None
+
+    def compressed_callback(self, msg):
+        if self.stream is None and self.on_frame is None:
+            return
+        if "jpeg" in msg.format or "jpg" in msg.format:
+            self._publish(msg.data, self._stamp(msg))
+        else:
+            self._submit(msg)
+
+    def image_callback(self, msg):
+        if self.stream is not None or self.on_frame is not None:
+            self._submit(msg)
+
+    def _publish(self, jpeg, stamp):
+        on_frame = self.on_frame
+        if on_frame is not None:
+            on_frame(jpeg, stamp)
+        stream = self.stream
+        if stream is not None:
+            stream.push(jpeg, stamp)
+
+    def _submit(self, msg):
+        with self._lock:
+            if self._encoding:
+                self._pending = msg
+                return
+            self._encoding = True
+        self.pool.submit(self._encode, msg)
+
+    def _encode(self, msg):
+        while msg is not None:
+            try:
+                if isinstance(msg, CompressedImage):
+                    image = cv2.imdecode(np.frombuffer(msg.data, dtype=np.uint8), cv2.IMREAD_COLOR)
+                else:
+                    image = self.bridge.imgmsg_to_cv2(msg, desired_encoding="bgr8")
+                ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                if ok:
+                    self._publish(jpeg, self._stamp(msg))
+            except Exception as e:
+                self.get_logger().warning(f"Failed to encode camera frame: {e}")
+
+            with self._lock:
+                msg, self._pending = self._pending, None
+                if msg is None:
+                    self._encoding = False
+
+    @staticmethod
+    def _stamp(msg):
+        return msg.header.stamp.sec + msg.header.stamp.nanosec * 1e-9
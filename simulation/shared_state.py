@@ -0,0 +1,146 @@
+"""Latest pose, map, camera frame and status in shared memory.
+
+The bridge process (``NAVIMATE_ROLE=bridge``) is the only writer; API workers
+read. Each value lives in its own ``SeqlockSlot``: a ``<QQdI4x`` header
+(sequence, payload length, time, CRC-32) followed by the payload. The writer
+makes the sequence odd, writes, and makes it even again; a reader copies the
+payload and accepts it only if the sequence was even and unchanged around the
+copy and the CRC matches. Python cannot issue memory fences, so the CRC is what
+guarantees a torn read is never used, on any CPU. The writer never waits for
+readers, so a stalled worker cannot hold up the bridge.
+
+Payloads use the record formats of ``recording.py``; the status slot holds
+JSON.
+"""
+import json
+import struct
+import time
+import zlib
+from multiprocessing import resource_tracker, shared_memory
+from threading import Lock
+
+from recording import decode_frame, decode_grid, decode_pose, encode_frame, encode_grid, encode_pose
+
+HEADER = struct.Struct("<QQdI4x")
+SEQUENCE = struct.Struct("<Q")
+READ_ATTEMPTS = 100
+
+POSE_CAPACITY = 4096
+STATUS_CAPACITY = 256 * 1024
+
+
+class SeqlockSlot:
+    """One latest value in a named shared-memory block, for one writer and any number of readers."""
+
+    def __init__(self, name, capacity=None, create=False):
+        self.name = name
+        if create:
+            try:
+                stale = shared_memory.SharedMemory(name)
+                stale.close()
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+            self._shm = shared_memory.SharedMemory(name, create=True, size=HEADER.size + capacity)
+            HEADER.pack_into(self._shm.buf, 0, 0, 0, 0.0, 0)
+        else:
+            self._shm = shared_memory.SharedMemory(name)
+            # Only the creator may remove the block; a reader's tracker would unlink it on exit.
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+        self.owner = create
+        self.capacity = self._shm.size - HEADER.size
+        self.writes = 0
+        self.retries = 0
+        self._write_lock = Lock()
+
+    def sequence(self):
+        return SEQUENCE.unpack_from(self._shm.buf)[0]
+
+    def write(self, payload, stamp=None):
+        """Publish ``payload``; returns False, changing nothing, if it does not fit."""
+        length = len(payload)
+        if length > self.capacity:
+            return False
+        crc = zlib.crc32(payload)
+        stamp = time.time() if stamp is None else stamp
+        buf = self._shm.buf
+        with self._write_lock:
+            sequence = self.sequence()
+            SEQUENCE.pack_into(buf, 0, sequence + 1)
+            buf[HEADER.size:HEADER.size + length] = payload
+            HEADER.pack_into(buf, 0, sequence + 1, length, stamp, crc)
+            SEQUENCE.pack_into(buf, 0, sequence + 2)
+            self.writes += 1
+        return True
+
+    def read(self, after=None):
+        """Return ``(sequence, stamp, payload)``, or None if empty or still at sequence ``after``."""
+        buf = self._shm.buf
+        for _ in range(READ_ATTEMPTS):
+            sequence, length, stamp, crc = HEADER.unpack_from(buf)
+            if sequence == 0 or sequence == after:
+                return None
+            if sequence % 2 == 0 and length <= self.capacity:
+                payload = bytes(buf[HEADER.size:HEADER.size + length])
+                if self.sequence() == sequence and zlib.crc32(payload) == crc:
+                    return sequence, stamp, payload
+            self.retries += 1
+            time.sleep(0)
+        return None
+
+    def close(self):
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+
+class Message:
+    """Attribute tree standing in for a ROS message where rclpy is not loaded."""
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        value = Message()
+        setattr(self, name, value)
+        return value
+
+
+class SharedState:
+    """The bridge's slots: ``pose``, ``map``, ``frame`` and ``status``, named after ``prefix``."""
+
+    def __init__(self, prefix, map_capacity=None, frame_capacity=None, create=False):
+        """Create the slots with ``create``, otherwise attach to the existing ones."""
+        self.slots = {
+            "pose": SeqlockSlot(f"{prefix}-pose", POSE_CAPACITY, create),
+            "map": SeqlockSlot(f"{prefix}-map", map_capacity, create),
+            "frame": SeqlockSlot(f"{prefix}-frame", frame_capacity, create),
+            "status": SeqlockSlot(f"{prefix}-status", STATUS_CAPACITY, create),
+        }
+
+    def write_pose(self, msg):
+        return self.slots["pose"].write(encode_pose(msg))
+
+    def write_map(self, msg):
+        return self.slots["map"].write(encode_grid(msg))
+
+    def write_frame(self, jpeg, stamp):
+        return self.slots["frame"].write(encode_frame(jpeg, stamp))
+
+    def write_status(self, status):
+        return self.slots["status"].write(json.dumps(status).encode("utf-8"))
+
+    def close(self):
+        for slot in self.slots.values():
+            slot.close()
+
+
+def decode(kind, payload):
+    """Turn a slot payload back into what the writer was given: a message, ``(jpeg, stamp)`` or a dict."""
+    if kind == "pose":
+        return decode_pose(payload, Message())
+    if kind == "map":
+        return decode_grid(payload, Message())
+    if kind == "frame":
+        msg = decode_frame(payload, Message())
+        return msg.data, msg.header.stamp.sec + msg.header.stamp.nanosec * 1e-9
+    return json.loads(payload)
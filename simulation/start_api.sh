@@ -1,4 +1,13 @@
 #!/bin/bash
 source /opt/ros/jazzy/setup.bash
 source /root/turtlebot3_ws/install/setup.bash
+
+# With NAVIMATE_WORKERS > 1 one bridge process owns ROS and Nav2 and the
+# workers share its state; see bridge.py.
+WORKERS=${NAVIMATE_WORKERS:-1}
+if [ "$WORKERS" -gt 1 ]; then
+    export NAVIMATE_BRIDGE_SOCKET=${NAVIMATE_BRIDGE_SOCKET:-/tmp/navimate-bridge.sock}
+    NAVIMATE_ROLE=bridge uvicorn api:app --uds "$NAVIMATE_BRIDGE_SOCKET" &
+    exec env NAVIMATE_ROLE=worker uvicorn api:app --host 0.0.0.0 --port 8000 --workers "$WORKERS"
+fi
 exec uvicorn api:app --host 0.0.0.0 --port 8000
@@ -0,0 +1,231 @@
+import asyncio
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+
+from metrics import STREAM_BYTES, STREAM_CLIENTS, STREAM_DROPPED, STREAM_FRAMES
+from mjpeg import MJPEGSplitter, X_TIMESTAMP
+
+BOUNDARY = "frame"
+MJPEG_MEDIA_TYPE = f"multipart/x-mixed-replace; boundary={BOUNDARY}"
+
+
+def multipart_part(frame, timestamp=None):
+    """Wrap a JPEG frame (any bytes-like object) into a single multipart part.
+
+    ``timestamp`` is the source image stamp in seconds, sent as ``X-Timestamp``
+    the same way web_video_server does.
+    """
+    header = (
+        f"--{BOUNDARY}\r\n"
+        f"Content-Type: image/jpeg\r\n"
+        f"Content-Length: {len(frame)}\r\n"
+    )
+    if timestamp is not None:
+        header += f"X-Timestamp: {timestamp:.6f}\r\n"
+    return b"".join(((header + "\r\n").encode("utf-8"), frame, b"\r\n"))
+
+
+def part_payload(part):
+    """Return a view of the JPEG inside a part built by ``multipart_part``."""
+    return memoryview(part)[part.index(b"\r\n\r\n") + 4:-2]
+
+
+def part_timestamp(part):
+    """Return the ``X-Timestamp`` of a part built by ``multipart_part``, if any."""
+    match = X_TIMESTAMP.search(part, 0, part.index(b"\r\n\r\n"))
+    return float(match.group(1)) if match else None
+
+
+def stream_topic(key):
+    """Topic of a stream key: ``ros:<topic>`` or a web_video_server ``...?topic=<topic>`` URL."""
+    if key.startswith("ros:"):
+        return key[len("ros:"):]
+    return parse_qs(urlsplit(key).query).get("topic", [None])[0]
+
+
+class FrameChannel:
+    """Latest-frame slot that broadcasts to one single-slot queue per viewer.
+
+    A viewer that has not picked up its previous frame gets it replaced by the
+    newest one, so slow clients skip frames instead of stalling the producer.
+    A published ``None`` tells every viewer that the stream has ended.
+    """
+
+    def __init__(self, label="other"):
+        self.latest = None
+        self._queues = set()
+        self.use_label(label)
+
+    def use_label(self, label):
+        """Count into the metrics of ``label``, which other channels may share."""
+        self._clients = STREAM_CLIENTS.labels(label)
+        self._frames = STREAM_FRAMES.labels(label)
+        self._bytes = STREAM_BYTES.labels(label)
+        self._dropped = STREAM_DROPPED.labels(label)
+
+    def __len__(self):
+        return len(self._queues)
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=1)
+        if self.latest is not None:
+            queue.put_nowait(self.latest)
+        self._queues.add(queue)
+        self._clients.inc()
+        return queue
+
+    def unsubscribe(self, queue):
+        if queue in self._queues:
+            self._queues.discard(queue)
+            self._clients.dec()
+
+    def publish(self, item):
+        self.latest = item
+        if item is not None:
+            self._frames.inc()
+            self._bytes.inc(len(item))
+        for queue in self._queues:
+            if queue.full():
+                queue.get_nowait()
+                self._dropped.inc()
+            queue.put_nowait(item)
+
+
+class SharedStream:
+    """A producer task publishing into a channel shared by all of its viewers."""
+
+    def __init__(self, key):
+        self.key = key
+        self.channel = FrameChannel()
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._produce())
+
+    def stop(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+    async def _produce(self):
+        try:
+            await self.run()
+        finally:
+            # Wake every viewer so their responses end with the producer.
+            self.channel.publish(None)
+
+    async def run(self):
+        raise NotImplementedError
+
+
+class MJPEGUpstream(SharedStream):
+    """A single upstream MJPEG connection whose frames are fanned out to viewers."""
+
+    async def run(self):
+        url = self.key
+        try:
+            async with httpx.AsyncClient(timeout=None) as client:
+                async with client.stream("GET", url) as response:
+                    if response.status_code != 200:
+                        print(f"Upstream {url} returned {response.status_code}")
+                        return
+
+                    splitter = MJPEGSplitter()
+                    async for chunk in response.aiter_bytes():
+                        for frame in splitter.feed(chunk):
+                            self.channel.publish(multipart_part(frame, splitter.timestamp))
+        except httpx.HTTPError as e:
+            print(f"Upstream {url} failed: {e}")
+
+
+class PushedStream(SharedStream):
+    """A stream whose frames are pushed from another thread, e.g. a ROS callback.
+
+    ``source`` must provide ``attach(stream)`` and ``detach(stream)``; it is
+    attached while the stream has viewers and should call ``push`` per frame.
+    """
+
+    def __init__(self, key, source):
+        super().__init__(key)
+        self.source = source
+        self._loop = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        super().start()
+        self.source.attach(self)
+        self.task.add_done_callback(lambda _: self.source.detach(self))
+
+    def push(self, jpeg, timestamp=None):
+        """Publish a JPEG frame; safe to call from any thread."""
+        part = multipart_part(jpeg, timestamp)
+        self._loop.call_soon_threadsafe(self.channel.publish, part)
+
+    async def run(self):
+        # Frames arrive through push(); just stay alive until the last viewer leaves.
+        await asyncio.Future()
+
+
+class StreamHub:
+    """Keeps one producer per key, shared by all of its viewers.
+
+    A producer is started when the first viewer arrives and stopped as soon as
+    the last one leaves. Upstream MJPEG URLs are the basic keys; derived
+    streams (see ``camera_tiers``) register their own keys and factories.
+
+    Keys come from clients, so metrics are labelled from a fixed set: a
+    source's topic if it is one of ``topics``, else ``other``, and a derived
+    stream's name from ``profiles``, else ``custom``.
+    """
+
+    def __init__(self, topics=()):
+        self._streams = {}
+        self.topics = set(topics)
+        self.profiles = {}
+
+    def label(self, key):
+        if isinstance(key, tuple):
+            source, derived = key
+            return f"{self.label(source)}|{self.profiles.get(derived, 'custom')}"
+        topic = stream_topic(key)
+        if topic not in self.topics:
+            return "other"
+        return f"ros:{topic}" if key.startswith("ros:") else topic
+
+    def viewers(self, key):
+        stream = self._streams.get(key)
+        return len(stream.channel) if stream else 0
+
+    def subscribe(self, key, factory=MJPEGUpstream):
+        """Return ``(stream, queue)`` for ``key``, starting its producer if needed."""
+        stream = self._streams.get(key)
+        if stream is None or stream.task.done():
+            stream = factory(key)
+            stream.channel.use_label(self.label(key))
+            self._streams[key] = stream
+            stream.start()
+        return stream, stream.channel.subscribe()
+
+    def unsubscribe(self, stream, queue):
+        stream.channel.unsubscribe(queue)
+        if len(stream.channel) == 0:
+            stream.stop()
+            if self._streams.get(stream.key) is stream:
+                del self._streams[stream.key]
+
+    async def frames(self, url):
+        """Yield multipart parts from the shared upstream at ``url``."""
+        stream, queue = self.subscribe(url)
+        try:
+            while True:
+                part = await queue.get()
+                if part is None:
+                    break
+                yield part
+        finally:
+            self.unsubscribe(stream, queue)
+
+    def close(self):
+        for stream in self._streams.values():
+            stream.stop()
+        self._streams.clear()
@@ -0,0 +1,113 @@
+"""Low-latency teleoperation sessions for the ``/robot/teleop`` WebSocket.
+
+Clients send 12-byte binary frames ``<Iff`` (sequence number, linear m/s,
+angular rad/s). JSON text ``{"linear": .., "angular": ..}`` is accepted as
+well. Only the newest command is kept; a fixed-rate control loop publishes it
+and sends zero velocity once commands stop arriving for ``timeout`` seconds.
+"""
+import asyncio
+import json
+import math
+import struct
+import time
+from collections import deque
+
+FRAME = struct.Struct("<Iff")
+LATENCY_SAMPLES = 1000
+# Longest deadman timeout a client may ask for; the robot must stop soon after its operator is gone.
+MAX_TIMEOUT = 2.0
+
+
+class TeleopSession:
+    def __init__(self, publish, rate=20.0, timeout=0.5):
+        self.publish = publish
+        self.period = 1.0 / rate
+        self.timeout = min(timeout, MAX_TIMEOUT)
+        self.command = (0.0, 0.0)
+        self.received_at = None
+        self.pending = False
+        self.stopped = True
+        self.received = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.published = 0
+        self.watchdog_stops = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def submit(self, linear, angular):
+        if not (math.isfinite(linear) and math.isfinite(angular)):
+            self.rejected += 1
+            return
+        if self.pending:
+            # The previous command never reached the robot; the newer one wins.
+            self.dropped += 1
+        self.command = (linear, angular)
+        self.received_at = time.monotonic()
+        self.pending = True
+        self.received += 1
+
+    def submit_frame(self, data):
+        if len(data) != FRAME.size:
+            self.rejected += 1
+            return
+        _, linear, angular = FRAME.unpack(data)
+        self.submit(linear, angular)
+
+    def submit_json(self, text):
+        try:
+            cmd = json.loads(text)
+            self.submit(float(cmd.get("linear", 0.0)), float(cmd.get("angular", 0.0)))
+        except (ValueError, TypeError, AttributeError):
+            self.rejected += 1
+
+    def tick(self):
+        """Publish the current command, or zero if the deadman timeout expired."""
+        now = time.monotonic()
+        if self.received_at is None or now - self.received_at > self.timeout:
+            if not self.stopped:
+                self.publish(0.0, 0.0)
+                self.stopped = True
+                self.watchdog_stops += 1
+            return
+
+        self.publish(*self.command)
+        self.published += 1
+        self.stopped = False
+        if self.pending:
+            self.latencies.append(time.monotonic() - self.received_at)
+            self.pending = False
+
+    async def run(self, report=None, report_every=1.0):
+        """Run the control loop until cancelled, calling ``report(stats)`` periodically."""
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        next_report = next_tick + report_every
+        while True:
+            self.tick()
+            if report is not None and loop.time() >= next_report:
+                next_report += report_every
+                await report(self.stats())
+            next_tick += self.period
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+    def stop(self):
+        if not self.stopped:
+            self.publish(0.0, 0.0)
+            self.stopped = True
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        def percentile(fraction):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000
+        return {
+            "type": "stats",
+            "received": self.received,
+            "published": self.published,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "watchdog_stops": self.watchdog_stops,
+            "latency_ms_p50": percentile(0.5),
+            "latency_ms_p99": percentile(0.99),
+        }
@@ -0,0 +1,75 @@
+from threading import Lock
+
+import numpy as np
+
+# Ten hours of AMCL poses at 10 Hz, about 11 MB.
+DEFAULT_CAPACITY = 360_000
+
+
+class TrajectoryBuffer:
+    """Fixed-size ring buffer of ``(time, x, y, yaw)`` samples in one NumPy array."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self._samples = np.empty((capacity, 4), dtype=np.float64)
+        self._next = 0
+        self._count = 0
+        self._lock = Lock()
+
+    def __len__(self):
+        return self._count
+
+    def append(self, t, x, y, yaw):
+        with self._lock:
+            self._samples[self._next] = (t, x, y, yaw)
+            self._next = (self._next + 1) % len(self._samples)
+            self._count = min(self._count + 1, len(self._samples))
+
+    def window(self, start=None, end=None):
+        """Return a chronological copy of the samples with ``start <= time <= end``."""
+        with self._lock:
+            if self._count < len(self._samples):
+                samples = self._samples[:self._count].copy()
+            else:
+                samples = np.concatenate((self._samples[self._next:], self._samples[:self._next]))
+
+        times = samples[:, 0]
+        lo = 0 if start is None else np.searchsorted(times, start, side="left")
+        hi = len(samples) if end is None else np.searchsorted(times, end, side="right")
+        return samples[lo:hi]
+
+
+def simplify(points, tolerance):
+    """Douglas–Peucker: indices of the points to keep for a path within ``tolerance``.
+
+    ``points`` is an ``(n, 2)`` array. The recursion is unrolled onto a stack
+    and each segment's distances are computed in one vectorized pass.
+    """
+    n = len(points)
+    if n < 3 or tolerance <= 0:
+        return np.arange(n)
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+
+        a = points[first]
+        b = points[last]
+        inner = points[first + 1:last]
+        ab = b - a
+        length = np.hypot(*ab)
+        if length == 0:
+            distances = np.hypot(*(inner - a).T)
+        else:
+            distances = np.abs(ab[0] * (inner[:, 1] - a[1]) - ab[1] * (inner[:, 0] - a[0])) / length
+
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = first + 1 + index
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep)